@@ -1,12 +1,99 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from PIL import Image
+from pathlib import Path
+import hashlib
 import io
+import os
+import tempfile
+import time
 import numpy as np
-import tensorflow as tf
-from pathlib import Path
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from inference import CLASS_NAMES, INPUT_SIZE, preprocess_image, preprocess_tensor, predict_probabilities, top_prediction
+from tta import MAX_AUGMENTATIONS, predict_tta
+from tiling import TILE_OVERLAP, predict_tiled
+from history import HISTORY_DB_PATH, HistoryStore
+from cache import LRUCache
+from embeddings import SIMILARITY_THRESHOLD, predict_with_embeddings
+from model_registry import ModelRegistry
+from jobs import JobManager, stream_events
+from coalesce import SingleFlight
+from upload_metrics import UploadMetrics
+from batching import MicroBatcher
+from limiter import LIMIT_CLIENT_HEADER, AdaptiveLimiter
+from cascade import CASCADE_MODEL, Cascade, top_margin
+from prefilter import PREFILTER_ENABLED, Prefilter
+from video import DIFF_THRESHOLD, FRAME_INTERVAL, SEQUENCE_FPS, iter_frames, iter_timeline, summarize_timeline
+from job_queue import DEFAULT_MAX_ATTEMPTS, DEFAULT_TIMEOUT, JobQueue
+from shm_inference import INFERENCE_BACKEND, get_client
+from memory_guard import MemoryGuard
+from explain import EXPLAIN_CACHE_SIZE, build_explanation
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background services"""
+    history.start()
+    registry.start()
+    yield
+    jobs.shutdown()
+    registry.close()
+    history.close()
+    job_queue.close()
+    if cascade is not None:
+        cascade.close()
+
+app = FastAPI(title="Plant Savior AI API", lifespan=lifespan)
+
+# Prediction routes go through the adaptive concurrency limiter; health and metrics routes never do
+LIMITED_PATHS = {"/predict", "/predict/tensor", "/predict/tensors", "/predict/tiled", "/predict/video", "/similar"}
+limiter = AdaptiveLimiter()
+
+def client_key(request: Request) -> str:
+    """Who the limiter counts a request against: the trusted proxy's header if configured, else the peer"""
+    if LIMIT_CLIENT_HEADER:
+        forwarded = request.headers.get(LIMIT_CLIENT_HEADER, "").split(",")[-1].strip()
+        if forwarded:
+            return forwarded
+    return request.client.host if request.client else "unknown"
+
+@app.middleware("http")
+async def limit_concurrency(request: Request, call_next):
+    """Shed prediction requests with a fast 503/429 and Retry-After once the adaptive limit is reached"""
+    if request.method != "POST" or request.url.path not in LIMITED_PATHS:
+        return await call_next(request)
+    
+    client = client_key(request)
+    status = limiter.try_acquire(client)
+    if status:
+        detail = "Too many concurrent requests from this client" if status == 429 else "Server busy, retry later"
+        return JSONResponse(status_code=status, content={"detail": detail},
+                            headers={"Retry-After": str(limiter.retry_after())})
+    
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = await call_next(request)
+        # Fast rejections (bad uploads) and errors say nothing about capacity
+        failed = response.status_code >= 400
+        return response
+    finally:
+        limiter.release(client, time.perf_counter() - start, failed)
+
+# Long-lived TF processes can creep in memory; past the limits this worker exits gracefully and is replaced
+memory_guard = MemoryGuard()
 
-app = FastAPI(title="Plant Savior AI API")
+@app.middleware("http")
+async def recycle_guard(request: Request, call_next):
+    """Count served predictions and recycle the worker once it passes RECYCLE_MAX_REQUESTS / RECYCLE_MAX_RSS_MB"""
+    response = await call_next(request)
+    if request.method == "POST" and request.url.path in LIMITED_PATHS:
+        memory_guard.observe()
+    return response
 
 # Enable CORS for React frontend
 app.add_middleware(
@@ -16,38 +103,299 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model
-MODEL_PATH = Path(__file__).parent / "models" / "best_plant_model_final.keras"
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    print(f"Model loaded successfully from {MODEL_PATH}")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+# Exact-hash result cache size (entries)
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 1024))
+
+# Upper bound for the ?tta= query parameter
+TTA_MAX_AUGMENTATIONS = min(int(os.environ.get("TTA_MAX_AUGMENTATIONS", MAX_AUGMENTATIONS)), MAX_AUGMENTATIONS)
+
+# Load model; the registry hot-reloads it (and any A/B candidate) when the file changes
+registry = ModelRegistry()
+if registry.load(registry.primary_file):
+    print(f"Model loaded successfully from {registry.models_dir / registry.primary_file}")
+
+# Server-side diagnosis history, written off the request path
+history = HistoryStore(HISTORY_DB_PATH)
+
+# Exact-hash cache; each model version's embedding index also flags near-duplicates (burst shots, slight crops)
+prediction_cache = LRUCache(PREDICTION_CACHE_SIZE)
+
+# Concurrent /predict calls for the same upload share one in-flight inference
+single_flight = SingleFlight()
+
+# Concurrent requests to the same model version share forward passes
+if INFERENCE_BACKEND == "shm":
+    # The inference process batches across all HTTP workers; here, only group what is already queued
+    batcher = MicroBatcher(predict_with_embeddings, max_wait_ms=0)
+else:
+    batcher = MicroBatcher(predict_with_embeddings)
+
+# Optional cheap screening model; only low-margin images reach the full model
+cascade = None
+if CASCADE_MODEL:
+    try:
+        cascade = Cascade(registry.models_dir / CASCADE_MODEL)
+        print(f"Cascade screening model loaded from {cascade.path}")
+    except Exception as e:
+        print(f"Error loading cascade model: {e}")
+
+# Grad-CAM explanations: concurrent requests share one gradient pass, and results are cached per image
+explain_batcher = MicroBatcher(lambda explainer, batch: explainer.explain(batch))
+explanation_cache = LRUCache(EXPLAIN_CACHE_SIZE)
+
+# Cheap checks that turn away screenshots, blank frames and documents before the CNN
+prefilter = Prefilter()
+
+# Upload sizes and preprocessing time per format (full image, pre-resized image, raw tensor)
+upload_metrics = UploadMetrics()
+
+# Long-running batch/tiled jobs whose results are streamed as they complete
+jobs = JobManager()
+
+# Durable queue for heavy workloads; run by separate worker processes (python worker.py)
+job_queue = JobQueue()
+
+class SplitRequest(BaseModel):
+    candidate: Optional[str] = Field(None, description="Model file in the models directory, or null to stop the split")
+    percent: float = Field(0.0, ge=0.0, le=100.0)
+
+class PromoteRequest(BaseModel):
+    file: str
+
+def build_prediction(probabilities: np.ndarray) -> dict:
+    """Build the /predict response for one probability vector"""
+    predicted_class, confidence, severity = top_prediction(probabilities)
+    
+    return {
+        "predicted_class": predicted_class,
+        "confidence": confidence,
+        "severity": severity,
+        "description": get_disease_description(predicted_class),
+        "treatment": get_treatment_recommendations(predicted_class),
+        "prevention": get_prevention_recommendations(predicted_class),
+        "all_predictions": {
+            CLASS_NAMES[i]: float(probabilities[i]) 
+            for i in range(len(CLASS_NAMES))
+        }
+    }
+
+def predict_cached(version, image_hash: str, load_input, explain_pass=None) -> tuple:
+    """Predict with the exact-hash cache, flagging near-duplicates of past uploads; returns (result, cache status)"""
+    cache_key = f"{version.name}:{image_hash}"
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached), "hit"
+    
+    # Decode and preprocess only on a miss
+    processed_img = load_input()
+    start = time.perf_counter()
+    
+    probabilities = explain_pass() if explain_pass is not None else None
+    if probabilities is not None:
+        # Grad-CAM already ran the full model; it yields no embedding, so there is no near-duplicate lookup
+        result = build_prediction(probabilities)
+        prediction_cache.put(cache_key, result)
+        return dict(result), "miss"
+    
+    if cascade is not None:
+        # Confident screening answers skip the full model (and the near-duplicate index)
+        screen_probabilities, accepted = cascade.screen(processed_img)
+        if accepted:
+            result = build_prediction(screen_probabilities)
+            result["cascade"] = {"stage": "screen", "margin": float(top_margin(screen_probabilities))}
+            cascade.observe_request("screen", time.perf_counter() - start)
+            cascade.check_agreement(
+                lambda batch: batcher.predict(version.embedding_model, batch)[1], processed_img, screen_probabilities
+            )
+            prediction_cache.put(cache_key, result)
+            return dict(result), "miss"
+    
+    # Make prediction; the same forward pass yields the penultimate-layer embedding
+    full_start = time.perf_counter()
+    embeddings, probabilities = batcher.predict(version.embedding_model, processed_img)
+    if cascade is not None:
+        cascade.observe_request("full", time.perf_counter() - start, time.perf_counter() - full_start)
+    
+    # This image's own diagnosis always stands; a match is only pointed out
+    result = build_prediction(probabilities[0])
+    matches = version.index.search(embeddings[0], k=1)
+    if matches and matches[0][0] >= SIMILARITY_THRESHOLD:
+        similarity, meta = matches[0]
+        result["near_duplicate"] = {
+            "similarity": similarity,
+            "image_hash": meta["image_hash"],
+            "predicted_class": meta["predicted_class"],
+        }
+    else:
+        # Bursts of one leaf keep a single entry
+        version.index.add(embeddings[0], {
+            "image_hash": image_hash,
+            "created_at": time.time(),
+            "predicted_class": result["predicted_class"],
+            "confidence": result["confidence"],
+            "severity": result["severity"],
+            "probabilities": [round(float(p), 6) for p in probabilities[0]],
+        })
+    if cascade is not None:
+        result["cascade"] = {"stage": "full"}
+    
+    prediction_cache.put(cache_key, result)
+    return dict(result), "miss"
+
+def explain_cached(version, image_hash: str, load_input, fmt: str) -> tuple:
+    """Grad-CAM explanation with an exact-hash cache; returns (explanation, cache status, probabilities on a miss)"""
+    cache_key = f"{version.name}:{image_hash}:{fmt}"
+    cached = explanation_cache.get(cache_key)
+    if cached is not None:
+        return cached, "hit", None
+    
+    processed_img = load_input()
+    heatmaps, probabilities = explain_batcher.predict(version.explainer, processed_img)
+    explanation = build_explanation(heatmaps[0], processed_img[0], probabilities[0], fmt, version.explainer.layer_name)
+    explanation_cache.put(cache_key, explanation)
+    return explanation, "miss", probabilities[0]
 
-# Update these class names based on your model's output classes
-CLASS_NAMES = ["Healthy Plant", "Leaf Spot Disease", "Powdery Mildew"]  # Adjust to match your model
+def run_prediction(version, image_bytes: bytes, image_hash: str, tta: int, shape: tuple = None,
+                   explain: str = None) -> tuple:
+    """Run /predict inference for one upload (in the threadpool); returns (result, response headers, preprocess ms)"""
+    start = time.perf_counter()
+    headers = {"X-Model-Version": version.name}
+    timing = {}
+    loaded = []
+    screened = []
+    explained = {}
+    
+    def screen():
+        """Turn away non-plant uploads before the model sees them, once; cache hits never get here"""
+        if not PREFILTER_ENABLED or screened:
+            return
+        screened.append(True)
+        array = np.frombuffer(image_bytes, dtype=np.uint8).reshape(shape) if shape else None
+        reasons, checks = prefilter.check(None if shape else image_bytes, array)
+        if reasons:
+            raise HTTPException(status_code=422, detail={
+                "error": "not_a_plant",
+                "message": "This doesn't look like a photo of a plant. Please upload a clear, well-lit leaf photo.",
+                "reasons": reasons,
+                "checks": checks,
+            })
+    
+    def load_input():
+        """Screen, then decode (images) or reinterpret (tensors) the upload as a model batch once, timing it"""
+        if loaded:
+            return loaded[0]
+        screen()
+        load_start = time.perf_counter()
+        if shape:
+            batch = preprocess_tensor(image_bytes, shape)
+        else:
+            batch = preprocess_image(Image.open(io.BytesIO(image_bytes)))
+        timing["preprocess_ms"] = (time.perf_counter() - load_start) * 1000
+        loaded.append(batch)
+        return batch
+    
+    def explain_pass():
+        """Grad-CAM for this upload, once; returns the probabilities from its forward pass if it ran"""
+        if not explained:
+            explained["explanation"], explained["status"], explained["probabilities"] = explain_cached(
+                version, image_hash, load_input, explain
+            )
+        return explained["probabilities"]
+    
+    if tta:
+        screen()
+        # All augmentations go through the model as one batch
+        if shape:
+            img = Image.fromarray(np.frombuffer(image_bytes, dtype=np.uint8).reshape(shape))
+        else:
+            img = Image.open(io.BytesIO(image_bytes))
+        probabilities, tta_details = predict_tta(lambda batch: predict_probabilities(version.model, batch), img, tta)
+        result = build_prediction(probabilities)
+        result["tta"] = tta_details
+    else:
+        # With ?explain=, a prediction miss takes its answer from the Grad-CAM pass instead of a second forward pass
+        result, headers["X-Cache"] = predict_cached(version, image_hash, load_input, explain_pass if explain else None)
+    
+    version.observe(time.perf_counter() - start, result["predicted_class"])
+    history.record(result, image_hash=image_hash, source="predict")
+    if explain:
+        explain_pass()
+        result["explanation"], headers["X-Explain-Cache"] = explained["explanation"], explained["status"]
+    return result, headers, timing.get("preprocess_ms")
 
-def preprocess_image(img: Image.Image) -> np.ndarray:
-    """Preprocess image for model prediction"""
-    # Convert to RGB and resize (adjust size based on your model's input requirements)
-    img = img.convert("RGB").resize((224, 224))  # Most models use 224x224
+async def serve_prediction(response: Response, image_bytes: bytes, tta: int, upload_format: str,
+                           shape: tuple = None, original_bytes: int = None, explain: str = None) -> dict:
+    """Shared /predict pipeline for image and raw-tensor uploads"""
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
     
-    # Convert to array and normalize
-    img_array = np.array(img) / 255.0
+    # The same image always goes to the same side of an A/B split
+    version = registry.select(image_hash)
+    if explain and version.explainer is None:
+        raise HTTPException(status_code=409, detail="Explanations need a convolutional model loaded in this process "
+                                                    "(not available with INFERENCE_BACKEND=shm)")
     
-    # Add batch dimension
-    return np.expand_dims(img_array, 0)
+    # Identical uploads in flight at the same time (e.g. client retries) share one inference
+    (result, headers, preprocess_ms), shared = await single_flight.do(
+        f"{version.name}:{image_hash}:{tta}:{explain}", run_prediction, version, image_bytes, image_hash, tta, shape,
+        explain
+    )
+    response.headers.update(headers)
+    response.headers["X-Coalesced"] = "1" if shared else "0"
+    
+    # Report what a compact upload saved compared with sending the original photo
+    saved = upload_metrics.observe(
+        upload_format, len(image_bytes), original_bytes, None if shared else preprocess_ms
+    )
+    response.headers["X-Upload-Format"] = upload_format
+    response.headers["X-Upload-Bytes"] = str(len(image_bytes))
+    if preprocess_ms is not None and not shared:
+        response.headers["X-Preprocess-Ms"] = f"{preprocess_ms:.2f}"
+    if "bytes" in saved:
+        response.headers["X-Bytes-Saved"] = str(saved["bytes"])
+    if "preprocess_ms" in saved:
+        response.headers["X-Preprocess-Ms-Saved"] = f"{saved['preprocess_ms']:.2f}"
+    return dict(result)
 
 @app.get("/")
 async def root():
-    return {"message": "Plant Savior AI API", "model_loaded": model is not None}
+    return {
+        "message": "Plant Savior AI API",
+        "model_loaded": registry.primary is not None,
+        "model_version": registry.primary.name if registry.primary else None,
+    }
+
+@app.get("/config")
+def get_config():
+    """Input contract for clients that downscale before uploading"""
+    return {
+        "input_size": [INPUT_SIZE, INPUT_SIZE],
+        "channels": 3,
+        # Images of exactly input_size skip the server-side resize
+        "image_formats": ["image/webp", "image/jpeg", "image/png"],
+        "resize": "stretch",
+        "tensor": {
+            "endpoint": "/predict/tensor",
+            "content_type": "application/octet-stream",
+            "dtype": "uint8",
+            "layout": "HWC",
+            "shape": [INPUT_SIZE, INPUT_SIZE, 3],
+            "shape_header": "X-Tensor-Shape",
+        },
+        "original_bytes_header": "X-Original-Bytes",
+    }
 
 @app.post("/predict")
-async def predict_disease(file: UploadFile = File(...)):
+async def predict_disease(
+    response: Response,
+    file: UploadFile = File(...),
+    tta: int = Query(0, ge=0, le=TTA_MAX_AUGMENTATIONS, description="Number of test-time augmentations (0 = off)"),
+    explain: Optional[str] = Query(None, pattern="^(png|array)$",
+                                   description="Add a Grad-CAM explanation: png overlay or low-res heatmap array"),
+    x_original_bytes: Optional[int] = Header(None, description="Size of the original photo, to report bandwidth saved"),
+):
     """Predict plant disease from uploaded image"""
     
-    if model is None:
+    if registry.primary is None:
         raise HTTPException(status_code=500, detail="Model not loaded")
     
     # Validate file type
@@ -57,47 +405,419 @@ async def predict_disease(file: UploadFile = File(...)):
     try:
         # Read and process image
         image_bytes = await file.read()
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            pre_resized = img.size == (INPUT_SIZE, INPUT_SIZE)  # Header only; no pixel decode
+        return await serve_prediction(
+            response, image_bytes, tta, "pre-resized" if pre_resized else "full", original_bytes=x_original_bytes,
+            explain=explain,
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+@app.post("/predict/tensor")
+async def predict_disease_tensor(
+    request: Request,
+    response: Response,
+    tta: int = Query(0, ge=0, le=TTA_MAX_AUGMENTATIONS, description="Number of test-time augmentations (0 = off)"),
+    explain: Optional[str] = Query(None, pattern="^(png|array)$",
+                                   description="Add a Grad-CAM explanation: png overlay or low-res heatmap array"),
+    x_tensor_shape: str = Header(..., description="Height,width,channels of the uint8 body, e.g. 224,224,3"),
+    x_original_bytes: Optional[int] = Header(None, description="Size of the original photo, to report bandwidth saved"),
+):
+    """Predict from a raw uint8 HxWx3 tensor already at the model input size (application/octet-stream)"""
+    
+    if registry.primary is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    
+    try:
+        shape = tuple(int(dim) for dim in x_tensor_shape.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Tensor-Shape must look like 224,224,3")
+    if shape != (INPUT_SIZE, INPUT_SIZE, 3):
+        raise HTTPException(status_code=400, detail=f"Tensor shape must be {INPUT_SIZE},{INPUT_SIZE},3")
+    
+    tensor_bytes = await request.body()
+    if len(tensor_bytes) != INPUT_SIZE * INPUT_SIZE * 3:
+        raise HTTPException(status_code=400, detail=f"Expected {INPUT_SIZE * INPUT_SIZE * 3} bytes, got {len(tensor_bytes)}")
+    
+    try:
+        return await serve_prediction(response, tensor_bytes, tta, "tensor", shape, x_original_bytes, explain)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+@app.post("/predict/tensors")
+async def predict_disease_tensors(request: Request, response: Response):
+    """Classify a batch of length-prefixed raw uint8 224x224x3 tensors; returns float32 probabilities"""
+    
+    version = registry.select()
+    if version is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    
+    # Each record is a little-endian uint32 byte count followed by the HWC pixels
+    record = np.dtype([("length", "<u4"), ("pixels", np.uint8, (INPUT_SIZE, INPUT_SIZE, 3))])
+    body = await request.body()
+    if not body or len(body) % record.itemsize:
+        raise HTTPException(status_code=400, detail=f"Body must be a sequence of {record.itemsize}-byte records")
+    
+    # Zero-copy view over the request body
+    records = np.frombuffer(body, dtype=record)
+    if np.any(records["length"] != record["pixels"].itemsize):
+        raise HTTPException(status_code=400, detail=f"Every record length must be {record['pixels'].itemsize}")
+    
+    try:
+        start = time.perf_counter()
+        batch = records["pixels"].astype(np.float32) / 255.0
+        _, probabilities = await run_in_threadpool(batcher.predict, version.embedding_model, batch)
+        latency = (time.perf_counter() - start) / len(batch)
+        for predicted_class in np.argmax(probabilities, axis=-1):
+            version.observe(latency, CLASS_NAMES[predicted_class])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    
+    return Response(
+        content=np.ascontiguousarray(probabilities, dtype="<f4").tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Tensor-Shape": f"{len(probabilities)},{len(CLASS_NAMES)}",
+            "X-Tensor-Dtype": "float32",
+            "X-Class-Names": ",".join(CLASS_NAMES),
+            "X-Model-Version": version.name,
+        },
+    )
+
+@app.post("/predict/video")
+async def predict_disease_video(
+    file: UploadFile = File(...),
+    interval: float = Query(FRAME_INTERVAL, gt=0, le=3600, description="Seconds between sampled frames"),
+    diff_threshold: float = Query(DIFF_THRESHOLD, ge=0.0, le=1.0, description="Skip frames this similar to the last analyzed one"),
+):
+    """Diagnose a video or animated timelapse (GIF/WebP) as a per-timestamp timeline"""
+    
+    version = registry.select()
+    if version is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    
+    # Validate file type
+    if not file.content_type.startswith(("video/", "image/")):
+        raise HTTPException(status_code=400, detail="File must be a video or animated image")
+    
+    # OpenCV decodes from a path, so spool the upload to disk
+    suffix = Path(file.filename or "").suffix or ".mp4"
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        while chunk := await file.read(1 << 20):
+            tmp.write(chunk)
+        tmp.flush()
+        
+        def run():
+            stats = {}
+            predict_fn = lambda batch: batcher.predict(version.embedding_model, batch)[1]
+            frames = iter_frames(tmp.name, interval, SEQUENCE_FPS)
+            timeline = list(iter_timeline(predict_fn, frames, diff_threshold, stats=stats))
+            return timeline, stats
+        
+        try:
+            start = time.perf_counter()
+            timeline, stats = await run_in_threadpool(run)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Video prediction error: {str(e)}")
+    
+    summary = summarize_timeline(timeline)
+    return {
+        "overall": build_prediction(np.asarray(summary["mean_probabilities"])) if timeline else None,
+        "timeline": timeline,
+        "segments": summary["segments"],
+        "class_share": summary["class_share"],
+        "frames": {**stats, "processing_ms": round((time.perf_counter() - start) * 1000, 1)},
+        "model_version": version.name,
+    }
+
+@app.post("/predict/tiled")
+async def predict_disease_tiled(
+    response: Response,
+    file: UploadFile = File(...),
+    overlap: float = Query(TILE_OVERLAP, ge=0.0, le=0.75, description="Fraction of overlap between neighbouring tiles"),
+    heatmap: bool = Query(True, description="Include the per-tile probability heatmap"),
+):
+    """Predict plant disease from a high-resolution image using overlapping 224x224 tiles"""
+    
+    if registry.primary is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    
+    # Validate file type
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    try:
+        image_bytes = await file.read()
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
         img = Image.open(io.BytesIO(image_bytes))
         
-        # Preprocess for model
-        processed_img = preprocess_image(img)
+        version = registry.select(image_hash)
+        start = time.perf_counter()
+        probabilities, tiles = predict_tiled(lambda batch: predict_probabilities(version.model, batch), img, overlap)
+        if not heatmap:
+            del tiles["heatmap"]
         
-        # Make prediction
-        predictions = model.predict(processed_img)
-        probabilities = tf.nn.softmax(predictions[0]).numpy()
+        result = build_prediction(probabilities)
+        result["tiles"] = tiles
         
-        # Get top prediction
-        predicted_index = int(np.argmax(probabilities))
-        confidence = float(probabilities[predicted_index])
-        predicted_class = CLASS_NAMES[predicted_index] if predicted_index < len(CLASS_NAMES) else "Unknown"
+        version.observe(time.perf_counter() - start, result["predicted_class"])
+        response.headers["X-Model-Version"] = version.name
+        history.record(result, image_hash=image_hash, source="tiled")
+        return result
         
-        # Determine severity based on disease type and confidence
-        severity = "low"
-        if predicted_class != "Healthy Plant":
-            if confidence > 0.8:
-                severity = "high"
-            elif confidence > 0.6:
-                severity = "medium"
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+def process_predict_batch(items: list) -> list:
+    """Classify a batch of (filename, image bytes) with one forward pass"""
+    version = registry.select()
+    results = [None] * len(items)
+    batch, positions = [], []
+    for i, (filename, image_bytes) in enumerate(items):
+        try:
+            batch.append(preprocess_image(Image.open(io.BytesIO(image_bytes))))
+            positions.append(i)
+        except Exception as e:
+            results[i] = {"filename": filename, "error": f"Could not read image: {e}"}
+    
+    if batch:
+        start = time.perf_counter()
+        probabilities = predict_probabilities(version.model, np.concatenate(batch))
+        latency = (time.perf_counter() - start) / len(batch)
         
-        # Generate treatment and prevention recommendations
-        treatment_recommendations = get_treatment_recommendations(predicted_class)
-        prevention_recommendations = get_prevention_recommendations(predicted_class)
+        for i, probs in zip(positions, probabilities):
+            filename, image_bytes = items[i]
+            result = build_prediction(probs)
+            version.observe(latency, result["predicted_class"])
+            history.record(result, image_hash=hashlib.sha256(image_bytes).hexdigest(), source="job")
+            results[i] = {"filename": filename, "model_version": version.name, **result}
+    return results
+
+def process_tiled_batch(items: list, overlap: float) -> list:
+    """Run tiled inference on each (filename, image bytes)"""
+    version = registry.select()
+    results = []
+    for filename, image_bytes in items:
+        try:
+            img = Image.open(io.BytesIO(image_bytes))
+            start = time.perf_counter()
+            probabilities, tiles = predict_tiled(lambda batch: predict_probabilities(version.model, batch), img, overlap)
+        except Exception as e:
+            results.append({"filename": filename, "error": f"Tiled prediction failed: {e}"})
+            continue
+        
+        result = build_prediction(probabilities)
+        result["tiles"] = tiles
+        version.observe(time.perf_counter() - start, result["predicted_class"])
+        history.record(result, image_hash=hashlib.sha256(image_bytes).hexdigest(), source="job")
+        results.append({"filename": filename, "model_version": version.name, **result})
+    return results
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    files: List[UploadFile] = File(...),
+    mode: str = Query("predict", pattern="^(predict|tiled)$", description="Whole-image prediction or tiled inference"),
+    overlap: float = Query(TILE_OVERLAP, ge=0.0, le=0.75, description="Tile overlap (mode=tiled)"),
+):
+    """Submit many images as one job; results stream from /jobs/{job_id}/events"""
+    
+    if registry.primary is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    
+    # Validate file types
+    for file in files:
+        if not file.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail=f"{file.filename} must be an image")
+    
+    items = [(file.filename, await file.read()) for file in files]
+    if mode == "tiled":
+        job = jobs.submit(mode, items, lambda chunk: process_tiled_batch(chunk, overlap), batch_size=1)
+    else:
+        job = jobs.submit(mode, items, process_predict_batch)
+    
+    return {
+        **job.summary(),
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, results: bool = Query(True, description="Include results finished so far")):
+    """Job status, progress and results so far"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.summary(include_results=results)
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(
+    job_id: str,
+    format: str = Query("sse", pattern="^(sse|ndjson)$", description="Server-Sent Events or newline-delimited JSON"),
+    last_event_id: Optional[str] = Header(None, description="Resume an SSE stream after this item index"),
+):
+    """Stream per-item results as each batch of the job completes"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    cursor = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        stream_events(job, format, cursor),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/queue/jobs", status_code=202)
+async def enqueue_job(
+    files: List[UploadFile] = File(...),
+    kind: str = Query("predict", pattern="^(predict|tiled|tta)$", description="Whole-image, tiled or TTA inference"),
+    priority: int = Query(0, description="Higher priorities are picked up first"),
+    max_attempts: int = Query(DEFAULT_MAX_ATTEMPTS, ge=1, le=10, description="Attempts before the job fails"),
+    timeout: float = Query(DEFAULT_TIMEOUT, gt=0, le=3600, description="Seconds one attempt may take"),
+    overlap: float = Query(TILE_OVERLAP, ge=0.0, le=0.75, description="Tile overlap (kind=tiled)"),
+    tta: int = Query(4, ge=1, le=MAX_AUGMENTATIONS, description="Augmented views per image (kind=tta)"),
+):
+    """Queue images for the worker pool; the job survives API and worker restarts"""
+    
+    # Validate file types
+    for file in files:
+        if not file.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail=f"{file.filename} must be an image")
+    
+    items = [(file.filename, await file.read()) for file in files]
+    params = {"overlap": overlap} if kind == "tiled" else {"tta": tta} if kind == "tta" else {}
+    # Spooling writes files and a SQLite row; keep that off the event loop
+    job_id = await run_in_threadpool(job_queue.enqueue, kind, items, params, priority, max_attempts, timeout)
+    
+    return {"job_id": job_id, "status": "queued", "total": len(items), "status_url": f"/queue/jobs/{job_id}"}
+
+@app.get("/queue/jobs/{job_id}")
+def get_queued_job(job_id: str, results: bool = Query(True, description="Include results finished so far")):
+    """Status, attempts and results of a queued job"""
+    job = job_queue.get(job_id, include_results=results)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    # Workers store raw probabilities; descriptions and advice are added here
+    for result in job.get("results", []):
+        probabilities = result.pop("probabilities", None)
+        if probabilities is not None:
+            result.update(build_prediction(np.asarray(probabilities)))
+    job["job_id"] = job.pop("id")
+    return job
+
+@app.get("/queue/stats")
+def get_queue_stats():
+    """Number of queued, running, done and failed jobs"""
+    return {"jobs": job_queue.stats()}
+
+@app.get("/history")
+def get_history(
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = Query(None, description="Return entries older than this id (from next_before_id)"),
+    predicted_class: Optional[str] = None,
+    severity: Optional[str] = None,
+):
+    """Page through past diagnoses, newest first"""
+    items = history.recent(limit, before_id, predicted_class, severity)
+    return {
+        "items": items,
+        "next_before_id": items[-1]["id"] if len(items) == limit else None,
+    }
+
+@app.get("/history/stats/classes")
+def get_history_class_counts(since: Optional[str] = None, until: Optional[str] = None):
+    """Diagnosis counts per class (optional inclusive YYYY-MM-DD range)"""
+    return {"counts": history.counts_by_class(since, until)}
+
+@app.get("/history/stats/daily")
+def get_history_daily_counts(since: Optional[str] = None, until: Optional[str] = None):
+    """Diagnosis counts per day and class (optional inclusive YYYY-MM-DD range)"""
+    return {"days": history.counts_by_day(since, until), "writer": history.stats()}
+
+@app.post("/similar")
+async def similar_diagnoses(
+    file: UploadFile = File(...),
+    k: int = Query(5, ge=1, le=50, description="Number of similar past diagnoses to return"),
+):
+    """Find the past diagnoses whose images look most like the uploaded one"""
+    
+    version = registry.primary
+    if version is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    
+    # Validate file type
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    try:
+        image_bytes = await file.read()
+        processed_img = preprocess_image(Image.open(io.BytesIO(image_bytes)))
+        embeddings, _ = batcher.predict(version.embedding_model, processed_img)
         
         return {
-            "predicted_class": predicted_class,
-            "confidence": confidence,
-            "severity": severity,
-            "description": get_disease_description(predicted_class),
-            "treatment": treatment_recommendations,
-            "prevention": prevention_recommendations,
-            "all_predictions": {
-                CLASS_NAMES[i]: float(probabilities[i]) 
-                for i in range(len(CLASS_NAMES))
-            }
+            "results": [
+                {"similarity": similarity, **meta}
+                for similarity, meta in version.index.search(embeddings[0], k)
+            ],
+            "index": version.index.stats(),
+            "model_version": version.name,
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Similarity search error: {str(e)}")
+
+@app.get("/metrics")
+def get_metrics():
+    """Cache, coalescing, upload, batching, load-shedding, memory and explanation counters"""
+    return {
+        "prediction_cache": prediction_cache.stats(),
+        "coalescing": single_flight.stats(),
+        "uploads": upload_metrics.stats(),
+        "batching": batcher.stats(),
+        "concurrency": limiter.stats(),
+        "cascade": cascade.stats() if cascade is not None else None,
+        "shared_memory": get_client().stats() if INFERENCE_BACKEND == "shm" else None,
+        "memory": memory_guard.stats(),
+        "explanations": {"cache": explanation_cache.stats(), "batching": explain_batcher.stats()},
+        "prefilter": prefilter.stats(
+            registry.primary.stats()["latency_ms"]["mean"] if registry.primary is not None else None
+        ),
+    }
+
+@app.get("/models")
+def get_models():
+    """Serving model versions, A/B split and per-version latency / class distribution"""
+    return registry.stats()
+
+@app.post("/models/split")
+def set_model_split(request: SplitRequest):
+    """Send a percentage of traffic to a candidate model file (loaded and warmed in the background)"""
+    try:
+        registry.set_split(request.candidate, request.percent)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.stats()
+
+@app.post("/models/promote")
+def promote_model(request: PromoteRequest):
+    """Make a model file the primary once it has been loaded and warmed"""
+    try:
+        registry.promote(request.file)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.stats()
 
 def get_disease_description(disease_name: str) -> str:
     """Get description for detected disease"""
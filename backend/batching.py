@@ -0,0 +1,93 @@
+from collections import Counter
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 32))
+# How long the first request of a batch waits for others to join it
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 5.0))
+
+class MicroBatcher:
+    """Merges concurrent requests for the same model into one forward pass"""
+
+    def __init__(self, run_batch, max_batch: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        # run_batch(model, batch) returns an array, or tuple of arrays, with one row per input row
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self.requests = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, model, batch: np.ndarray):
+        """Queue `batch` behind other requests for `model` and block until its rows are done"""
+        future = Future()
+        self._queue.put((model, batch, future))
+        return future.result()
+
+    def _run(self):
+        """Collect requests until the batch is full or the oldest has waited max_wait (in thread)"""
+        while True:
+            pending = [self._queue.get()]
+            rows = len(pending[0][1])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                rows += len(item[1])
+
+            # Requests can target different model versions (A/B split); batch each separately
+            groups = {}
+            for item in pending:
+                groups.setdefault(id(item[0]), []).append(item)
+            for items in groups.values():
+                self._run_group(items)
+
+    def _run_group(self, items: list):
+        """Run one forward pass for requests to the same model and hand each caller its rows"""
+        try:
+            batch = np.concatenate([batch for _, batch, _ in items], dtype=np.float32)
+            outputs = self.run_batch(items[0][0], batch)
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self.requests += len(items)
+
+        start = 0
+        for _, rows, future in items:
+            end = start + len(rows)
+            if isinstance(outputs, tuple):
+                future.set_result(tuple(output[start:end] for output in outputs))
+            else:
+                future.set_result(outputs[start:end])
+            start = end
+
+    def stats(self) -> dict:
+        """Forward passes run, requests served and batch-size distribution"""
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            rows = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": batches,
+                "requests": self.requests,
+                "mean_batch_size": rows / batches if batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+            }
@@ -0,0 +1,197 @@
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+from PIL import Image
+import numpy as np
+
+from inference import CLASS_NAMES, INPUT_SIZE, MODEL_PATH, preprocess_image, predict_probabilities, top_prediction
+from tiling import TILE_BATCH_SIZE, TILE_OVERLAP, predict_tiled
+from explain import EXPLAIN_FORMATS, build_explainer, overlay_png
+from video import DIFF_THRESHOLD, FRAME_INTERVAL, SEQUENCE_FPS, iter_frames, iter_timeline, summarize_timeline
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tif", ".tiff"}
+BATCH_SIZE = 32
+
+def iter_image_paths(paths: list):
+    """Expand files and directories into a sorted stream of image paths"""
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        else:
+            yield path
+
+def make_record(path: Path, probabilities: np.ndarray) -> dict:
+    """Build one output row for an image"""
+    predicted_class, confidence, severity = top_prediction(probabilities)
+    return {
+        "path": str(path),
+        "predicted_class": predicted_class,
+        "confidence": round(confidence, 4),
+        "severity": severity,
+        **{name: round(float(probabilities[i]), 4) for i, name in enumerate(CLASS_NAMES)},
+    }
+
+def predict_images(model, paths, batch_size: int = BATCH_SIZE, explainer=None, explain: str = "png",
+                   explain_dir: Path = None):
+    """Classify images in fixed-size batches, yielding one record per image (plus Grad-CAM with `explainer`)"""
+    pending = []
+
+    def flush():
+        batch = np.concatenate([processed for _, _, processed in pending])
+        if explainer is None:
+            for (_, path, _), probabilities in zip(pending, predict_probabilities(model, batch)):
+                yield make_record(path, probabilities)
+            pending.clear()
+            return
+
+        # One gradient pass yields both the probabilities and the heatmaps
+        heatmaps, batch_probabilities = explainer.explain(batch)
+        for (index, path, processed), probabilities, heatmap in zip(pending, batch_probabilities, heatmaps):
+            record = make_record(path, probabilities)
+            if explain == "png":
+                # The input position keeps a.jpg and a.png, or the same name in two folders, apart
+                overlay_path = explain_dir / f"{index:05d}_{path.name}.gradcam.png"
+                overlay_path.write_bytes(overlay_png(processed[0], heatmap))
+                record["explanation"] = str(overlay_path)
+            else:
+                record["gradcam"] = np.round(heatmap, 3).tolist()
+            yield record
+        pending.clear()
+
+    for index, path in enumerate(paths):
+        try:
+            with Image.open(path) as img:
+                img.draft("RGB", (INPUT_SIZE, INPUT_SIZE))  # Let JPEG decode at reduced scale
+                pending.append((index, path, preprocess_image(img)))
+        except Exception as e:
+            yield {"path": str(path), "error": str(e)}
+            continue
+        if len(pending) == batch_size:
+            yield from flush()
+
+    if pending:
+        yield from flush()
+
+def predict_images_tiled(model, paths, overlap: float = TILE_OVERLAP, batch_size: int = TILE_BATCH_SIZE,
+                         heatmap: bool = True):
+    """Run sliding-window inference on each image, yielding one record per image"""
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                probabilities, tiles = predict_tiled(
+                    lambda batch: predict_probabilities(model, batch), img, overlap, batch_size
+                )
+        except Exception as e:
+            yield {"path": str(path), "error": str(e)}
+            continue
+
+        record = make_record(path, probabilities)
+        record["tiles"] = tiles["count"]
+        record["diseased_fraction"] = round(tiles["diseased_fraction"], 4)
+        if heatmap:
+            record["heatmap"] = tiles["heatmap"]
+        yield record
+
+def predict_videos(model, paths, interval: float = FRAME_INTERVAL, diff_threshold: float = DIFF_THRESHOLD,
+                   fps: float = SEQUENCE_FPS, batch_size: int = BATCH_SIZE):
+    """Sample frames from each video (or animation / timelapse folder), yielding one record per analyzed frame"""
+    for path in map(Path, paths):
+        stats = {}
+        timeline = []
+        try:
+            frames = iter_frames(path, interval, fps)
+            for entry in iter_timeline(lambda batch: predict_probabilities(model, batch), frames,
+                                       diff_threshold, batch_size, stats):
+                timeline.append(entry)
+                yield {
+                    "path": str(path),
+                    "timestamp": entry["timestamp"],
+                    "frame": entry["frame"],
+                    "predicted_class": entry["predicted_class"],
+                    "confidence": round(entry["confidence"], 4),
+                    "severity": entry["severity"],
+                    **{name: round(p, 4) for name, p in entry["all_predictions"].items()},
+                }
+        except Exception as e:
+            yield {"path": str(path), "error": str(e)}
+            continue
+
+        segments = summarize_timeline(timeline)["segments"]
+        print(f"{path}: {stats['sampled']} frames sampled, {stats['analyzed']} analyzed, "
+              f"{stats['skipped']} skipped as unchanged", file=sys.stderr)
+        for segment in segments:
+            print(f"  {segment['start']:>8.1f}s - {segment['end']:>8.1f}s  {segment['predicted_class']}", file=sys.stderr)
+
+def write_records(records, output):
+    """Stream records to CSV (by extension) or JSON lines (stdout or .jsonl)"""
+    if output and Path(output).suffix.lower() == ".csv":
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            writer = None
+            for record in records:
+                if "error" in record:
+                    print(f"Skipped {record['path']}: {record['error']}", file=sys.stderr)
+                    continue
+                row = {key: value for key, value in record.items() if not isinstance(value, (dict, list))}
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+        return
+
+    f = open(output, "w", encoding="utf-8") if output else sys.stdout
+    try:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+    finally:
+        if output:
+            f.close()
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Classify many plant images from the command line")
+    parser.add_argument("paths", nargs="+", help="Image files and/or directories of images (or videos with --video)")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model instead of --model")
+    parser.add_argument("--batch-size", type=int, default=None, help="Images (or tiles) per forward pass")
+    parser.add_argument("--output", "-o", help="Write .csv or .jsonl instead of JSON lines on stdout")
+    parser.add_argument("--tiled", action="store_true", help="Sliding-window inference for high-resolution images")
+    parser.add_argument("--overlap", type=float, default=TILE_OVERLAP, help="Tile overlap fraction (with --tiled)")
+    parser.add_argument("--no-heatmap", action="store_true", help="Omit per-tile heatmaps (with --tiled)")
+    parser.add_argument("--explain", choices=EXPLAIN_FORMATS,
+                        help="Add Grad-CAM: png overlays written to --explain-dir, or low-res heatmap arrays in the records")
+    parser.add_argument("--explain-dir", default="gradcam", help="Folder for --explain png overlays")
+    parser.add_argument("--video", action="store_true",
+                        help="Treat each path as a video, animated image or folder of timelapse frames")
+    parser.add_argument("--interval", type=float, default=FRAME_INTERVAL, help="Seconds between sampled frames (with --video)")
+    parser.add_argument("--diff-threshold", type=float, default=DIFF_THRESHOLD,
+                        help="Skip frames whose 32x32 grayscale mean difference from the last analyzed one is below this")
+    parser.add_argument("--fps", type=float, default=SEQUENCE_FPS, help="Frame rate of timelapse folders (with --video)")
+    args = parser.parse_args()
+
+    from standin_model import load_model
+    model = load_model(args.model, standin=args.standin)
+    paths = iter_image_paths(args.paths)
+
+    if args.video:
+        records = predict_videos(model, args.paths, args.interval, args.diff_threshold, args.fps,
+                                 args.batch_size or BATCH_SIZE)
+    elif args.tiled:
+        records = predict_images_tiled(model, paths, args.overlap, args.batch_size or TILE_BATCH_SIZE,
+                                       heatmap=not args.no_heatmap)
+    else:
+        explainer = None
+        if args.explain:
+            explainer = build_explainer(model)
+            if explainer is None:
+                parser.error("--explain needs a model with a convolutional feature map")
+            if args.explain == "png":
+                Path(args.explain_dir).mkdir(parents=True, exist_ok=True)
+        records = predict_images(model, paths, args.batch_size or BATCH_SIZE, explainer, args.explain,
+                                 Path(args.explain_dir))
+    write_records(records, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
+import random
+import threading
+import time
+import numpy as np
+import tensorflow as tf
+
+from inference import INPUT_SIZE, predict_probabilities
+from batching import MicroBatcher
+
+# Screening model file in the models directory; empty disables the cascade
+CASCADE_MODEL = os.environ.get("CASCADE_MODEL", "")
+# Top-1 minus top-2 probability the screen must reach to answer without the full model
+CASCADE_MARGIN = float(os.environ.get("CASCADE_MARGIN", 0.5))
+# Fraction of screened images also run through the full model to measure agreement
+CASCADE_AGREEMENT_SAMPLE = float(os.environ.get("CASCADE_AGREEMENT_SAMPLE", 0.05))
+LATENCY_WINDOW = 1000
+
+def top_margin(probabilities: np.ndarray) -> np.ndarray:
+    """Gap between the two most likely classes, per row"""
+    top2 = np.sort(probabilities, axis=-1)[..., -2:]
+    return top2[..., 1] - top2[..., 0]
+
+class Cascade:
+    """Cheap screening model that answers confident images and escalates the rest to the full model"""
+
+    def __init__(self, path: Path, margin: float = CASCADE_MARGIN, agreement_sample: float = CASCADE_AGREEMENT_SAMPLE):
+        self.path = Path(path)
+        self.margin = margin
+        self.agreement_sample = agreement_sample
+        self.model = tf.keras.models.load_model(self.path)
+        self.model.predict(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32), verbose=0)
+        self._batcher = MicroBatcher(predict_probabilities)
+        # Agreement checks run off the request path
+        self._shadow = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cascade-shadow")
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self._latencies = {stage: deque(maxlen=LATENCY_WINDOW) for stage in ("screen", "full", "total")}
+
+    def screen(self, batch: np.ndarray) -> tuple:
+        """Run the screening model; returns (probabilities, accepted)"""
+        start = time.perf_counter()
+        probabilities = self._batcher.predict(self.model, batch)[0]
+        accepted = bool(top_margin(probabilities) >= self.margin)
+        self._observe("screen", time.perf_counter() - start)
+        return probabilities, accepted
+
+    def observe_request(self, stage: str, total: float, full: float = None):
+        """Record where a request was answered and how long it took end to end"""
+        with self._lock:
+            self.counts[stage] += 1
+        self._observe("total", total)
+        if full is not None:
+            self._observe("full", full)
+
+    def check_agreement(self, full_predict, batch: np.ndarray, screen_probabilities: np.ndarray):
+        """Sometimes compare a screened answer with the full model's, in the background"""
+        if random.random() >= self.agreement_sample:
+            return
+
+        def run():
+            try:
+                full_probabilities = full_predict(batch)[0]
+            except Exception as e:
+                print(f"Cascade agreement check failed: {e}")
+                return
+            with self._lock:
+                self.counts["sampled"] += 1
+                self.counts["agreed"] += int(np.argmax(full_probabilities) == np.argmax(screen_probabilities))
+
+        self._shadow.submit(run)
+
+    def _observe(self, stage: str, latency: float):
+        with self._lock:
+            self._latencies[stage].append(latency)
+
+    def close(self):
+        self._shadow.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Per-stage hit rates, latency and screen/full agreement"""
+        with self._lock:
+            requests = self.counts["screen"] + self.counts["full"]
+            latency_ms = {}
+            for stage, latencies in self._latencies.items():
+                values = np.array(latencies) * 1000
+                latency_ms[stage] = {
+                    "mean": float(values.mean()) if len(values) else None,
+                    "p95": float(np.percentile(values, 95)) if len(values) else None,
+                }
+            return {
+                "model": self.path.name,
+                "margin": self.margin,
+                "requests": requests,
+                "answered_by_screen": self.counts["screen"],
+                "escalated": self.counts["full"],
+                "screen_hit_rate": self.counts["screen"] / requests if requests else 0.0,
+                "escalation_rate": self.counts["full"] / requests if requests else 0.0,
+                "latency_ms": latency_ms,
+                "agreement": {
+                    "sampled": self.counts["sampled"],
+                    "agreed": self.counts["agreed"],
+                    "rate": self.counts["agreed"] / self.counts["sampled"] if self.counts["sampled"] else None,
+                },
+            }
@@ -0,0 +1,36 @@
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result"""
+
+    def __init__(self):
+        self._in_flight = {}  # key -> future of the running call
+        # Only touched on the event loop, so no lock is needed
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn, *args) -> tuple:
+        """Run fn(*args) in the threadpool, or join the identical call already running; returns (result, shared)"""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # Shielded so one client disconnecting doesn't cancel the others' result
+            return await asyncio.shield(future), True
+
+        self.calls += 1
+        future = asyncio.ensure_future(run_in_threadpool(fn, *args))
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future), False
+
+    def stats(self) -> dict:
+        """Executed vs coalesced calls"""
+        requests = self.calls + self.coalesced
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / requests if requests else 0.0,
+        }
@@ -0,0 +1,254 @@
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from PIL import Image
+import numpy as np
+import tensorflow as tf
+
+from inference import CLASS_NAMES, INPUT_SIZE, MODEL_PATH, preprocess_image
+from bulk_predict import iter_image_paths
+from standin_model import load_model
+
+STUDENT_PATH = Path(__file__).parent / "models" / "student_model.keras"
+TEMPERATURE = 4.0
+ALPHA = 0.3  # Weight of the hard-label loss; the rest goes to matching the teacher
+PRUNABLE_LAYERS = (tf.keras.layers.Conv2D, tf.keras.layers.DepthwiseConv2D, tf.keras.layers.Dense)
+LOG_EPS = 1e-7  # Keeps log(probability) finite for classes the teacher rules out entirely
+
+def build_student(num_classes: int = len(CLASS_NAMES), width: int = 16) -> tf.keras.Model:
+    """Small MobileNet-style CNN (depthwise-separable blocks) with the app's input/output contract"""
+    inputs = tf.keras.Input(shape=(INPUT_SIZE, INPUT_SIZE, 3), name="image")
+    x = tf.keras.layers.Conv2D(width, 3, strides=2, padding="same", use_bias=False, name="stem")(inputs)
+    x = tf.keras.layers.BatchNormalization(name="stem_bn")(x)
+    x = tf.keras.layers.ReLU(6.0)(x)
+    for i, (filters, stride) in enumerate([(2, 2), (4, 2), (4, 1), (8, 2), (8, 1), (16, 2)]):
+        x = tf.keras.layers.DepthwiseConv2D(3, strides=stride, padding="same", use_bias=False, name=f"block{i}_dw")(x)
+        x = tf.keras.layers.BatchNormalization(name=f"block{i}_dw_bn")(x)
+        x = tf.keras.layers.ReLU(6.0)(x)
+        x = tf.keras.layers.Conv2D(width * filters, 1, use_bias=False, name=f"block{i}_pw")(x)
+        x = tf.keras.layers.BatchNormalization(name=f"block{i}_pw_bn")(x)
+        x = tf.keras.layers.ReLU(6.0)(x)
+    x = tf.keras.layers.GlobalAveragePooling2D(name="pool")(x)
+    x = tf.keras.layers.Dropout(0.2)(x)
+    # Logits, like the teacher: the API applies softmax itself
+    outputs = tf.keras.layers.Dense(num_classes, name="logits")(x)
+    return tf.keras.Model(inputs, outputs, name="student_plant_model")
+
+def class_folder_index(name: str) -> int:
+    """Map a folder name like "powdery_mildew" to its CLASS_NAMES index, or -1"""
+    normalized = name.lower().replace("_", " ").replace("-", " ")
+    for i, class_name in enumerate(CLASS_NAMES):
+        if class_name.lower() == normalized:
+            return i
+    return -1
+
+def load_dataset(data_dir: Path) -> tuple:
+    """Load a folder with one subfolder per class into (uint8 images, labels)"""
+    images, labels = [], []
+    for class_dir in sorted(p for p in Path(data_dir).iterdir() if p.is_dir()):
+        label = class_folder_index(class_dir.name)
+        if label < 0:
+            print(f"Skipping {class_dir.name}: not one of {CLASS_NAMES}")
+            continue
+        for path in iter_image_paths([class_dir]):
+            try:
+                with Image.open(path) as img:
+                    images.append(np.rint(preprocess_image(img)[0] * 255).astype(np.uint8))
+                labels.append(label)
+            except OSError as e:
+                print(f"Skipping {path}: {e}")
+    if not images:
+        raise ValueError(f"No labeled images found in {data_dir}")
+    return np.stack(images), np.array(labels)
+
+def make_synthetic_dataset(directory: Path, per_class: int = 24, seed: int = 0) -> Path:
+    """Write a tiny labeled folder: green leaves, leaves with dark spots, leaves with white patches"""
+    rng = np.random.default_rng(seed)
+    size = INPUT_SIZE
+    yy, xx = np.mgrid[:size, :size]
+    for label, class_name in enumerate(CLASS_NAMES):
+        class_dir = Path(directory) / class_name.lower().replace(" ", "_")
+        class_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(per_class):
+            green = np.array([40, 140, 50]) + rng.integers(-25, 25, 3)
+            img = np.clip(green + rng.normal(0, 12, (size, size, 3)), 0, 255)
+            spot_color = [None, (60, 35, 20), (235, 235, 230)][label % 3]
+            if spot_color is not None:
+                for _ in range(rng.integers(4, 10)):
+                    cy, cx = rng.integers(0, size, 2)
+                    radius = rng.integers(6, 22)
+                    img[(yy - cy) ** 2 + (xx - cx) ** 2 < radius ** 2] = spot_color
+            Image.fromarray(img.astype(np.uint8)).save(class_dir / f"{i:03d}.jpg", quality=90)
+    return Path(directory)
+
+def model_logits(model: tf.keras.Model, images: np.ndarray, batch_size: int) -> np.ndarray:
+    """Run a model over the whole dataset in batches, returning its raw outputs"""
+    return np.concatenate([
+        model.predict(images[i:i + batch_size].astype(np.float32) / 255.0, verbose=0)
+        for i in range(0, len(images), batch_size)
+    ])
+
+def ends_in_softmax(model: tf.keras.Model) -> bool:
+    """Whether a model's last layer already turns logits into probabilities"""
+    last = model.layers[-1]
+    while isinstance(last, tf.keras.Model):
+        last = last.layers[-1]
+    activation = getattr(last, "activation", None)
+    return isinstance(last, tf.keras.layers.Softmax) or getattr(activation, "__name__", "") == "softmax"
+
+def teacher_logits(teacher: tf.keras.Model, images: np.ndarray, batch_size: int) -> np.ndarray:
+    """Teacher logits for the dataset, recovered from probabilities when the model ends in softmax"""
+    outputs = model_logits(teacher, images, batch_size)
+    if ends_in_softmax(teacher):
+        # log(p) differs from the logits only by a per-row constant, which softmax ignores,
+        # so dividing it by the temperature softens the targets as intended
+        outputs = np.log(outputs + LOG_EPS)
+    return outputs
+
+def distill(student: tf.keras.Model, images: np.ndarray, labels: np.ndarray, soft_targets: np.ndarray,
+            epochs: int, batch_size: int, temperature: float = TEMPERATURE, alpha: float = ALPHA,
+            masks: dict = None, learning_rate: float = 1e-3):
+    """Train the student on hard labels plus the teacher's softened logits"""
+    optimizer = tf.keras.optimizers.Adam(learning_rate)
+    hard_loss = tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True)
+    soft_loss = tf.keras.losses.KLDivergence()
+
+    @tf.function
+    def train_step(x, y, teacher):
+        with tf.GradientTape() as tape:
+            logits = student(x, training=True)
+            loss = alpha * hard_loss(y, logits) + (1 - alpha) * temperature ** 2 * soft_loss(
+                tf.nn.softmax(teacher / temperature), tf.nn.softmax(logits / temperature)
+            )
+        gradients = tape.gradient(loss, student.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, student.trainable_variables))
+        return loss
+
+    rng = np.random.default_rng(0)
+    for epoch in range(epochs):
+        order = rng.permutation(len(images))
+        losses = []
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            x = images[idx].astype(np.float32) / 255.0
+            losses.append(float(train_step(x, labels[idx], soft_targets[idx].astype(np.float32))))
+            if masks:
+                apply_masks(masks)  # Keep pruned weights at zero while fine-tuning
+        print(f"Epoch {epoch + 1}/{epochs}: loss {np.mean(losses):.4f}")
+
+def magnitude_masks(model: tf.keras.Model, sparsity: float) -> dict:
+    """Per-layer masks that zero the smallest-magnitude `sparsity` fraction of each kernel"""
+    masks = {}
+    for layer in model.layers:
+        if isinstance(layer, PRUNABLE_LAYERS) and layer.name != "logits":
+            kernel = layer.weights[0]
+            threshold = np.quantile(np.abs(kernel.numpy()), sparsity)
+            masks[layer.name] = (kernel, (np.abs(kernel.numpy()) > threshold).astype(np.float32))
+    return masks
+
+def apply_masks(masks: dict):
+    """Zero the pruned weights in place"""
+    for kernel, mask in masks.values():
+        kernel.assign(kernel.numpy() * mask)
+
+def count_params(model: tf.keras.Model) -> tuple:
+    """(total, nonzero) parameter counts"""
+    weights = [w.numpy() for w in model.weights]
+    return sum(w.size for w in weights), sum(int(np.count_nonzero(w)) for w in weights)
+
+def cpu_latency_ms(model: tf.keras.Model, batch_size: int, repeats: int = 10) -> float:
+    """Median per-image latency of a direct (non-predict) call on CPU"""
+    batch = tf.zeros((batch_size, INPUT_SIZE, INPUT_SIZE, 3))
+    with tf.device("/CPU:0"):
+        model(batch, training=False)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(batch, training=False)
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000 / batch_size
+
+def top1_classes(model: tf.keras.Model, images: np.ndarray, batch_size: int) -> np.ndarray:
+    """Top-1 class per image"""
+    return np.argmax(model_logits(model, images, batch_size), axis=-1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the plant model into a smaller, optionally pruned student")
+    parser.add_argument("--data", type=Path, help="Folder with one subfolder of images per class")
+    parser.add_argument("--synthetic", action="store_true", help="Generate a tiny synthetic dataset instead of --data")
+    parser.add_argument("--teacher", default=str(MODEL_PATH), help="Path to the teacher .keras model")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model as teacher")
+    parser.add_argument("--output", "-o", type=Path, default=STUDENT_PATH)
+    parser.add_argument("--width", type=int, default=16, help="Student stem width; blocks scale from it")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--prune", type=float, default=0.0, help="Fraction of conv/dense weights to zero (e.g. 0.5)")
+    parser.add_argument("--finetune-epochs", type=int, default=3, help="Epochs of masked fine-tuning after pruning")
+    parser.add_argument("--val-split", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if not args.data and not args.synthetic:
+        parser.error("pass --data DIR or --synthetic")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = make_synthetic_dataset(Path(tmp)) if args.synthetic else args.data
+        images, labels = load_dataset(data_dir)
+    print(f"Loaded {len(images)} images from {'synthetic data' if args.synthetic else data_dir}")
+
+    # Hold out a validation split for the report
+    order = np.random.default_rng(0).permutation(len(images))
+    val_count = max(1, int(len(images) * args.val_split))
+    val_idx, train_idx = order[:val_count], order[val_count:]
+
+    teacher = load_model(args.teacher, standin=args.standin)
+    soft_targets = teacher_logits(teacher, images, args.batch_size)
+
+    student = build_student(width=args.width)
+    distill(student, images[train_idx], labels[train_idx], soft_targets[train_idx],
+            args.epochs, args.batch_size, args.temperature, args.alpha)
+
+    if args.prune > 0:
+        masks = magnitude_masks(student, args.prune)
+        apply_masks(masks)
+        print(f"Pruned {args.prune:.0%} of conv/dense weights; fine-tuning")
+        distill(student, images[train_idx], labels[train_idx], soft_targets[train_idx],
+                args.finetune_epochs, args.batch_size, args.temperature, args.alpha, masks, learning_rate=2e-4)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    student.save(args.output)
+
+    # Report on the saved file, exactly as the API will load it
+    student = tf.keras.models.load_model(args.output)
+    teacher_top1 = np.argmax(soft_targets[val_idx], axis=-1)
+    student_top1 = top1_classes(student, images[val_idx], args.batch_size)
+    report = {"output": str(args.output), "validation_images": int(val_count), "pruning": args.prune}
+    for name, model in (("teacher", teacher), ("student", student)):
+        total, nonzero = count_params(model)
+        report[name] = {
+            "params": total,
+            "nonzero_params": nonzero,
+            "cpu_latency_ms_batch1": round(cpu_latency_ms(model, 1), 2),
+            "cpu_latency_ms_per_image_batch32": round(cpu_latency_ms(model, 32), 2),
+        }
+    report["teacher"]["accuracy"] = float(np.mean(teacher_top1 == labels[val_idx]))
+    report["student"]["accuracy"] = float(np.mean(student_top1 == labels[val_idx]))
+    report["student"]["file_bytes"] = args.output.stat().st_size
+    report["top1_agreement"] = float(np.mean(student_top1 == teacher_top1))
+
+    report_path = args.output.with_suffix(".report.json")
+    report_path.write_text(json.dumps(report, indent=2))
+
+    print(f"\n{'':10}{'params':>12}{'nonzero':>12}{'ms (b=1)':>10}{'ms/img (b=32)':>15}{'accuracy':>10}")
+    for name in ("teacher", "student"):
+        row = report[name]
+        print(f"{name:10}{row['params']:>12,}{row['nonzero_params']:>12,}{row['cpu_latency_ms_batch1']:>10.2f}"
+              f"{row['cpu_latency_ms_per_image_batch32']:>15.2f}{row['accuracy']:>10.1%}")
+    print(f"Top-1 agreement with teacher: {report['top1_agreement']:.1%}")
+    print(f"Saved {args.output} and {report_path}")
+
+if __name__ == "__main__":
+    main()
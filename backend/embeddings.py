@@ -0,0 +1,302 @@
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import os
+import shutil
+import threading
+import numpy as np
+import tensorflow as tf
+
+from inference import softmax
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: run one API process per index directory
+
+EMBEDDING_INDEX_DIR = Path(os.environ.get("EMBEDDING_INDEX_DIR", Path(__file__).parent / "data" / "embeddings"))
+# Cosine similarity above which an upload is treated as a near-duplicate of a past one
+SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_THRESHOLD", 0.97))
+# 0 keeps a flat index; N > 0 partitions it into N k-means cells once it is large enough
+INDEX_PARTITIONS = int(os.environ.get("EMBEDDING_INDEX_PARTITIONS", 0))
+INDEX_PROBES = int(os.environ.get("EMBEDDING_INDEX_PROBES", 4))
+# Vectors kept per index; reaching it drops the oldest half
+INDEX_MAX_SIZE = int(os.environ.get("EMBEDDING_INDEX_MAX_SIZE", 50000))
+
+INITIAL_CAPACITY = 1024
+MIN_POINTS_PER_PARTITION = 39  # Train partitions only with enough points per cell
+
+def build_embedding_model(model: tf.keras.Model) -> tf.keras.Model:
+    """Wrap a classifier so one forward pass returns (penultimate embedding, model output)"""
+    for layer in reversed(model.layers[:-1]):
+        if len(layer.output.shape) == 2:
+            embedding = layer.output
+            break
+    else:
+        # No flat feature layer; pool the last feature map instead
+        embedding = tf.keras.layers.GlobalAveragePooling2D()(model.layers[-2].output)
+    return tf.keras.Model(model.inputs, [embedding, model.outputs[0]])
+
+def predict_with_embeddings(embedding_model: tf.keras.Model, batch: np.ndarray) -> tuple:
+    """Run one forward pass and return (embeddings, class probabilities)"""
+    embeddings, predictions = embedding_model.predict(batch, verbose=0)
+    return embeddings, softmax(predictions)
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+def spherical_kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity, returning unit centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        for c in range(k):
+            members = data[assignments == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = normalize(centroids)
+    return centroids
+
+class VectorIndex:
+    """Cosine-similarity index over a memory-mapped vector file, optionally k-means partitioned"""
+
+    def __init__(self, directory=EMBEDDING_INDEX_DIR, partitions: int = INDEX_PARTITIONS,
+                 probes: int = INDEX_PROBES, max_size: int = INDEX_MAX_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.partitions = partitions
+        self.probes = probes
+        self.max_size = max(2, max_size)
+        self.retired = False
+        self._lock = threading.Lock()
+        # Every uvicorn or shm HTTP worker serving this version opens the same directory;
+        # appends and compaction hold an exclusive flock on this file, searches a shared one
+        self._lock_file = open(self.directory / "index.lock", "a")
+        with self._locked(exclusive=True):
+            self._load()
+            if len(self.meta) >= self.max_size:
+                self._compact()
+            self._maybe_train()
+
+    def __len__(self):
+        return len(self.meta)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Hold this process's lock and the directory's file lock"""
+        with self._lock:
+            if fcntl is None or self._lock_file.closed:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        """(Re)read the header, metadata and vectors written by any process"""
+        self._vectors = None
+        self.dim = None
+        self.meta = []
+        self._meta_inode = None  # Compaction replaces meta.jsonl, which changes its inode
+        self._meta_offset = 0  # Bytes of meta.jsonl already read
+        self._centroids = None
+        self._assignments = None
+        self._trained_size = 0
+
+        meta_path = self.directory / "meta.jsonl"
+        header_path = self.directory / "index.json"
+        if not (header_path.exists() and meta_path.exists()):
+            return
+        self.dim = json.loads(header_path.read_text())["dim"]
+        with open(meta_path, "rb") as f:
+            data = f.read()
+            self._meta_inode = os.fstat(f.fileno()).st_ino
+        self._meta_offset = len(data)
+        self.meta = [json.loads(line) for line in data.splitlines() if line.strip()]
+        self._open_vectors(max(INITIAL_CAPACITY, len(self.meta)))
+
+        centroids_path = self.directory / "centroids.npy"
+        if self.partitions and centroids_path.exists():
+            self._centroids = np.load(centroids_path)
+            self._assignments = np.argmax(self._vectors[:len(self.meta)] @ self._centroids.T, axis=1).astype(np.int32)
+            self._trained_size = len(self.meta)
+
+    def _sync(self):
+        """Pick up rows other processes appended, or reload if one of them reset or compacted the index"""
+        try:
+            stat = (self.directory / "meta.jsonl").stat()
+        except FileNotFoundError:
+            if self.meta:
+                self._load()
+            return
+        if stat.st_ino != self._meta_inode or stat.st_size < self._meta_offset:
+            self._load()
+            return
+        if stat.st_size == self._meta_offset:
+            return
+
+        with open(self.directory / "meta.jsonl", "rb") as f:
+            f.seek(self._meta_offset)
+            data = f.read()
+        self._meta_offset += len(data)
+        start = len(self.meta)
+        # Lines are only appended under the exclusive lock, so they are always complete here
+        self.meta.extend(json.loads(line) for line in data.splitlines() if line.strip())
+        if len(self.meta) > len(self._vectors):
+            self._open_vectors(len(self.meta))
+        if self._centroids is not None:
+            cells = np.argmax(self._vectors[start:len(self.meta)] @ self._centroids.T, axis=1).astype(np.int32)
+            self._assignments = np.concatenate([self._assignments, cells])
+
+    def _open_vectors(self, capacity: int):
+        """(Re)map the vector file with room for at least `capacity` rows"""
+        path = self.directory / "vectors.f32"
+        nbytes = capacity * self.dim * 4
+        with open(path, "ab") as f:
+            if f.tell() < nbytes:
+                # Only writers grow the file; a reader asks for rows the writer already made room for
+                f.truncate(nbytes)
+            else:
+                capacity = f.tell() // (self.dim * 4)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def reset(self, dim: int):
+        """Drop all vectors, e.g. when the embedding size changes"""
+        self._vectors = None
+        for name in ("vectors.f32", "meta.jsonl", "centroids.npy"):
+            (self.directory / name).unlink(missing_ok=True)
+        self.dim = dim
+        self.meta = []
+        self._meta_inode = None
+        self._meta_offset = 0
+        self._centroids = None
+        self._assignments = None
+        self._trained_size = 0
+        (self.directory / "index.json").write_text(json.dumps({"dim": dim}))
+        self._open_vectors(INITIAL_CAPACITY)
+
+    def add(self, vector: np.ndarray, meta: dict):
+        """Append one vector and its metadata"""
+        vector = normalize(vector)
+        with self._locked(exclusive=True):
+            if self.retired:
+                return
+            if not self.directory.is_dir():
+                # Another worker process loaded a newer version and pruned this one
+                self.retired = True
+                return
+            # The row comes from what is on disk, not from this process's own count
+            self._sync()
+            if self.dim != len(vector):
+                self.reset(len(vector))
+            if len(self.meta) >= self.max_size:
+                self._compact()
+            row = len(self.meta)
+            if row == len(self._vectors):
+                self._open_vectors(2 * len(self._vectors))
+            # meta.jsonl is the source of truth for the row count, so write it last
+            self._vectors[row] = vector
+            line = (json.dumps(meta) + "\n").encode("utf-8")
+            with open(self.directory / "meta.jsonl", "ab") as f:
+                f.write(line)
+                self._meta_inode = os.fstat(f.fileno()).st_ino
+            self._meta_offset += len(line)
+            self.meta.append(meta)
+
+            if self._centroids is not None:
+                cell = int(np.argmax(self._centroids @ vector))
+                self._assignments = np.append(self._assignments, np.int32(cell))
+            self._maybe_train()
+
+    def search(self, vector: np.ndarray, k: int = 1) -> list:
+        """Return up to k (similarity, meta) pairs, most similar first"""
+        vector = normalize(vector)
+        with self._locked(exclusive=False):
+            if self.retired or not self.directory.is_dir():
+                return []
+            self._sync()
+            count = len(self.meta)
+            if not count or self.dim != len(vector):
+                return []
+
+            if self._centroids is not None:
+                # Only scan the cells of the nearest centroids
+                probes = np.argsort(self._centroids @ vector)[-self.probes:]
+                rows = np.flatnonzero(np.isin(self._assignments, probes))
+            else:
+                rows = np.arange(count)
+
+            similarities = self._vectors[rows] @ vector
+            k = min(k, len(rows))
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top])]
+            return [(float(similarities[i]), self.meta[rows[i]]) for i in top]
+
+    def _compact(self):
+        """Keep only the newest half of the vectors, in place (under the exclusive lock)"""
+        count = len(self.meta)
+        keep = self.max_size // 2
+        self._vectors[:keep] = np.array(self._vectors[count - keep:count])
+        self._vectors.flush()
+        meta = self.meta[count - keep:]
+        meta_path = self.directory / "meta.jsonl"
+        tmp_path = meta_path.with_suffix(".jsonl.tmp")
+        data = "".join(json.dumps(m) + "\n" for m in meta).encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            self._meta_inode = os.fstat(f.fileno()).st_ino
+        os.replace(tmp_path, meta_path)
+        self._meta_offset = len(data)
+        self.meta = meta
+        if self._centroids is not None:
+            self._assignments = self._assignments[count - keep:]
+            self._trained_size = keep
+
+    def retire(self):
+        """Delete the index once its model version stops serving; in-flight requests see an empty index"""
+        with self._locked(exclusive=True):
+            self.retired = True
+            self._vectors = None
+            self.meta = []
+            self._centroids = None
+            self._assignments = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self._lock_file.close()
+
+    def _maybe_train(self):
+        """(Re)train partitions whenever the index has doubled since the last training"""
+        count = len(self.meta)
+        if not self.partitions or count < self.partitions * MIN_POINTS_PER_PARTITION:
+            return
+        if self._centroids is not None and count < 2 * self._trained_size:
+            return
+
+        data = np.asarray(self._vectors[:count])
+        self._centroids = spherical_kmeans(data, self.partitions)
+        self._assignments = np.argmax(data @ self._centroids.T, axis=1).astype(np.int32)
+        self._trained_size = count
+        np.save(self.directory / "centroids.npy", self._centroids)
+
+    def flush(self):
+        """Write pending vector pages to disk"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+
+    def stats(self) -> dict:
+        """Index size and layout"""
+        return {
+            "size": len(self.meta),
+            "max_size": self.max_size,
+            "dim": self.dim,
+            "partitions": 0 if self._centroids is None else len(self._centroids),
+            "probes": self.probes,
+            "similarity_threshold": SIMILARITY_THRESHOLD,
+        }
@@ -0,0 +1,264 @@
+import argparse
+import hashlib
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+import numpy as np
+
+from inference import CLASS_NAMES, INPUT_SIZE, MODEL_PATH, preprocess_image, predict_probabilities, top_prediction
+from bulk_predict import iter_image_paths
+from distill import class_folder_index
+
+TENSOR_CACHE_DIR = Path(__file__).parent / "data" / "tensor_cache"
+BATCH_SIZE = 64
+ROW_SHAPE = (INPUT_SIZE, INPUT_SIZE, 3)
+SEVERITIES = ("low", "medium", "high")
+
+def file_sha256(path: Path) -> str:
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def preprocess_row(path: Path) -> np.ndarray:
+    """The exact uint8 pixels preprocess_image feeds the model (before the /255)"""
+    with Image.open(path) as img:
+        return np.rint(preprocess_image(img)[0] * 255).astype(np.uint8)
+
+def scan_dataset(data_dir: Path) -> list:
+    """(relative path, label) for every image in the per-class subfolders"""
+    items = []
+    for class_dir in sorted(p for p in Path(data_dir).iterdir() if p.is_dir()):
+        label = class_folder_index(class_dir.name)
+        if label < 0:
+            print(f"Skipping {class_dir.name}: not one of {CLASS_NAMES}")
+            continue
+        items.extend((str(path.relative_to(data_dir)), label) for path in iter_image_paths([class_dir]))
+    return items
+
+class TensorCache:
+    """Preprocessed dataset in a memory-mapped uint8 file, with a manifest keyed on file hashes"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.tensor_path = self.directory / "tensors.u8"
+        self.manifest_path = self.directory / "manifest.json"
+        self.entries = []  # One dict per row, in row order
+        if self.manifest_path.exists():
+            manifest = json.loads(self.manifest_path.read_text())
+            if manifest.get("input_size") == INPUT_SIZE:
+                self.entries = manifest["entries"]
+
+    def tensors(self, mode: str = "r") -> np.memmap:
+        """Map the tensor file (one row per manifest entry)"""
+        if not self.entries:
+            # An empty file can't be memory-mapped
+            return np.zeros((0, *ROW_SHAPE), dtype=np.uint8)
+        return np.memmap(self.tensor_path, dtype=np.uint8, mode=mode, shape=(len(self.entries), *ROW_SHAPE))
+
+    def update(self, data_dir: Path, workers: int = 8) -> dict:
+        """Bring the cache in line with the dataset, preprocessing only new or changed files"""
+        data_dir = Path(data_dir)
+        by_path = {entry["path"]: entry for entry in self.entries}
+        by_hash = {entry["sha256"]: entry for entry in self.entries}
+        keep, new = [], []
+        counts = Counter()
+
+        for rel_path, label in scan_dataset(data_dir):
+            path = data_dir / rel_path
+            stat = path.stat()
+            entry = by_path.get(rel_path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                # Unchanged (by size and mtime), so skip even hashing it
+                keep.append({**entry, "label": label})
+                counts["unchanged"] += 1
+                continue
+
+            sha256 = file_sha256(path)
+            entry = by_hash.get(sha256)
+            record = {"path": rel_path, "sha256": sha256, "label": label, "size": stat.st_size, "mtime": stat.st_mtime}
+            if entry:
+                # Same bytes as a cached row (touched, renamed or moved between classes)
+                keep.append({**record, "row": entry["row"]})
+                counts["rehashed"] += 1
+            else:
+                new.append(record)
+
+        # Renamed or moved files lose nothing, even though their old path is gone
+        paths = {entry["path"] for entry in keep}
+        hashes = {entry["sha256"] for entry in keep}
+        counts["removed"] = sum(
+            entry["path"] not in paths and entry["sha256"] not in hashes for entry in self.entries
+        )
+
+        # iter_batches reads rows by position, so kept rows must be exactly 0..n-1 in entry order
+        # (a rename or move reorders the scan without adding or dropping anything)
+        in_order = [entry["row"] for entry in keep] == list(range(len(keep)))
+        if new or not in_order or len(keep) != len(self.entries):
+            if not keep and not new:
+                # Empty dataset: nothing to map
+                self.tensor_path.unlink(missing_ok=True)
+                self.entries = []
+            else:
+                self.entries = keep + self._rewrite(data_dir, keep, new, workers, counts)
+        else:
+            self.entries = keep
+
+        self.manifest_path.write_text(json.dumps({"input_size": INPUT_SIZE, "entries": self.entries}))
+        return dict(counts)
+
+    def _rewrite(self, data_dir: Path, keep: list, new: list, workers: int, counts: Counter) -> list:
+        """Write kept rows then newly preprocessed ones contiguously; returns the new records that decoded"""
+        old = self.tensors() if self.entries and self.tensor_path.exists() else None
+        tmp_path = self.tensor_path.with_suffix(".tmp")
+        out = np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=(len(keep) + len(new), *ROW_SHAPE))
+        for row, entry in enumerate(keep):
+            out[row] = old[entry["row"]]
+            entry["row"] = row
+
+        # Images that fail to decode take no row, so the next good one goes where they would have
+        added = []
+        row = len(keep)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = pool.map(lambda record: self._try_preprocess(data_dir / record["path"]), new)
+            for record, pixels in zip(new, rows):
+                if pixels is None:
+                    continue
+                out[row] = pixels
+                record["row"] = row
+                added.append(record)
+                row += 1
+        counts["preprocessed"] = len(added)
+        counts["failed"] = len(new) - len(added)
+
+        out.flush()
+        del out, old
+        # Only failures leave unused space, all of it after the last written row
+        with open(tmp_path, "r+b") as f:
+            f.truncate(row * int(np.prod(ROW_SHAPE)))
+        tmp_path.replace(self.tensor_path)
+        return added
+
+    def _try_preprocess(self, path: Path):
+        try:
+            return preprocess_row(path)
+        except OSError as e:
+            print(f"Skipping {path}: {e}")
+            return None
+
+    def iter_batches(self, batch_size: int = BATCH_SIZE):
+        """Yield (uint8 batch view, labels) straight from the memory map, in row order"""
+        tensors = self.tensors()
+        labels = np.array([entry["label"] for entry in self.entries])
+        for start in range(0, len(self.entries), batch_size):
+            # Slicing a memmap is a view: pages are read from disk only as the model consumes them
+            yield tensors[start:start + batch_size], labels[start:start + batch_size]
+
+def evaluate(model, cache: TensorCache, batch_size: int = BATCH_SIZE) -> dict:
+    """Accuracy, confusion matrix, throughput and severity distribution over the cached dataset"""
+    num_classes = len(CLASS_NAMES)
+    confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+    severities = {name: Counter() for name in CLASS_NAMES}
+    model_time = 0.0
+
+    start = time.perf_counter()
+    for pixels, labels in cache.iter_batches(batch_size):
+        batch = pixels.astype(np.float32) / 255.0
+        model_start = time.perf_counter()
+        probabilities = predict_probabilities(model, batch)
+        model_time += time.perf_counter() - model_start
+
+        predicted = np.argmax(probabilities, axis=-1)
+        np.add.at(confusion, (labels, predicted), 1)
+        for probs in probabilities:
+            # Same class/confidence/severity mapping as /predict
+            predicted_class, _, severity = top_prediction(probs)
+            severities[predicted_class][severity] += 1
+    total_time = time.perf_counter() - start
+
+    count = int(confusion.sum())
+    support = confusion.sum(axis=1)
+    predicted_counts = confusion.sum(axis=0)
+    return {
+        "images": count,
+        "accuracy": float(np.trace(confusion) / count) if count else None,
+        "per_class": {
+            name: {
+                "support": int(support[i]),
+                "recall": float(confusion[i, i] / support[i]) if support[i] else None,
+                "precision": float(confusion[i, i] / predicted_counts[i]) if predicted_counts[i] else None,
+            }
+            for i, name in enumerate(CLASS_NAMES)
+        },
+        "confusion_matrix": {"labels": CLASS_NAMES, "rows_true_cols_predicted": confusion.tolist()},
+        "severity_distribution": {
+            name: {severity: counts[severity] for severity in SEVERITIES} for name, counts in severities.items()
+        },
+        "throughput": {
+            "images_per_second": count / total_time if total_time else None,
+            "model_images_per_second": count / model_time if model_time else None,
+            "seconds": total_time,
+        },
+    }
+
+def print_report(report: dict):
+    """Human-readable summary of an evaluation"""
+    print(f"\nImages: {report['images']}   Accuracy: {report['accuracy']:.1%}")
+    width = max(len(name) for name in CLASS_NAMES) + 2
+    print("\nConfusion matrix (rows: true, columns: predicted)")
+    print(" " * width + "".join(f"{name[:12]:>14}" for name in CLASS_NAMES))
+    for name, row in zip(CLASS_NAMES, report["confusion_matrix"]["rows_true_cols_predicted"]):
+        print(f"{name:<{width}}" + "".join(f"{value:>14}" for value in row))
+
+    print(f"\n{'Class':<{width}}{'support':>9}{'recall':>9}{'precision':>11}{'low':>7}{'medium':>8}{'high':>7}")
+    for name in CLASS_NAMES:
+        stats = report["per_class"][name]
+        severity = report["severity_distribution"][name]
+        recall = f"{stats['recall']:.1%}" if stats["recall"] is not None else "-"
+        precision = f"{stats['precision']:.1%}" if stats["precision"] is not None else "-"
+        print(f"{name:<{width}}{stats['support']:>9}{recall:>9}{precision:>11}"
+              f"{severity['low']:>7}{severity['medium']:>8}{severity['high']:>7}")
+
+    throughput = report["throughput"]
+    print(f"\nThroughput: {throughput['images_per_second']:.1f} images/s end to end, "
+          f"{throughput['model_images_per_second']:.1f} images/s in the model")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a model on a labeled image folder (one subfolder per class)")
+    parser.add_argument("data", type=Path, help="Dataset folder, e.g. dataset/powdery_mildew/*.jpg")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model instead of --model")
+    parser.add_argument("--cache", type=Path, help="Tensor cache directory (default: data/tensor_cache/<dataset>)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=8, help="Threads for preprocessing new images")
+    parser.add_argument("--json", type=Path, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    data_dir = args.data.resolve()
+    cache_dir = args.cache or TENSOR_CACHE_DIR / f"{data_dir.name}-{hashlib.sha1(str(data_dir).encode()).hexdigest()[:8]}"
+    cache = TensorCache(cache_dir)
+    start = time.perf_counter()
+    changes = cache.update(data_dir, args.workers)
+    print(f"Tensor cache {cache_dir}: {len(cache.entries)} images {changes} in {time.perf_counter() - start:.1f}s")
+    if not cache.entries:
+        raise SystemExit(f"No readable images in {data_dir}")
+
+    from standin_model import load_model
+    model = load_model(args.model, standin=args.standin)
+    report = evaluate(model, cache, args.batch_size)
+    report["model"] = "standin" if args.standin else str(args.model)
+    report["cache"] = {"directory": str(cache_dir), **changes}
+    print_report(report)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"Saved {args.json}")
+
+if __name__ == "__main__":
+    main()
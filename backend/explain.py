@@ -0,0 +1,108 @@
+import base64
+import io
+import os
+from PIL import Image
+import numpy as np
+import tensorflow as tf
+
+from inference import INPUT_SIZE, softmax, top_prediction
+
+EXPLAIN_FORMATS = ("png", "array")
+# Explanations kept per model version and image hash (a PNG overlay is a few tens of KB)
+EXPLAIN_CACHE_SIZE = int(os.environ.get("EXPLAIN_CACHE_SIZE", 512))
+# Peak opacity of the heatmap over the photo; cold regions stay untouched
+OVERLAY_ALPHA = float(os.environ.get("EXPLAIN_OVERLAY_ALPHA", 0.5))
+OVERLAY_COLORS = 64  # Palette size of overlay PNGs
+
+def feature_model(model: tf.keras.Model) -> tuple:
+    """(layer name, model returning (last spatial feature map, model output)) for a classifier"""
+    if isinstance(model, tf.keras.Sequential):
+        # A loaded Sequential's layer tensors span more than one graph; chain the layers into a fresh one
+        x = inputs = tf.keras.Input(model.input_shape[1:])
+        name = features = None
+        for layer in model.layers:
+            x = layer(x)
+            if len(x.shape) == 4:
+                name, features = layer.name, x
+        if features is not None:
+            return name, tf.keras.Model(inputs, [features, x])
+    else:
+        layers = [layer for layer in model.layers if not isinstance(layer, tf.keras.layers.InputLayer)]
+        for consumer, producer in zip(reversed(layers), reversed(layers[:-1])):
+            # A nested backbone's own .output belongs to its inner graph; the next layer's input is wired into this one
+            features = consumer.input
+            if not isinstance(features, (list, tuple)) and len(features.shape) == 4 and len(producer.output.shape) == 4:
+                return producer.name, tf.keras.Model(model.inputs, [features, model.outputs[0]])
+    raise ValueError(f"{model.name} has no convolutional feature map to explain")
+
+class GradCam:
+    """Grad-CAM heatmaps for each image's top class, a whole batch per gradient pass"""
+
+    def __init__(self, model: tf.keras.Model):
+        self.layer_name, self._model = feature_model(model)
+        # Any batch size reuses one trace
+        self._explain = tf.function(
+            self._gradcam, input_signature=[tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 3), tf.float32)]
+        )
+
+    def _gradcam(self, batch):
+        with tf.GradientTape() as tape:
+            features, outputs = self._model(batch, training=False)
+            scores = tf.reduce_max(outputs, axis=-1)
+        # Rows don't interact at inference, so the gradient of the summed scores is each row's own gradient
+        gradients = tape.gradient(scores, features)
+        weights = tf.reduce_mean(gradients, axis=(1, 2), keepdims=True)
+        heatmaps = tf.nn.relu(tf.reduce_sum(features * weights, axis=-1))
+        heatmaps /= tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True) + 1e-8
+        return heatmaps, outputs
+
+    def explain(self, batch: np.ndarray) -> tuple:
+        """(heatmaps in [0, 1] at the feature-map resolution, class probabilities) for a batch"""
+        heatmaps, outputs = self._explain(tf.constant(batch, dtype=tf.float32))
+        return heatmaps.numpy(), softmax(outputs.numpy())
+
+def build_explainer(model):
+    """Grad-CAM for a served model, or None if its graph isn't in this process or has no feature map"""
+    # Gradients run through the Keras graph, not the XLA buckets
+    model = getattr(model, "keras_model", model)
+    if not isinstance(model, tf.keras.Model):
+        return None
+    try:
+        return GradCam(model)
+    except ValueError as e:
+        print(f"Explanations unavailable: {e}")
+        return None
+
+def colorize(heat: np.ndarray) -> np.ndarray:
+    """Map [0, 1] heat to RGB in [0, 1], blue (cold) through green and yellow to red (hot)"""
+    heat = heat[..., None]
+    return np.clip(1.5 - np.abs(4 * heat - np.array([3.0, 2.0, 1.0])), 0, 1)
+
+def upsample(heatmap: np.ndarray, size: tuple) -> np.ndarray:
+    """Bilinear resize of a heatmap to (width, height)"""
+    return np.asarray(Image.fromarray(heatmap.astype(np.float32), mode="F").resize(size, Image.BILINEAR))
+
+def overlay_png(image: np.ndarray, heatmap: np.ndarray, alpha: float = OVERLAY_ALPHA) -> bytes:
+    """Blend the heatmap over a [0, 1] HxWx3 image and encode it as a palette PNG"""
+    heat = np.clip(upsample(heatmap, (image.shape[1], image.shape[0])), 0, 1)
+    weight = alpha * heat[..., None]
+    blended = image * (1 - weight) + colorize(heat) * weight
+    overlay = Image.fromarray(np.clip(blended * 255 + 0.5, 0, 255).astype(np.uint8)).quantize(OVERLAY_COLORS)
+    buffer = io.BytesIO()
+    overlay.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+def build_explanation(heatmap: np.ndarray, image: np.ndarray, probabilities: np.ndarray, fmt: str,
+                      layer_name: str) -> dict:
+    """Response payload for one image: a base64 PNG overlay or the low-res heatmap itself"""
+    explanation = {
+        "method": "grad-cam",
+        "layer": layer_name,
+        "explained_class": top_prediction(probabilities)[0],
+        "grid": list(heatmap.shape),
+    }
+    if fmt == "png":
+        explanation["png"] = "data:image/png;base64," + base64.b64encode(overlay_png(image, heatmap)).decode("ascii")
+    else:
+        explanation["heatmap"] = np.round(heatmap, 3).tolist()
+    return explanation
@@ -0,0 +1,199 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+HISTORY_DB_PATH = Path(os.environ.get("HISTORY_DB_PATH", Path(__file__).parent / "data" / "history.db"))
+HISTORY_BATCH_SIZE = 200
+HISTORY_FLUSH_INTERVAL = 0.5  # Seconds a record may wait before its batch is written
+HISTORY_QUEUE_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diagnoses (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    predicted_class TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    severity TEXT NOT NULL,
+    image_hash TEXT,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_diagnoses_created_at ON diagnoses (created_at);
+CREATE INDEX IF NOT EXISTS idx_diagnoses_class ON diagnoses (predicted_class);
+CREATE INDEX IF NOT EXISTS idx_diagnoses_severity ON diagnoses (severity);
+CREATE INDEX IF NOT EXISTS idx_diagnoses_day_class ON diagnoses (day, predicted_class);
+"""
+
+COLUMNS = ("id", "created_at", "day", "predicted_class", "confidence", "severity", "image_hash", "source")
+
+class HistoryStore:
+    """Append-only SQLite (WAL) diagnosis history written by a background batch writer"""
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=HISTORY_QUEUE_SIZE)
+        self._writer = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection configured for concurrent WAL readers"""
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Per-thread read connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def start(self):
+        """Start the background writer"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+            self._writer.start()
+
+    def close(self):
+        """Flush pending records and stop the writer"""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def record(self, result: dict, image_hash: str = None, source: str = "predict"):
+        """Queue a diagnosis for writing; never blocks the request path"""
+        now = time.time()
+        row = (
+            now,
+            datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d"),
+            result["predicted_class"],
+            float(result["confidence"]),
+            result["severity"],
+            image_hash,
+            source,
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        """Group queued records into one transaction per batch (in thread)"""
+        conn = self._connect()
+        running = True
+        while running:
+            batch = []
+            deadline = None
+            while len(batch) < HISTORY_BATCH_SIZE:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is None:
+                    running = False
+                    break
+                batch.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + HISTORY_FLUSH_INTERVAL
+
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO diagnoses (created_at, day, predicted_class, confidence, severity, image_hash, source) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                    self.written += len(batch)
+                    self.batches += 1
+                except sqlite3.Error as e:
+                    self.dropped += len(batch)
+                    print(f"Error writing diagnosis history: {e}")
+        conn.close()
+
+    def recent(self, limit: int = 50, before_id: int = None, predicted_class: str = None,
+               severity: str = None, since: float = None, until: float = None) -> list:
+        """Newest-first page of diagnoses using keyset pagination on id"""
+        clauses, params = [], []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if predicted_class is not None:
+            clauses.append("predicted_class = ?")
+            params.append(predicted_class)
+        if severity is not None:
+            clauses.append("severity = ?")
+            params.append(severity)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM diagnoses {where} ORDER BY id DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts_by_class(self, since_day: str = None, until_day: str = None) -> dict:
+        """Diagnosis counts per class, answered from the (day, predicted_class) covering index"""
+        where, params = self._day_range(since_day, until_day)
+        rows = self._reader().execute(
+            f"SELECT predicted_class, COUNT(*) FROM diagnoses INDEXED BY idx_diagnoses_day_class {where} "
+            "GROUP BY predicted_class ORDER BY predicted_class",
+            params,
+        ).fetchall()
+        return {predicted_class: count for predicted_class, count in rows}
+
+    def counts_by_day(self, since_day: str = None, until_day: str = None) -> list:
+        """Diagnosis counts per day and class, answered from the (day, predicted_class) covering index"""
+        where, params = self._day_range(since_day, until_day)
+        rows = self._reader().execute(
+            f"SELECT day, predicted_class, COUNT(*) FROM diagnoses INDEXED BY idx_diagnoses_day_class {where} "
+            "GROUP BY day, predicted_class ORDER BY day",
+            params,
+        ).fetchall()
+
+        days = {}
+        for day, predicted_class, count in rows:
+            days.setdefault(day, {})[predicted_class] = count
+        return [{"day": day, "counts": counts, "total": sum(counts.values())} for day, counts in days.items()]
+
+    def _day_range(self, since_day: str, until_day: str) -> tuple:
+        """WHERE clause for an inclusive YYYY-MM-DD range"""
+        clauses, params = [], []
+        if since_day is not None:
+            clauses.append("day >= ?")
+            params.append(since_day)
+        if until_day is not None:
+            clauses.append("day <= ?")
+            params.append(until_day)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def stats(self) -> dict:
+        """Writer counters"""
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
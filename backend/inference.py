@@ -0,0 +1,57 @@
+from pathlib import Path
+from PIL import Image
+import numpy as np
+import os
+
+MODEL_PATH = Path(os.environ.get("MODEL_PATH", Path(__file__).parent / "models" / "best_plant_model_final.keras"))
+
+# Update these class names based on your model's output classes
+CLASS_NAMES = ["Healthy Plant", "Leaf Spot Disease", "Powdery Mildew"]  # Adjust to match your model
+
+# Model input size (adjust based on your model's input requirements)
+INPUT_SIZE = 224  # Most models use 224x224
+
+def preprocess_image(img: Image.Image) -> np.ndarray:
+    """Preprocess image for model prediction"""
+    # Convert to RGB and resize (clients may already send INPUT_SIZE images)
+    img = img.convert("RGB")
+    if img.size != (INPUT_SIZE, INPUT_SIZE):
+        img = img.resize((INPUT_SIZE, INPUT_SIZE))
+
+    # Convert to array and normalize
+    img_array = np.array(img) / 255.0
+
+    # Add batch dimension
+    return np.expand_dims(img_array, 0)
+
+def preprocess_tensor(data: bytes, shape: tuple) -> np.ndarray:
+    """Turn a raw uint8 HxWx3 upload into a model batch without decoding or resizing"""
+    img_array = np.frombuffer(data, dtype=np.uint8).reshape(shape) / 255.0
+    return np.expand_dims(img_array, 0)
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Numerically stable softmax over the last axis"""
+    logits = np.asarray(logits, dtype=np.float32)
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+def predict_probabilities(model, batch: np.ndarray) -> np.ndarray:
+    """Run one forward pass over a batch and return per-image class probabilities"""
+    return softmax(model.predict(batch, verbose=0))
+
+def get_severity(predicted_class: str, confidence: float) -> str:
+    """Determine severity based on disease type and confidence"""
+    severity = "low"
+    if predicted_class != "Healthy Plant":
+        if confidence > 0.8:
+            severity = "high"
+        elif confidence > 0.6:
+            severity = "medium"
+    return severity
+
+def top_prediction(probabilities: np.ndarray) -> tuple:
+    """Return (predicted_class, confidence, severity) for one probability vector"""
+    predicted_index = int(np.argmax(probabilities))
+    confidence = float(probabilities[predicted_index])
+    predicted_class = CLASS_NAMES[predicted_index] if predicted_index < len(CLASS_NAMES) else "Unknown"
+    return predicted_class, confidence, get_severity(predicted_class, confidence)
@@ -0,0 +1,215 @@
+from pathlib import Path
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUE_DB_PATH = Path(os.environ.get("QUEUE_DB_PATH", Path(__file__).parent / "data" / "queue.db"))
+SPOOL_DIR = Path(os.environ.get("SPOOL_DIR", Path(__file__).parent / "data" / "spool"))
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_TIMEOUT = 300.0  # Seconds a worker may hold a job before it is retried
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    timeout REAL NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_expires REAL,
+    worker TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_queue_jobs_claim ON queue_jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS idx_queue_jobs_lease ON queue_jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS queue_results (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+class JobQueue:
+    """Durable priority job queue in SQLite, with uploaded images spooled to disk"""
+
+    def __init__(self, db_path=QUEUE_DB_PATH, spool_dir=SPOOL_DIR):
+        self.db_path = Path(db_path)
+        self.spool_dir = Path(spool_dir)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._conn.executescript(SCHEMA)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Per-thread connection; the API calls in from many threadpool threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(
+                self.db_path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def enqueue(self, kind: str, items: list, params: dict = None, priority: int = 0,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, timeout: float = DEFAULT_TIMEOUT) -> str:
+        """Spool (filename, bytes) items to disk and queue them as one job"""
+        job_id = uuid.uuid4().hex
+        job_dir = self.spool_dir / job_id
+        job_dir.mkdir()
+        for i, (filename, data) in enumerate(items):
+            safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", filename or "image")
+            (job_dir / f"{i:05d}_{safe_name}").write_bytes(data)
+
+        # The row is written last, so workers never see a job whose files are incomplete
+        self._conn.execute(
+            "INSERT INTO queue_jobs (id, kind, params, priority, status, max_attempts, timeout, total, created_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params or {}), priority, max_attempts, timeout, len(items), time.time()),
+        )
+        return job_id
+
+    def spooled_items(self, job_id: str) -> list:
+        """(index, filename, path) for every spooled file of a job"""
+        items = []
+        for path in sorted((self.spool_dir / job_id).iterdir()):
+            index, _, filename = path.name.partition("_")
+            items.append((int(index), filename, path))
+        return items
+
+    def claim(self, worker: str) -> dict:
+        """Atomically take the highest-priority, oldest queued job"""
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT id, timeout FROM queue_jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            self._conn.execute(
+                "UPDATE queue_jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                "lease_expires = ?, worker = ? WHERE id = ?",
+                (now, now + row["timeout"], worker, row["id"]),
+            )
+            # Results from an earlier, failed attempt are recomputed
+            self._conn.execute("DELETE FROM queue_results WHERE job_id = ?", (row["id"],))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"], include_results=False)
+
+    def add_results(self, job_id: str, results: list):
+        """Store finished (index, result dict) pairs so progress is visible before completion"""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO queue_results (job_id, idx, result) VALUES (?, ?, ?)",
+            [(job_id, index, json.dumps(result)) for index, result in results],
+        )
+
+    def complete(self, job_id: str):
+        """Mark a job done and drop its spooled images"""
+        self._conn.execute(
+            "UPDATE queue_jobs SET status = 'done', finished_at = ?, lease_expires = NULL, error = NULL "
+            "WHERE id = ? AND status = 'running'",
+            (time.time(), job_id),
+        )
+        shutil.rmtree(self.spool_dir / job_id, ignore_errors=True)
+
+    def fail(self, job_id: str, error: str):
+        """Requeue a failed attempt, or fail the job for good once attempts run out"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts FROM queue_jobs WHERE id = ? AND status = 'running'", (job_id,)
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return
+            final = row["attempts"] >= row["max_attempts"]
+            self._conn.execute(
+                "UPDATE queue_jobs SET status = ?, error = ?, lease_expires = NULL, worker = NULL, "
+                "finished_at = ? WHERE id = ?",
+                ("failed" if final else "queued", error, time.time() if final else None, job_id),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        if final:
+            shutil.rmtree(self.spool_dir / job_id, ignore_errors=True)
+
+    def expired(self) -> list:
+        """Running jobs whose worker has held them past their timeout"""
+        rows = self._conn.execute(
+            "SELECT id, worker FROM queue_jobs WHERE status = 'running' AND lease_expires < ?", (time.time(),)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def release_worker(self, worker: str, error: str):
+        """Fail every job held by a worker that died"""
+        rows = self._conn.execute(
+            "SELECT id FROM queue_jobs WHERE status = 'running' AND worker = ?", (worker,)
+        ).fetchall()
+        for row in rows:
+            self.fail(row["id"], error)
+
+    def requeue_worker(self, worker: str) -> int:
+        """Put back every job held by a worker that was stopped on purpose; the attempt doesn't count"""
+        cursor = self._conn.execute(
+            "UPDATE queue_jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), started_at = NULL, "
+            "lease_expires = NULL, worker = NULL WHERE status = 'running' AND worker = ?",
+            (worker,),
+        )
+        return cursor.rowcount
+
+    def get(self, job_id: str, include_results: bool = True) -> dict:
+        """Job status (and stored results, in index order)"""
+        row = self._conn.execute("SELECT * FROM queue_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["completed"] = self._conn.execute(
+            "SELECT COUNT(*) FROM queue_results WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        if include_results:
+            job["results"] = [
+                {"index": idx, **json.loads(result)}
+                for idx, result in self._conn.execute(
+                    "SELECT idx, result FROM queue_results WHERE job_id = ? ORDER BY idx", (job_id,)
+                )
+            ]
+        return job
+
+    def stats(self) -> dict:
+        """Number of jobs in each state"""
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM queue_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+
+JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", 16))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+JOB_TTL = 3600  # Seconds finished jobs stay queryable
+HEARTBEAT_INTERVAL = 15.0  # Seconds between keep-alives on idle streams
+SHUTDOWN_ERROR = "Server shut down before the job finished"
+
+class Job:
+    """One submitted batch of items whose results arrive incrementally"""
+
+    def __init__(self, kind: str, items: list, batch_size: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.total = len(items)
+        self.batch_size = batch_size
+        self.status = "queued"
+        self.error = None
+        self.results = []
+        self.created_at = time.time()
+        self.first_result_at = None
+        self.finished_at = None
+        self._items = items
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def add_results(self, results: list):
+        """Publish finished items (worker thread)"""
+        with self._lock:
+            if self.first_result_at is None:
+                self.first_result_at = time.time()
+            self.results.extend(results)
+        self._notify()
+
+    def finish(self, error: str = None):
+        """Mark the job complete (worker thread)"""
+        with self._lock:
+            self.status = "failed" if error else "done"
+            self.error = error
+            self.finished_at = time.time()
+            self._items = None  # Release the uploaded images
+        self._notify()
+
+    def _notify(self):
+        """Wake every stream waiting on this job, whatever event loop it runs on"""
+        for loop, event in list(self._waiters):
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self, cursor: int, timeout: float = HEARTBEAT_INTERVAL) -> bool:
+        """Wait until there are results past `cursor` or the job finishes; False on timeout"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        self._waiters.add(waiter)
+        try:
+            if len(self.results) > cursor or self.done:
+                return True
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(waiter)
+
+    def summary(self, include_results: bool = False) -> dict:
+        """Job status, progress and time-to-first-result"""
+        summary = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "completed": len(self.results),
+            "error": self.error,
+            "created_at": self.created_at,
+            "time_to_first_result_ms": (
+                round((self.first_result_at - self.created_at) * 1000, 1) if self.first_result_at else None
+            ),
+            "duration_ms": round((self.finished_at - self.created_at) * 1000, 1) if self.finished_at else None,
+        }
+        if include_results:
+            summary["results"] = list(self.results)
+        return summary
+
+class JobManager:
+    """Runs prediction jobs on background threads, one batch at a time"""
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def submit(self, kind: str, items: list, process_batch, batch_size: int = JOB_BATCH_SIZE) -> Job:
+        """Queue `items`; `process_batch(items)` must return one result dict per item"""
+        job = Job(kind, items, batch_size)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, process_batch)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """Look up a job by id"""
+        return self._jobs.get(job_id)
+
+    def _run(self, job: Job, process_batch):
+        """Process a job batch by batch, publishing results as each batch completes (in thread)"""
+        job.status = "running"
+        try:
+            items = job._items
+            for start in range(0, len(items), job.batch_size):
+                if self._stopping.is_set():
+                    job.finish(error=SHUTDOWN_ERROR)
+                    return
+                chunk = items[start:start + job.batch_size]
+                results = process_batch(chunk)
+                job.add_results([
+                    {"index": start + i, **result} for i, result in enumerate(results)
+                ])
+            job.finish()
+        except Exception as e:
+            job.finish(error=str(e))
+
+    def _expire(self):
+        """Forget finished jobs older than JOB_TTL"""
+        cutoff = time.time() - JOB_TTL
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        """Drop queued jobs, wait for running ones to finish their current batch, and end every open stream"""
+        self._stopping.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        # Jobs whose futures were cancelled never ran; fail them so their streams send a final event
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.done:
+                    job.finish(error=SHUTDOWN_ERROR)
+
+async def stream_events(job: Job, stream_format: str = "sse", cursor: int = 0):
+    """Yield job results as Server-Sent Events or NDJSON lines as they become available"""
+    while True:
+        ready = await job.wait(cursor)
+        results = job.results[cursor:]
+        for result in results:
+            if stream_format == "ndjson":
+                yield json.dumps({"event": "result", **result}) + "\n"
+            else:
+                yield f"id: {result['index']}\nevent: result\ndata: {json.dumps(result)}\n\n"
+        cursor += len(results)
+
+        if job.done and cursor >= len(job.results):
+            summary = job.summary()
+            if stream_format == "ndjson":
+                yield json.dumps({"event": "done", **summary}) + "\n"
+            else:
+                yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+            return
+
+        if not ready:
+            # Keep proxies from closing an idle stream
+            yield "\n" if stream_format == "ndjson" else ": keep-alive\n\n"
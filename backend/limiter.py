@@ -0,0 +1,97 @@
+from collections import Counter, deque
+import math
+import os
+import time
+import numpy as np
+
+LIMIT_INITIAL = int(os.environ.get("LIMIT_INITIAL", 8))
+LIMIT_MIN = int(os.environ.get("LIMIT_MIN", 1))
+LIMIT_MAX = int(os.environ.get("LIMIT_MAX", 64))
+# Latency above this multiple of the no-load baseline counts as congestion
+LIMIT_LATENCY_TOLERANCE = float(os.environ.get("LIMIT_LATENCY_TOLERANCE", 2.0))
+LIMIT_BACKOFF = 0.9  # Multiplicative decrease on congestion
+# Share of the limit one client may hold before getting 429 instead of the others getting 503.
+# Off (1.0) by default: behind a proxy every request looks like one client unless LIMIT_CLIENT_HEADER is set
+LIMIT_CLIENT_SHARE = float(os.environ.get("LIMIT_CLIENT_SHARE", 1.0))
+# Header a trusted proxy sets to the real client (e.g. X-Forwarded-For); its last entry is the one that proxy saw
+LIMIT_CLIENT_HEADER = os.environ.get("LIMIT_CLIENT_HEADER", "")
+# The baseline is the fastest of this many recent requests, so it follows a model swap up or down
+BASELINE_WINDOW = 200
+LATENCY_WINDOW = 500
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by observed request latency"""
+
+    def __init__(self, initial: int = LIMIT_INITIAL, min_limit: int = LIMIT_MIN, max_limit: int = LIMIT_MAX,
+                 tolerance: float = LIMIT_LATENCY_TOLERANCE, client_share: float = LIMIT_CLIENT_SHARE):
+        # Only touched on the event loop, so no lock is needed
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.client_share = client_share
+        self.in_flight = 0
+        self.baseline = None  # Seconds; the fastest of the last BASELINE_WINDOW requests
+        self.counts = Counter()
+        self._clients = Counter()
+        self._last_decrease = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._recent = deque(maxlen=BASELINE_WINDOW)
+
+    def try_acquire(self, client: str) -> int:
+        """Take a slot; returns 0 on success, else the status code to shed with (503 or 429)"""
+        if self.in_flight >= int(self.limit):
+            self.counts["shed_503"] += 1
+            return 503
+        if self._clients[client] >= max(1, int(self.limit * self.client_share)):
+            # One client is hogging the slots; push back on it, not on everybody
+            self.counts["shed_429"] += 1
+            return 429
+        self.in_flight += 1
+        self._clients[client] += 1
+        self.counts["accepted"] += 1
+        return 0
+
+    def release(self, client: str, latency: float, failed: bool = False):
+        """Free a slot and adapt the limit to how long the request took"""
+        self.in_flight -= 1
+        self._clients[client] -= 1
+        if not self._clients[client]:
+            del self._clients[client]
+        if failed:
+            return
+
+        self._latencies.append(latency)
+        self._recent.append(latency)
+        self.baseline = min(self._recent)
+
+        now = time.monotonic()
+        if latency > self.baseline * self.tolerance:
+            # At most one decrease per round trip, so a single slow burst doesn't collapse the limit
+            if now - self._last_decrease > latency:
+                self.limit = max(self.min_limit, self.limit * LIMIT_BACKOFF)
+                self._last_decrease = now
+                self.counts["decreases"] += 1
+        elif self.in_flight + 1 >= self.limit / 2:
+            # Only grow while the limit is actually being used; about +1 per limit's worth of requests
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: roughly the time to drain the current queue"""
+        latency = np.median(self._latencies) if self._latencies else 1.0
+        return max(1, math.ceil(latency * self.in_flight / max(self.limit, 1)))
+
+    def stats(self) -> dict:
+        """Current limit, usage, latency baseline and shed counters"""
+        latencies = np.array(self._latencies) * 1000
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "baseline_ms": self.baseline * 1000 if self.baseline is not None else None,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+            "accepted": self.counts["accepted"],
+            "shed_503": self.counts["shed_503"],
+            "shed_429": self.counts["shed_429"],
+            "decreases": self.counts["decreases"],
+        }
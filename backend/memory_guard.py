@@ -0,0 +1,107 @@
+import gc
+import os
+import signal
+import time
+
+# Recycle the worker past either limit (0 disables); a supervisor (uvicorn --workers, shm_inference.py) starts a fresh one
+RECYCLE_MAX_RSS_MB = float(os.environ.get("RECYCLE_MAX_RSS_MB", 0))
+RECYCLE_MAX_REQUESTS = int(os.environ.get("RECYCLE_MAX_REQUESTS", 0))
+RSS_CHECK_INTERVAL = 1.0  # Seconds between RSS reads
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def tf_memory() -> dict:
+    """TensorFlow allocator bytes (current, peak) per device that reports them"""
+    import tensorflow as tf
+    stats = {}
+    for device in ["CPU:0"] + [f"GPU:{i}" for i in range(len(tf.config.list_physical_devices("GPU")))]:
+        try:
+            stats[device] = tf.config.experimental.get_memory_info(device)
+        except (ValueError, RuntimeError):
+            pass
+    return stats
+
+def memory_sample() -> dict:
+    """RSS, Python-heap and TensorFlow memory right now"""
+    import tracemalloc
+    traced, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    return {
+        "rss_mb": rss_bytes() / 2**20,
+        "tracemalloc_mb": traced / 2**20 if traced is not None else None,
+        "tracemalloc_peak_mb": traced_peak / 2**20 if traced_peak is not None else None,
+        "gc_objects": len(gc.get_objects()),
+        "tf": {device: {key: value / 2**20 for key, value in info.items()} for device, info in tf_memory().items()},
+    }
+
+def recycle_self():
+    """Ask this server process to shut down gracefully (in-flight requests finish first)"""
+    os.kill(os.getpid(), signal.SIGTERM)
+
+class MemoryGuard:
+    """Recycles the worker once it has served too many predictions or its RSS passes a limit"""
+
+    def __init__(self, max_rss_mb: float = RECYCLE_MAX_RSS_MB, max_requests: int = RECYCLE_MAX_REQUESTS,
+                 on_recycle=recycle_self):
+        self.max_rss_mb = max_rss_mb
+        self.max_requests = max_requests
+        self.on_recycle = on_recycle
+        self.started_rss_mb = None  # Taken at the first prediction, once the model is loaded and warm
+        self.rss_mb = rss_bytes() / 2**20
+        self.requests = 0
+        self.recycling = False
+        self.reason = None
+        self._last_check = 0.0
+
+    def observe(self):
+        """Count one served prediction and recycle if a limit is reached (event loop only, so no lock)"""
+        self.requests += 1
+        if self.recycling:
+            return
+
+        now = time.monotonic()
+        if now - self._last_check >= RSS_CHECK_INTERVAL:
+            self._last_check = now
+            self.rss_mb = rss_bytes() / 2**20
+            if self.started_rss_mb is None:
+                self.started_rss_mb = self.rss_mb
+
+        if self.max_requests and self.requests >= self.max_requests:
+            self.recycle(f"served {self.requests} predictions (limit {self.max_requests})")
+        elif self.max_rss_mb and self.rss_mb >= self.max_rss_mb:
+            self.recycle(f"RSS {self.rss_mb:.0f} MB (limit {self.max_rss_mb:.0f} MB)")
+
+    def recycle(self, reason: str):
+        """Start recycling this worker, once"""
+        if self.recycling:
+            return
+        self.recycling = True
+        self.reason = reason
+        print(f"Recycling worker {os.getpid()}: {reason}")
+        self.on_recycle()
+
+    def stats(self) -> dict:
+        """Current RSS, growth since start and the recycle limits"""
+        self.rss_mb = rss_bytes() / 2**20
+        return {
+            "pid": os.getpid(),
+            "requests": self.requests,
+            "rss_mb": self.rss_mb,
+            "rss_growth_mb": self.rss_mb - self.started_rss_mb if self.started_rss_mb is not None else None,
+            "max_rss_mb": self.max_rss_mb or None,
+            "max_requests": self.max_requests or None,
+            "recycling": self.recycling,
+            "reason": self.reason,
+        }
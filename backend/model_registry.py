@@ -0,0 +1,263 @@
+from collections import Counter, deque
+from pathlib import Path
+import os
+import random
+import re
+import shutil
+import threading
+import time
+import numpy as np
+import tensorflow as tf
+
+from inference import INPUT_SIZE, MODEL_PATH
+from embeddings import EMBEDDING_INDEX_DIR, VectorIndex, build_embedding_model
+from xla_compile import XLA_JIT, CompiledModel
+from explain import build_explainer
+from shm_inference import INFERENCE_BACKEND, RemoteModel, get_client
+
+MODELS_DIR = Path(os.environ.get("MODELS_DIR", MODEL_PATH.parent))
+MODEL_POLL_INTERVAL = float(os.environ.get("MODEL_POLL_INTERVAL", 5.0))
+MODEL_EXTENSIONS = {".keras", ".h5"}
+LATENCY_WINDOW = 1000  # Recent requests kept per version for percentiles
+
+def prune_indexes(file_name: str, keep: str):
+    """Delete the embedding indexes of earlier versions of a model file, including ones from before a restart"""
+    stale = re.compile(re.escape(file_name) + r"-\d+")
+    for directory in EMBEDDING_INDEX_DIR.glob("*"):
+        if directory.name != keep and stale.fullmatch(directory.name) and directory.is_dir():
+            shutil.rmtree(directory, ignore_errors=True)
+
+class ModelVersion:
+    """A loaded and warmed-up model file plus its serving stats"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Nanoseconds, so a file replaced within the same second still gets a new name (and fresh caches and index)
+        self.mtime = path.stat().st_mtime_ns
+        self.name = f"{path.name}@{self.mtime}"
+        if INFERENCE_BACKEND == "shm":
+            # The inference process holds the only copy of the weights; this worker just sends it tensors
+            self.model = RemoteModel(get_client(), with_embeddings=False)
+            self.embedding_model = RemoteModel(get_client(), with_embeddings=True)
+        else:
+            self.model = tf.keras.models.load_model(path)
+            self.embedding_model = build_embedding_model(self.model)
+        if XLA_JIT and INFERENCE_BACKEND != "shm":
+            # Every batch bucket is compiled here, before the version starts serving
+            self.model = CompiledModel(self.model)
+            self.embedding_model = CompiledModel(self.embedding_model)
+            print(f"XLA compiled {path.name} for batches {list(self.model.buckets)} in "
+                  f"{(self.model.compile_ms + self.embedding_model.compile_ms) / 1000:.1f}s")
+
+        # Grad-CAM needs the Keras graph in this process, so none under the shm backend
+        self.explainer = build_explainer(self.model)
+
+        # Embedding spaces differ between versions, so each gets its own near-duplicate index
+        self.index = VectorIndex(EMBEDDING_INDEX_DIR / self.name.replace("@", "-"))
+
+        # Warm up so the first real request doesn't pay for graph tracing
+        self.embedding_model.predict(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32), verbose=0)
+        self.model.predict(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32), verbose=0)
+        if self.explainer is not None:
+            self.explainer.explain(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32))
+
+        self.loaded_at = time.time()
+        self.requests = 0
+        self.class_counts = Counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float, predicted_class: str):
+        """Record one served prediction"""
+        with self._lock:
+            self.requests += 1
+            self.class_counts[predicted_class] += 1
+            self._latencies.append(latency)
+
+    def stats(self) -> dict:
+        """Per-version latency and class distribution"""
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            return {
+                "name": self.name,
+                "file": self.path.name,
+                "loaded_at": self.loaded_at,
+                "requests": self.requests,
+                "latency_ms": {
+                    "mean": float(latencies.mean()) if len(latencies) else None,
+                    "p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                    "p95": float(np.percentile(latencies, 95)) if len(latencies) else None,
+                },
+                # Padding and compile time of the /predict path's compiled buckets
+                "xla": self.embedding_model.stats() if isinstance(self.embedding_model, CompiledModel) else None,
+                "class_distribution": {
+                    predicted_class: count / self.requests
+                    for predicted_class, count in self.class_counts.items()
+                },
+            }
+
+class ModelRegistry:
+    """Serves the primary model (plus an optional A/B candidate) and hot-reloads changed files"""
+
+    def __init__(self, models_dir=MODELS_DIR, primary: str = MODEL_PATH.name,
+                 poll_interval: float = MODEL_POLL_INTERVAL):
+        self.models_dir = Path(models_dir)
+        self.poll_interval = poll_interval
+        self.primary_file = primary
+        self.candidate_file = None
+        self.split_percent = 0.0
+        self.errors = {}
+        self._failed_mtimes = {}  # Don't retry a broken file until it changes again
+        self._versions = {}  # file name -> ModelVersion currently serving it
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    @property
+    def primary(self):
+        """The version serving the primary file, if loaded"""
+        return self._versions.get(self.primary_file)
+
+    @property
+    def candidate(self):
+        """The version serving the A/B candidate, if loaded"""
+        return self._versions.get(self.candidate_file) if self.candidate_file else None
+
+    def load(self, file_name: str) -> ModelVersion:
+        """Load (or reload) a model file and atomically swap it in once warm"""
+        path = self.models_dir / file_name
+        try:
+            version = ModelVersion(path)
+        except Exception as e:
+            self.errors[file_name] = str(e)
+            try:
+                self._failed_mtimes[file_name] = path.stat().st_mtime_ns
+            except OSError:
+                pass
+            print(f"Error loading model {path}: {e}")
+            return None
+
+        with self._lock:
+            # In-flight requests keep their reference to the old version
+            old = self._versions.get(file_name)
+            self._versions[file_name] = version
+            self._loading.discard(file_name)
+            self.errors.pop(file_name, None)
+            self._failed_mtimes.pop(file_name, None)
+        if old is not None and old.name != version.name:
+            # That embedding space is never served again
+            old.index.retire()
+        elif old is not None:
+            old.index.flush()
+        prune_indexes(file_name, version.index.directory.name)
+        print(f"Model {version.name} loaded and serving")
+        return version
+
+    def load_in_background(self, file_name: str):
+        """Load a model file on a background thread, once"""
+        with self._lock:
+            if file_name in self._loading:
+                return
+            self._loading.add(file_name)
+
+        def run():
+            if self.load(file_name) is None:
+                with self._lock:
+                    self._loading.discard(file_name)
+
+        threading.Thread(target=run, name=f"load-{file_name}", daemon=True).start()
+
+    def select(self, key: str = None) -> ModelVersion:
+        """Pick the version for a request; the same key always lands on the same side of the split"""
+        primary, candidate = self.primary, self.candidate
+        if candidate is None or primary is None or self.split_percent <= 0:
+            return primary or candidate
+
+        if key:
+            bucket = int(key[:8], 16) % 10000 / 100
+        else:
+            bucket = random.uniform(0, 100)
+        return candidate if bucket < self.split_percent else primary
+
+    def set_split(self, candidate_file: str = None, percent: float = 0.0):
+        """Send `percent` of traffic to `candidate_file` (loaded in the background if needed)"""
+        if candidate_file and INFERENCE_BACKEND == "shm":
+            raise RuntimeError("A/B splits need INFERENCE_BACKEND=local; the inference process serves one model")
+        if candidate_file and not (self.models_dir / candidate_file).is_file():
+            raise FileNotFoundError(f"No model file {candidate_file} in {self.models_dir}")
+
+        self.candidate_file = candidate_file
+        self.split_percent = percent if candidate_file else 0.0
+        if candidate_file and candidate_file not in self._versions:
+            self.load_in_background(candidate_file)
+
+    def promote(self, file_name: str):
+        """Make `file_name` the primary model once it is loaded"""
+        if INFERENCE_BACKEND == "shm":
+            raise RuntimeError("Promoting needs INFERENCE_BACKEND=local; restart the launcher with the new model")
+        if not (self.models_dir / file_name).is_file():
+            raise FileNotFoundError(f"No model file {file_name} in {self.models_dir}")
+
+        if file_name in self._versions:
+            self.primary_file = file_name
+        else:
+            def run():
+                if self.load(file_name) is not None:
+                    self.primary_file = file_name
+            threading.Thread(target=run, name=f"promote-{file_name}", daemon=True).start()
+
+        if self.candidate_file == file_name:
+            self.candidate_file = None
+            self.split_percent = 0.0
+
+    def available(self) -> list:
+        """Model files present in the models directory"""
+        return sorted(p.name for p in self.models_dir.glob("*") if p.suffix in MODEL_EXTENSIONS)
+
+    def start(self):
+        """Start watching the models directory for changed files"""
+        if INFERENCE_BACKEND == "shm":
+            return  # Reloading would only rename the version; the inference process keeps its weights
+        if self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def close(self):
+        """Stop the watcher and flush the versions' indexes"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        for version in list(self._versions.values()):
+            version.index.flush()
+
+    def _watch(self):
+        """Reload any served or wanted file whose mtime changed (in thread)"""
+        while not self._stop.wait(self.poll_interval):
+            wanted = {self.primary_file, self.candidate_file} - {None}
+            for file_name in wanted:
+                path = self.models_dir / file_name
+                if not path.is_file():
+                    continue
+                version = self._versions.get(file_name)
+                try:
+                    mtime = path.stat().st_mtime_ns
+                except OSError:
+                    continue  # File is being replaced
+                changed = version is None or mtime != version.mtime
+                if changed and self._failed_mtimes.get(file_name) != mtime:
+                    self.load_in_background(file_name)
+
+    def stats(self) -> dict:
+        """Registry state and per-version stats"""
+        return {
+            "primary": self.primary.name if self.primary else None,
+            "candidate": self.candidate.name if self.candidate else None,
+            "split_percent": self.split_percent,
+            "loading": sorted(self._loading),
+            "errors": dict(self.errors),
+            "versions": [version.stats() for version in self._versions.values()],
+            "available": self.available(),
+        }
@@ -0,0 +1,110 @@
+from collections import Counter
+import io
+import os
+import threading
+import time
+from PIL import Image
+import numpy as np
+
+# Opt-in until the thresholds are calibrated on real leaf photos (smooth close-ups can score low entropy)
+PREFILTER_ENABLED = os.environ.get("PREFILTER_ENABLED", "0") == "1"
+PREFILTER_SIZE = 64  # Checks run on a copy this small
+# Fraction of pixels that must look like plant tissue (green, or yellow/brown lesions)
+MIN_VEGETATION = float(os.environ.get("PREFILTER_MIN_VEGETATION", 0.05))
+MIN_BRIGHTNESS = float(os.environ.get("PREFILTER_MIN_BRIGHTNESS", 0.06))
+MAX_BRIGHTNESS = float(os.environ.get("PREFILTER_MAX_BRIGHTNESS", 0.97))
+# Variance of the Laplacian on the small grayscale copy; blank or heavily blurred frames score near 0
+MIN_SHARPNESS = float(os.environ.get("PREFILTER_MIN_SHARPNESS", 1e-4))
+# Shannon entropy (bits) of a 32-bin grayscale histogram; flat fills and solid frames score low
+MIN_ENTROPY = float(os.environ.get("PREFILTER_MIN_ENTROPY", 1.0))
+
+def load_small(image_bytes: bytes, size: int = PREFILTER_SIZE) -> np.ndarray:
+    """Decode a tiny RGB copy; JPEGs are decoded at reduced scale"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft("RGB", (size, size))
+        img = img.convert("RGB")
+        img.thumbnail((size, size))
+        return np.asarray(img)
+
+def shrink_array(array: np.ndarray, size: int = PREFILTER_SIZE) -> np.ndarray:
+    """Tiny copy of an HxWx3 uint8 array by striding (no resampling needed for a heuristic)"""
+    step = max(1, max(array.shape[:2]) // size)
+    return array[::step, ::step]
+
+def image_checks(small: np.ndarray) -> dict:
+    """Vegetation fraction, brightness, sharpness and entropy of a small RGB uint8 image"""
+    rgb = small.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    total = r + g + b + 1e-6
+
+    # Excess-green index on chromatic coordinates picks up leaf tissue under any lighting
+    excess_green = (2 * g - r - b) / total
+    # Yellow/brown lesions: warm, reasonably saturated and not near-white
+    saturation = rgb.max(axis=-1) - rgb.min(axis=-1)
+    lesion = (r >= b) & (g >= b) & (saturation > 0.15) & (total < 2.7)
+    vegetation = float(np.mean((excess_green > 0.05) | lesion))
+
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    laplacian = (gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1] - 4 * gray[1:-1, 1:-1])
+    histogram = np.bincount(np.minimum((gray * 32).astype(np.int32), 31).ravel(), minlength=32) / gray.size
+    histogram = histogram[histogram > 0]
+
+    return {
+        "vegetation": vegetation,
+        "brightness": float(gray.mean()),
+        "sharpness": float(laplacian.var()) if laplacian.size else 0.0,
+        "entropy": float(-(histogram * np.log2(histogram)).sum()),
+    }
+
+def rejection_reasons(checks: dict) -> list:
+    """Which thresholds an image fails; empty means it goes on to the CNN"""
+    reasons = []
+    if checks["brightness"] < MIN_BRIGHTNESS:
+        reasons.append("too_dark")
+    elif checks["brightness"] > MAX_BRIGHTNESS:
+        reasons.append("overexposed")
+    if checks["sharpness"] < MIN_SHARPNESS:
+        reasons.append("blank_or_blurry")
+    if checks["entropy"] < MIN_ENTROPY:
+        reasons.append("low_detail")
+    if checks["vegetation"] < MIN_VEGETATION:
+        reasons.append("no_vegetation")
+    return reasons
+
+class Prefilter:
+    """Counts how many uploads the cheap checks turn away before inference"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.reasons = Counter()
+        self.check_ms = 0.0
+
+    def check(self, image_bytes: bytes = None, array: np.ndarray = None) -> tuple:
+        """Shrink an encoded image or HxWx3 array and run the checks; returns (reasons, checks)"""
+        start = time.perf_counter()
+        small = shrink_array(array) if array is not None else load_small(image_bytes)
+        checks = image_checks(small)
+        reasons = rejection_reasons(checks)
+        with self._lock:
+            self.check_ms += (time.perf_counter() - start) * 1000
+            self.counts["checked"] += 1
+            self.counts["rejected" if reasons else "passed"] += 1
+            self.reasons.update(reasons)
+        return reasons, checks
+
+    def stats(self, inference_ms: float = None) -> dict:
+        """Rejections by reason, cost of the checks and the inference time they saved"""
+        with self._lock:
+            checked = self.counts["checked"]
+            return {
+                "enabled": PREFILTER_ENABLED,
+                "checked": checked,
+                "passed": self.counts["passed"],
+                "rejected": self.counts["rejected"],
+                "rejected_rate": self.counts["rejected"] / checked if checked else 0.0,
+                "reasons": dict(self.reasons),
+                "mean_check_ms": self.check_ms / checked if checked else None,
+                # Estimated from the serving model's mean latency
+                "inference_ms_saved": self.counts["rejected"] * inference_ms if inference_ms else None,
+            }
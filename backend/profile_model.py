@@ -0,0 +1,194 @@
+import argparse
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+
+from inference import INPUT_SIZE, MODEL_PATH
+
+BATCH_SIZES = (1, 8, 32)
+REPEATS = 10
+
+def median_ms(fn, repeats: int) -> float:
+    """Median wall time of `fn` in milliseconds, after one warm-up call"""
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def per_image_shape(shape) -> tuple:
+    """Drop the batch dimension from a Keras shape"""
+    return tuple(shape[1:])
+
+def layer_flops(layer, input_shapes: list, output_shape) -> int:
+    """Floating-point operations (multiply-add = 2) of one layer for a single image"""
+    in_shape = per_image_shape(input_shapes[0])
+    out_shape = per_image_shape(output_shape)
+    out_elements = int(np.prod(out_shape)) if out_shape else 1
+    in_elements = int(np.prod(in_shape)) if in_shape else 1
+    layers = tf.keras.layers
+
+    if isinstance(layer, layers.SeparableConv2D):
+        kh, kw = layer.kernel_size
+        depthwise = 2 * kh * kw * in_shape[-1] * layer.depth_multiplier * out_shape[0] * out_shape[1]
+        return depthwise + 2 * in_shape[-1] * layer.depth_multiplier * out_elements
+    if isinstance(layer, layers.DepthwiseConv2D):
+        kh, kw = layer.kernel_size
+        return 2 * kh * kw * out_elements
+    if isinstance(layer, layers.Conv2D):
+        kh, kw = layer.kernel_size
+        return 2 * kh * kw * (in_shape[-1] // layer.groups) * out_elements
+    if isinstance(layer, layers.Dense):
+        return 2 * in_shape[-1] * out_elements
+    if isinstance(layer, layers.BatchNormalization):
+        # Inference-time scale and shift
+        return 2 * out_elements
+    if isinstance(layer, (layers.MaxPooling2D, layers.AveragePooling2D)):
+        return int(np.prod(layer.pool_size)) * out_elements
+    if isinstance(layer, (layers.GlobalAveragePooling2D, layers.GlobalMaxPooling2D)):
+        return in_elements
+    if isinstance(layer, (layers.Add, layers.Multiply, layers.Subtract, layers.Average, layers.Maximum)):
+        return (len(input_shapes) - 1) * out_elements
+    if isinstance(layer, (layers.Activation, layers.ReLU, layers.Softmax, layers.LeakyReLU, layers.Rescaling,
+                          layers.Normalization)):
+        return out_elements
+    # Reshapes, dropout, padding, concatenation: data movement only
+    return 0
+
+def leaf_layers(model, prefix: str = "") -> list:
+    """(qualified name, layer) for every non-input layer, descending into nested models"""
+    found = []
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.InputLayer):
+            continue
+        name = f"{prefix}{layer.name}"
+        if isinstance(layer, tf.keras.Model):
+            found.extend(leaf_layers(layer, f"{name}/"))
+        else:
+            found.append((name, layer))
+    return found
+
+def synthetic_inputs(layer, batch_size: int, rng) -> list:
+    """Random tensors shaped like a layer's inputs (timing doesn't depend on the values)"""
+    values = []
+    for tensor in tf.nest.flatten(layer.input):
+        shape = (batch_size, *per_image_shape(tensor.shape))
+        dtype = np.dtype(tensor.dtype)
+        values.append(tf.constant(rng.random(shape).astype(dtype) if dtype.kind == "f" else np.zeros(shape, dtype)))
+    return values if isinstance(layer.input, (list, tuple)) else values[0]
+
+def profile(model, batch_sizes=BATCH_SIZES, repeats: int = REPEATS, seed: int = 0) -> dict:
+    """Per-layer FLOPs, parameters, activation memory and CPU time at each batch size"""
+    rng = np.random.default_rng(seed)
+    leaves = leaf_layers(model)
+    rows = []
+    for name, layer in leaves:
+        output_shape = per_image_shape(layer.output.shape)
+        itemsize = np.dtype(layer.output.dtype).itemsize
+        rows.append({
+            "name": name,
+            "type": type(layer).__name__,
+            "output_shape": list(output_shape),
+            "params": int(layer.count_params()),
+            "flops": int(layer_flops(layer, [t.shape for t in tf.nest.flatten(layer.input)], layer.output.shape)),
+            "activation_bytes": int(np.prod(output_shape)) * itemsize,
+            "cpu_ms": {},
+        })
+
+    whole_model_ms = {}
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+        model_fn = tf.function(lambda x: model(x, training=False))
+        whole_model_ms[batch_size] = median_ms(lambda: model_fn(batch), repeats)
+
+        for row, (_, layer) in zip(rows, leaves):
+            value = synthetic_inputs(layer, batch_size, rng)
+            # Each layer runs as its own graph so eager dispatch overhead doesn't swamp small layers
+            layer_fn = tf.function(lambda x, layer=layer: layer(x, training=False))
+            row["cpu_ms"][batch_size] = median_ms(lambda: layer_fn(value), repeats)
+
+    return {
+        "model": model.name,
+        "input_shape": [INPUT_SIZE, INPUT_SIZE, 3],
+        "batch_sizes": list(batch_sizes),
+        "layers": rows,
+        "totals": {
+            "params": int(model.count_params()),
+            "flops": sum(row["flops"] for row in rows),
+            "activation_bytes": sum(row["activation_bytes"] for row in rows),
+            "layer_cpu_ms": {size: sum(row["cpu_ms"][size] for row in rows) for size in batch_sizes},
+            "model_cpu_ms": whole_model_ms,
+        },
+    }
+
+def by_type(report: dict, batch_size: int) -> list:
+    """Share of FLOPs, parameters and CPU time per layer type, most expensive first"""
+    groups = defaultdict(lambda: {"layers": 0, "params": 0, "flops": 0, "cpu_ms": 0.0})
+    for row in report["layers"]:
+        group = groups[row["type"]]
+        group["layers"] += 1
+        group["params"] += row["params"]
+        group["flops"] += row["flops"]
+        group["cpu_ms"] += row["cpu_ms"][batch_size]
+    return sorted(({"type": name, **values} for name, values in groups.items()), key=lambda g: -g["cpu_ms"])
+
+def print_report(report: dict, top: int = 25):
+    """Layers ranked by CPU time at the largest batch size, then totals per layer type"""
+    sizes = report["batch_sizes"]
+    rank_size = sizes[-1]
+    total_ms = report["totals"]["layer_cpu_ms"][rank_size] or 1.0
+    total_flops = report["totals"]["flops"] or 1
+    ranked = sorted(report["layers"], key=lambda row: -row["cpu_ms"][rank_size])
+    width = min(40, max(len(row["name"]) for row in ranked) + 2)
+
+    print(f"\n{report['model']}: {report['totals']['params']:,} params, "
+          f"{report['totals']['flops'] / 1e6:,.1f} MFLOPs and "
+          f"{report['totals']['activation_bytes'] / 2**20:.1f} MiB of activations per image")
+    print(f"\nLayers ranked by CPU time at batch {rank_size} (top {min(top, len(ranked))} of {len(ranked)})")
+    print(f"{'layer':<{width}}{'type':<22}{'params':>10}{'MFLOPs':>10}{'act KiB':>10}"
+          + "".join(f"{f'ms@{size}':>10}" for size in sizes) + f"{'% time':>8}{'% FLOPs':>9}")
+    for row in ranked[:top]:
+        print(f"{row['name'][:width - 2]:<{width}}{row['type'][:20]:<22}{row['params']:>10,}"
+              f"{row['flops'] / 1e6:>10.2f}{row['activation_bytes'] / 1024:>10.1f}"
+              + "".join(f"{row['cpu_ms'][size]:>10.3f}" for size in sizes)
+              + f"{row['cpu_ms'][rank_size] / total_ms:>8.1%}{row['flops'] / total_flops:>9.1%}")
+
+    print(f"\nBy layer type at batch {rank_size}")
+    print(f"{'type':<24}{'layers':>7}{'params':>12}{'% FLOPs':>9}{'% time':>8}")
+    for group in by_type(report, rank_size):
+        print(f"{group['type'][:22]:<24}{group['layers']:>7}{group['params']:>12,}"
+              f"{group['flops'] / total_flops:>9.1%}{group['cpu_ms'] / total_ms:>8.1%}")
+
+    print(f"\n{'batch':>5}{'sum of layers ms':>18}{'whole model ms':>16}{'ms / image':>12}{'images/s':>10}")
+    for size in sizes:
+        layers_ms = report["totals"]["layer_cpu_ms"][size]
+        model_ms = report["totals"]["model_cpu_ms"][size]
+        print(f"{size:>5}{layers_ms:>18.2f}{model_ms:>16.2f}{model_ms / size:>12.2f}{1000 * size / model_ms:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-layer FLOPs, parameters, activation memory and CPU time of a model")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model instead of --model")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(BATCH_SIZES))
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Timed runs per layer and batch size")
+    parser.add_argument("--top", type=int, default=25, help="Layers to show in the ranked table")
+    parser.add_argument("--json", type=Path, help="Also write the full report as JSON")
+    args = parser.parse_args()
+
+    from standin_model import load_model
+    model = load_model(args.model, standin=args.standin)
+    report = profile(model, sorted(args.batch_sizes), args.repeats)
+    report["source"] = "standin" if args.standin else str(args.model)
+    print_report(report, args.top)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"Saved {args.json}")
+
+if __name__ == "__main__":
+    main()
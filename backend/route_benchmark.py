@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+import numpy as np
+
+from inference import MODEL_PATH
+from router import STRATEGIES
+
+BACKEND_DIR = Path(__file__).parent
+READY_TIMEOUT = 300.0  # Seconds for a node to load its model
+
+def zipf_workload(images: int, requests: int, exponent: float, seed: int = 0) -> np.ndarray:
+    """Image index per request; a few popular images repeat often, like re-checked or shared photos"""
+    weights = 1.0 / np.arange(1, images + 1) ** exponent
+    return np.random.default_rng(seed).choice(images, size=requests, p=weights / weights.sum())
+
+def start_server(app: str, port: int, env: dict, log_path: Path) -> subprocess.Popen:
+    """Run `uvicorn app` on a port in the background, logging to a file"""
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+def stop_servers(processes: list):
+    """Terminate servers and wait for them to exit"""
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = READY_TIMEOUT):
+    """Poll GET / until the server answers with a loaded model"""
+    import httpx
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"{url} exited with code {process.returncode}")
+            try:
+                response = await client.get(f"{url}/")
+                if response.status_code == 200 and response.json().get("model_loaded", True):
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(0.5)
+    raise SystemExit(f"{url} did not become ready within {timeout:.0f}s")
+
+async def drive(router_url: str, images: list, workload: np.ndarray, concurrency: int, on_progress=None) -> list:
+    """Send the workload through the router, `concurrency` at a time; one (status, X-Cache, node, ms) per request"""
+    import httpx
+    results = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def one(index: int):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(
+                        f"{router_url}/predict", files={"file": (f"leaf-{index}.jpg", images[index], "image/jpeg")}
+                    )
+                    outcome = (response.status_code, response.headers.get("x-cache"),
+                               response.headers.get("x-routed-to"))
+                except httpx.HTTPError as e:
+                    outcome = (type(e).__name__, None, None)
+                results.append((*outcome, (time.perf_counter() - start) * 1000))
+                if on_progress is not None:
+                    on_progress(len(results))
+
+        await asyncio.gather(*(one(int(index)) for index in workload))
+    return results
+
+def summarize(strategy: str, results: list, seconds: float, router_stats: dict) -> dict:
+    """Hit rate, throughput, latency and per-node share of one run"""
+    statuses = Counter(status for status, _, _, _ in results)
+    cache = Counter(cache for status, cache, _, _ in results if status == 200)
+    nodes = Counter(node for status, _, node, _ in results if status == 200)
+    latencies = np.array([ms for status, _, _, ms in results if status == 200])
+    served = sum(cache.values())
+    return {
+        "strategy": strategy,
+        "requests": len(results),
+        "seconds": seconds,
+        "requests_per_second": len(results) / seconds,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "cache": dict(cache),
+        "hit_rate": cache["hit"] / served if served else 0.0,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p95": float(np.percentile(latencies, 95)) if len(latencies) else None,
+        },
+        "node_share": {node: count / sum(nodes.values()) for node, count in sorted(nodes.items())},
+        "failovers": router_stats.get("failovers"),
+    }
+
+async def run_strategy(strategy: str, args, model_path: Path, images: list, workload: np.ndarray) -> dict:
+    """Start fresh nodes and a router, drive the workload through it and stop everything"""
+    workdir = Path(tempfile.mkdtemp(prefix=f"plant-savior-route-{strategy}-"))
+    node_urls = [f"http://127.0.0.1:{args.base_port + i}" for i in range(args.nodes)]
+    processes = []
+    try:
+        for i, url in enumerate(node_urls):
+            node_dir = workdir / f"node{i}"
+            processes.append(start_server("api:app", args.base_port + i, {
+                "MODEL_PATH": str(model_path),
+                "PREDICTION_CACHE_SIZE": str(args.cache_size),
+                "EMBEDDING_INDEX_DIR": str(node_dir / "embeddings"),
+                "HISTORY_DB_PATH": str(node_dir / "history.db"),
+                "QUEUE_DB_PATH": str(node_dir / "queue" / "queue.db"),
+                "SPOOL_DIR": str(node_dir / "queue" / "spool"),
+                # Every request comes from this one benchmark client
+                "LIMIT_CLIENT_SHARE": "1.0",
+            }, workdir / f"node{i}.log"))
+        await asyncio.gather(*(wait_ready(url, process) for url, process in zip(node_urls, processes)))
+
+        router_url = f"http://127.0.0.1:{args.router_port}"
+        router_process = start_server("router:app", args.router_port, {
+            "ROUTER_BACKENDS": ",".join(node_urls),
+            "ROUTER_STRATEGY": strategy,
+        }, workdir / "router.log")
+        processes.append(router_process)
+        await wait_ready(router_url, router_process)
+
+        killed = []
+
+        def on_progress(done: int):
+            # Take one node away mid-run to exercise health checks and failover
+            if args.kill_node and not killed and done >= len(workload) // 2:
+                killed.append(node_urls[0])
+                processes[0].terminate()
+
+        print(f"\n{strategy}: {len(workload)} requests over {args.nodes} nodes, {args.concurrency} at a time"
+              + (f" (stopping {node_urls[0]} halfway)" if args.kill_node else ""))
+        start = time.perf_counter()
+        results = await drive(router_url, images, workload, args.concurrency, on_progress)
+        seconds = time.perf_counter() - start
+
+        import httpx
+        async with httpx.AsyncClient() as client:
+            router_stats = (await client.get(f"{router_url}/router/stats")).json()
+        summary = summarize(strategy, results, seconds, router_stats)
+        summary["killed"] = killed
+        return summary
+    finally:
+        stop_servers(processes[::-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare consistent-hash routing with round-robin across API nodes")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=8601, help="Nodes listen on consecutive ports from here")
+    parser.add_argument("--router-port", type=int, default=8600)
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Serve the stand-in model instead of --model")
+    parser.add_argument("--images", type=int, default=600, help="Distinct synthetic images")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--zipf", type=float, default=1.0, help="Popularity skew of the images (0 = uniform)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="PREDICTION_CACHE_SIZE on each node")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    parser.add_argument("--kill-node", action="store_true", help="Stop the first node halfway through each run")
+    parser.add_argument("--json", type=Path, help="Write the summaries as JSON")
+    args = parser.parse_args()
+
+    model_path = Path(args.model).resolve()
+    if args.standin:
+        from standin_model import build_standin_model
+        model_path = Path(tempfile.mkdtemp(prefix="plant-savior-")) / "standin_model.keras"
+        build_standin_model().save(model_path)
+
+    from soak_test import synthetic_leaves
+    images = synthetic_leaves(args.images)
+    # Every strategy replays the same request sequence
+    workload = zipf_workload(args.images, args.requests, args.zipf)
+    best_hit_rate = 1 - len(set(workload.tolist())) / len(workload)
+
+    summaries = [asyncio.run(run_strategy(strategy, args, model_path, images, workload)) for strategy in args.strategies]
+
+    print(f"\n{len(set(workload.tolist()))} distinct images in {len(workload)} requests; "
+          f"one shared cache would hit {best_hit_rate:.1%}")
+    print(f"{'strategy':<12} {'req/s':>7} {'hit rate':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'failovers':>9}  statuses / node share")
+    for summary in summaries:
+        latency = summary["latency_ms"]
+        print(f"{summary['strategy']:<12} {summary['requests_per_second']:>7.1f} {summary['hit_rate']:>9.1%} "
+              f"{latency['p50'] or 0:>8.1f} {latency['p95'] or 0:>8.1f} "
+              f"{summary['failovers'] or 0:>9}  {summary['statuses']} "
+              + " ".join(f"{share:.0%}" for share in summary["node_share"].values()))
+
+    if args.json:
+        args.json.write_text(json.dumps({"best_hit_rate": best_hit_rate, "runs": summaries}, indent=2))
+        print(f"Saved {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import re
+from collections import Counter
+from contextlib import asynccontextmanager
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile
+
+from cache import LRUCache
+
+# Comma-separated API node URLs, e.g. http://127.0.0.1:8601,http://127.0.0.1:8602
+ROUTER_BACKENDS = [url.strip().rstrip("/") for url in os.environ.get("ROUTER_BACKENDS", "").split(",") if url.strip()]
+# "hash" sends identical uploads to the same node; "round-robin" is the baseline it is measured against
+ROUTER_STRATEGY = os.environ.get("ROUTER_STRATEGY", "hash")
+ROUTER_VNODES = int(os.environ.get("ROUTER_VNODES", 128))  # Ring points per node; more spread keys more evenly
+ROUTER_HEALTH_INTERVAL = float(os.environ.get("ROUTER_HEALTH_INTERVAL", 2.0))
+ROUTER_HEALTH_TIMEOUT = float(os.environ.get("ROUTER_HEALTH_TIMEOUT", 2.0))
+ROUTER_TIMEOUT = float(os.environ.get("ROUTER_TIMEOUT", 120.0))
+
+STRATEGIES = ("hash", "round-robin")
+ROUTE_KEY_HEADER = "X-Route-Key"
+JOB_ROUTES_SIZE = 10000  # Job id -> node, so status and event streams reach the node holding the job
+# Creating these twice would run the work twice, so they only fail over when the node was never reached.
+# Each node keeps its own jobs (in memory, or in its own queue database), so their ids are pinned too
+NON_IDEMPOTENT_PATHS = {"/jobs", "/queue/jobs"}
+JOB_PATH = re.compile(r"^/(?:queue/)?jobs/([^/]+)(/events)?$")
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+               "transfer-encoding", "upgrade", "host", "content-length"}
+
+def ring_hash(value: str) -> int:
+    """64-bit position of a key or node point on the ring"""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes; a node going away only moves the keys it owned"""
+
+    def __init__(self, nodes: list, vnodes: int = ROUTER_VNODES):
+        self.nodes = list(nodes)
+        points = sorted((ring_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def walk(self, key: str):
+        """Distinct nodes clockwise from the key: its owner first, then the nodes that take over"""
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, ring_hash(key))
+        seen = set()
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+    def owner(self, key: str) -> str:
+        """Node that owns a key when every node is up"""
+        return next(self.walk(key), None)
+
+async def route_key(request: Request, body: bytes) -> str:
+    """Client-provided key, else the SHA-256 of the uploaded files (or raw body); None for bodiless requests"""
+    key = request.headers.get(ROUTE_KEY_HEADER)
+    if key:
+        return key
+    if not body:
+        return None
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        # Multipart boundaries differ per request; hash only the file contents, which for one file
+        # is the same SHA-256 the node caches results under
+        digest = hashlib.sha256()
+        form = await request.form()
+        for _, value in form.multi_items():
+            if isinstance(value, UploadFile):
+                digest.update(await value.read())
+        await form.close()
+        return digest.hexdigest()
+    return hashlib.sha256(body).hexdigest()
+
+class Router:
+    """Sends each request to an API node by content hash (or round-robin), skipping nodes that fail health checks"""
+
+    def __init__(self, backends: list, strategy: str = ROUTER_STRATEGY, vnodes: int = ROUTER_VNODES):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy {strategy!r} (expected one of {', '.join(STRATEGIES)})")
+        self.backends = list(backends)
+        self.strategy = strategy
+        self.ring = HashRing(self.backends, vnodes)
+        self.healthy = set(self.backends)  # Trusted until the first health check says otherwise
+        self.job_routes = LRUCache(JOB_ROUTES_SIZE)
+        self.client = None
+        self._turn = itertools.count()
+        self._health_task = None
+        # Only touched on the event loop, so no lock is needed
+        self.requests = Counter()
+        self.cache_statuses = Counter()
+        self.failovers = 0
+        self.unavailable = 0
+
+    async def start(self):
+        """Open the upstream connection pool and start health checks"""
+        self.client = httpx.AsyncClient(timeout=ROUTER_TIMEOUT, limits=httpx.Limits(max_keepalive_connections=64))
+        await self.check_health()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        """Stop health checks and close upstream connections"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+        if self.client is not None:
+            await self.client.aclose()
+
+    def set_health(self, node: str, healthy: bool):
+        """Record a node's health, logging transitions"""
+        if healthy and node not in self.healthy:
+            self.healthy.add(node)
+            print(f"Node {node} is back up")
+        elif not healthy and node in self.healthy:
+            self.healthy.discard(node)
+            print(f"Node {node} is down; its keys move to the next node on the ring")
+
+    async def check_node(self, node: str):
+        """A node is healthy when GET / answers with a loaded model"""
+        try:
+            response = await self.client.get(f"{node}/", timeout=ROUTER_HEALTH_TIMEOUT)
+            healthy = response.status_code == 200 and bool(response.json().get("model_loaded"))
+        except (httpx.HTTPError, ValueError):
+            healthy = False
+        self.set_health(node, healthy)
+
+    async def check_health(self):
+        """Check every node once"""
+        await asyncio.gather(*(self.check_node(node) for node in self.backends))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(ROUTER_HEALTH_INTERVAL)
+            await self.check_health()
+
+    def candidates(self, key: str = None) -> list:
+        """Nodes to try in order; healthy ones first, the rest as a last resort in case the checks are stale"""
+        if key is not None and self.strategy == "hash":
+            order = list(self.ring.walk(key))
+        else:
+            start = next(self._turn) % max(1, len(self.backends))
+            order = self.backends[start:] + self.backends[:start]
+        return [node for node in order if node in self.healthy] + [node for node in order if node not in self.healthy]
+
+    async def forward(self, request: Request, body: bytes, node: str) -> httpx.Response:
+        """Send the request to one node, leaving the response body unread"""
+        headers = [(name, value) for name, value in request.headers.items()
+                   if name.lower() not in HOP_HEADERS and name.lower() != "x-forwarded-for"]
+        # Nodes behind the router still see the real client (uvicorn trusts this header from 127.0.0.1 by default)
+        client = request.client.host if request.client else "unknown"
+        forwarded = request.headers.get("x-forwarded-for")
+        headers.append(("x-forwarded-for", f"{forwarded}, {client}" if forwarded else client))
+        upstream = self.client.build_request(
+            request.method, httpx.URL(f"{node}{request.url.path}", query=request.url.query.encode()),
+            headers=headers, content=body,
+        )
+        return await self.client.send(upstream, stream=True)
+
+    async def handle(self, request: Request) -> Response:
+        """Route one request, failing over along the ring when a node can't be reached"""
+        body = await request.body()
+        path = request.url.path
+        job = JOB_PATH.match(path)
+        pinned = self.job_routes.get(job.group(1)) if job else None
+        if pinned is not None:
+            # The job only exists on the node that accepted it
+            nodes = [pinned]
+        elif job:
+            # Unknown job (e.g. the router restarted); ask each node until one has it
+            nodes = self.candidates()
+        else:
+            nodes = self.candidates(await route_key(request, body))
+
+        for position, node in enumerate(nodes):
+            try:
+                upstream = await self.forward(request, body, node)
+            except httpx.TransportError as e:
+                never_sent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                self.set_health(node, False)
+                if path in NON_IDEMPOTENT_PATHS and not never_sent:
+                    break
+                self.failovers += 1
+                continue
+            if job and pinned is None and upstream.status_code == 404 and position < len(nodes) - 1:
+                await upstream.aclose()
+                continue
+
+            self.requests[node] += 1
+            if "x-cache" in upstream.headers:
+                self.cache_statuses[upstream.headers["x-cache"]] += 1
+            return await self.respond(upstream, node, path)
+
+        self.unavailable += 1
+        return JSONResponse(status_code=502, content={"detail": "No API node could serve the request"})
+
+    async def respond(self, upstream: httpx.Response, node: str, path: str) -> Response:
+        """Relay the node's response; event streams are passed through as they arrive"""
+        headers = {name: value for name, value in upstream.headers.items() if name.lower() not in HOP_HEADERS}
+        headers["X-Routed-To"] = node
+        if upstream.headers.get("content-type", "").startswith(STREAMING_TYPES):
+            return StreamingResponse(upstream.aiter_raw(), status_code=upstream.status_code, headers=headers,
+                                     background=BackgroundTask(upstream.aclose))
+
+        content = await upstream.aread()
+        await upstream.aclose()
+        if path in NON_IDEMPOTENT_PATHS and upstream.status_code == 202:
+            try:
+                job_id = json.loads(content).get("job_id")
+            except ValueError:
+                job_id = None
+            if job_id:
+                self.job_routes.put(job_id, node)
+        return Response(content=content, status_code=upstream.status_code, headers=headers)
+
+    def stats(self) -> dict:
+        """Per-node health and traffic, failovers and the X-Cache statuses seen"""
+        served = sum(self.cache_statuses.values())
+        return {
+            "strategy": self.strategy,
+            "nodes": {
+                node: {"healthy": node in self.healthy, "requests": self.requests[node]}
+                for node in self.backends
+            },
+            "failovers": self.failovers,
+            "unavailable": self.unavailable,
+            "cache_statuses": dict(self.cache_statuses),
+            "cache_hit_rate": self.cache_statuses["hit"] / served if served else 0.0,
+            "pinned_jobs": self.job_routes.stats()["size"],
+        }
+
+router = Router(ROUTER_BACKENDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not router.backends:
+        print("ROUTER_BACKENDS is empty; every request will get 502")
+    await router.start()
+    print(f"Routing to {len(router.backends)} nodes by {router.strategy}, {len(router.healthy)} healthy")
+    yield
+    await router.close()
+
+app = FastAPI(title="Plant Savior AI Router", lifespan=lifespan)
+
+@app.get("/router/stats")
+def get_router_stats():
+    """Node health, per-node traffic, failovers and cache hit rate seen through the router"""
+    return router.stats()
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+async def proxy(request: Request, path: str):
+    """Forward everything else to an API node"""
+    return await router.handle(request)
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistent-hash router in front of several API nodes")
+    parser.add_argument("backends", nargs="+", help="API node URLs, e.g. http://127.0.0.1:8601")
+    parser.add_argument("--strategy", choices=STRATEGIES, default=ROUTER_STRATEGY)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8500)
+    args = parser.parse_args()
+
+    import uvicorn
+    # The app module reads its settings at import
+    os.environ["ROUTER_BACKENDS"] = ",".join(args.backends)
+    os.environ["ROUTER_STRATEGY"] = args.strategy
+    uvicorn.run("router:app", host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+from multiprocessing import shared_memory
+from pathlib import Path
+import argparse
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+import numpy as np
+
+from inference import INPUT_SIZE
+from batching import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+
+# "local": every HTTP worker loads the model; "shm": workers hand tensors to one inference process
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "local")
+SHM_NAME = os.environ.get("SHM_NAME", "plant-savior-inference")
+SHM_WORKERS = int(os.environ.get("SHM_WORKERS", 2))
+# Each HTTP worker owns its own partition of the ring, so workers never contend for slots
+SHM_SLOTS_PER_WORKER = int(os.environ.get("SHM_SLOTS_PER_WORKER", 32))
+SHM_WORKER_INDEX = int(os.environ.get("SHM_WORKER_INDEX", 0))
+SHM_TIMEOUT = float(os.environ.get("SHM_TIMEOUT", 30.0))  # Seconds a request waits for its result
+SHM_POLL_INTERVAL = 0.0002  # Seconds between checks of the ring (both sides)
+SHM_IDLE_POLL_INTERVAL = 0.002  # Server poll interval once the ring has been idle for a while
+SHM_CONNECT_TIMEOUT = 120.0
+
+HEADER = ("ready", "workers", "slots_per_worker", "num_classes", "embedding_dim", "input_size", "server_pid")
+ALIGNMENT = 64
+
+def segment_layout(workers: int, slots_per_worker: int, num_classes: int, embedding_dim: int) -> tuple:
+    """(name, dtype, shape, byte offset) of every array in the segment, plus its total size"""
+    slots = workers * slots_per_worker
+    arrays = [
+        ("header", np.int64, (len(HEADER),)),
+        # Forward passes, rows served, then rows served per HTTP worker
+        ("counters", np.int64, (2 + workers,)),
+        # A slot holds a pending request while its ticket differs from the ticket last answered
+        ("tickets", np.int64, (slots,)),
+        ("answered", np.int64, (slots,)),
+        ("failed", np.int64, (slots,)),
+        ("images", np.uint8, (slots, INPUT_SIZE, INPUT_SIZE, 3)),
+        ("predictions", np.float32, (slots, num_classes)),
+        ("embeddings", np.float32, (slots, embedding_dim)),
+    ]
+    layout, offset = [], 0
+    for name, dtype, shape in arrays:
+        layout.append((name, dtype, shape, offset))
+        offset += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // ALIGNMENT) * ALIGNMENT
+    return layout, offset
+
+def map_arrays(buffer, layout: list) -> dict:
+    """NumPy views over the shared segment (no copies)"""
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset) for name, dtype, shape, offset in layout}
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing segment without letting this process's resource tracker unlink it on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the segment; skip that so only the inference process owns it
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+def inference_main(name: str, workers: int, slots_per_worker: int, model_path: str, ready,
+                   max_batch: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+    """Inference process: own the only copy of the model and answer requests from every HTTP worker's slots"""
+    import tensorflow as tf
+    from embeddings import build_embedding_model
+    from xla_compile import XLA_JIT, CompiledModel
+
+    model = tf.keras.models.load_model(model_path)
+    embedding_model = build_embedding_model(model)
+    if XLA_JIT:
+        embedding_model = CompiledModel(embedding_model)
+    embeddings, predictions = embedding_model.predict(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32), verbose=0)
+
+    layout, size = segment_layout(workers, slots_per_worker, predictions.shape[-1], embeddings.shape[-1])
+    try:
+        # Left behind by a launcher that was killed
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+    except FileNotFoundError:
+        pass
+    segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+    arrays = map_arrays(segment.buf, layout)
+    arrays["header"][1:] = [workers, slots_per_worker, predictions.shape[-1], embeddings.shape[-1], INPUT_SIZE, os.getpid()]
+    arrays["header"][0] = 1
+    print(f"Inference process {os.getpid()} serving {Path(model_path).name} to {workers} workers "
+          f"({workers * slots_per_worker} slots, {size / 2**20:.1f} MiB)")
+    ready.set()
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    try:
+        serve_ring(arrays, embedding_model, workers, slots_per_worker, max_batch, max_wait_ms / 1000, stopping)
+    finally:
+        del arrays
+        segment.close()
+        segment.unlink()
+
+def serve_ring(arrays: dict, embedding_model, workers: int, slots_per_worker: int, max_batch: int,
+               max_wait: float, stopping: threading.Event):
+    """Batch pending slots across all workers, oldest first, and write results back in place"""
+    tickets, answered, failed = arrays["tickets"], arrays["answered"], arrays["failed"]
+    counters = arrays["counters"]
+    idle_since = time.perf_counter()
+
+    while not stopping.is_set():
+        pending = np.flatnonzero(tickets != answered)
+        if not len(pending):
+            idle = time.perf_counter() - idle_since > 1.0
+            time.sleep(SHM_IDLE_POLL_INTERVAL if idle else SHM_POLL_INTERVAL)
+            continue
+
+        # Give other workers' requests a moment to join a partial batch
+        deadline = time.perf_counter() + max_wait
+        while len(pending) < max_batch and time.perf_counter() < deadline:
+            time.sleep(SHM_POLL_INTERVAL)
+            pending = np.flatnonzero(tickets != answered)
+
+        # Tickets are submit timestamps, so sorting serves the oldest requests first
+        slots = pending[np.argsort(tickets[pending], kind="stable")][:max_batch]
+        served = tickets[slots].copy()  # Read before the pixels; a ticket is written after its pixels
+        batch = (arrays["images"][slots] / 255.0).astype(np.float32)
+        try:
+            embeddings, predictions = embedding_model.predict(batch, verbose=0)
+            arrays["embeddings"][slots] = embeddings
+            arrays["predictions"][slots] = predictions
+            failed[slots] = 0
+        except Exception as e:
+            print(f"Inference batch of {len(slots)} failed: {e}")
+            failed[slots] = 1
+        answered[slots] = served
+
+        counters[0] += 1
+        counters[1] += len(slots)
+        np.add.at(counters, 2 + slots // slots_per_worker, 1)
+        idle_since = time.perf_counter()
+
+class ShmClient:
+    """An HTTP worker's view of the ring: writes uint8 tensors into its own slots and waits for the answers"""
+
+    def __init__(self, name: str = SHM_NAME, worker_index: int = SHM_WORKER_INDEX, timeout: float = SHM_TIMEOUT):
+        deadline = time.monotonic() + SHM_CONNECT_TIMEOUT
+        while True:
+            try:
+                self._segment = attach(name)
+                header = np.ndarray((len(HEADER),), dtype=np.int64, buffer=self._segment.buf)
+                if header[0] == 1:
+                    break
+                del header
+                self._segment.close()
+            except FileNotFoundError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"No inference process serving shared memory {name!r}")
+            time.sleep(0.1)
+
+        info = dict(zip(HEADER, (int(value) for value in header)))
+        del header
+        if info["input_size"] != INPUT_SIZE:
+            raise RuntimeError(f"Inference process expects {info['input_size']}px inputs, not {INPUT_SIZE}px")
+        if not 0 <= worker_index < info["workers"]:
+            raise ValueError(f"Worker index {worker_index} outside 0..{info['workers'] - 1}")
+
+        self.name = name
+        self.worker_index = worker_index
+        self.timeout = timeout
+        self.info = info
+        layout, _ = segment_layout(info["workers"], info["slots_per_worker"], info["num_classes"], info["embedding_dim"])
+        self._arrays = map_arrays(self._segment.buf, layout)
+        first = worker_index * info["slots_per_worker"]
+        self._free = list(range(first, first + info["slots_per_worker"]))
+        self._condition = threading.Condition()
+        self.requests = 0
+        self.rows = 0
+
+    def _acquire(self, count: int) -> list:
+        """Take `count` of this worker's slots, waiting while other threads hold them"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: len(self._free) >= count, timeout=self.timeout):
+                raise TimeoutError("No free shared-memory slots")
+            slots, self._free = self._free[:count], self._free[count:]
+            return slots
+
+    def _release(self, slots: list):
+        with self._condition:
+            self._free.extend(slots)
+            self._condition.notify_all()
+
+    def run(self, batch: np.ndarray) -> tuple:
+        """Send a [0, 1] float batch (or uint8 pixels) through the inference process; returns (embeddings, predictions)"""
+        step = self.info["slots_per_worker"]
+        parts = [self._run_chunk(batch[start:start + step]) for start in range(0, len(batch), step)]
+        with self._condition:
+            self.requests += 1
+            self.rows += len(batch)
+        return np.concatenate([part[0] for part in parts]), np.concatenate([part[1] for part in parts])
+
+    def _run_chunk(self, rows: np.ndarray) -> tuple:
+        arrays = self._arrays
+        slots = self._acquire(len(rows))
+        try:
+            tickets = []
+            for slot, row in zip(slots, rows):
+                # Preprocessed rows are k/255, so this recovers the exact uint8 pixels
+                arrays["images"][slot] = row if row.dtype == np.uint8 else np.rint(row * 255)
+                ticket = time.time_ns()
+                tickets.append(ticket)
+                arrays["tickets"][slot] = ticket  # Publishes the slot; pixels are already in place
+
+            deadline = time.monotonic() + self.timeout
+            while np.any(arrays["answered"][slots] != tickets):
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Inference process did not answer in time")
+                time.sleep(SHM_POLL_INTERVAL)
+            if arrays["failed"][slots].any():
+                raise RuntimeError("Inference failed in the inference process")
+            return arrays["embeddings"][slots], arrays["predictions"][slots]  # Fancy indexing copies
+        finally:
+            self._release(slots)
+
+    def stats(self) -> dict:
+        """Cross-worker batching done by the inference process, and this worker's share"""
+        counters = self._arrays["counters"].copy()
+        with self._condition:
+            return {
+                "segment": self.name,
+                "inference_pid": self.info["server_pid"],
+                "worker_index": self.worker_index,
+                "workers": self.info["workers"],
+                "slots_per_worker": self.info["slots_per_worker"],
+                "slots_in_use": self.info["slots_per_worker"] - len(self._free),
+                "requests": self.requests,
+                "rows": self.rows,
+                "forward_passes": int(counters[0]),
+                "rows_served": int(counters[1]),
+                "mean_batch_size": counters[1] / counters[0] if counters[0] else 0.0,
+                "rows_by_worker": [int(count) for count in counters[2:]],
+            }
+
+class RemoteModel:
+    """Drop-in for a Keras model's predict() whose forward pass runs in the inference process"""
+
+    def __init__(self, client: ShmClient, with_embeddings: bool):
+        self.client = client
+        self.with_embeddings = with_embeddings
+
+    def predict(self, batch: np.ndarray, verbose: int = 0):
+        embeddings, predictions = self.client.run(batch)
+        return [embeddings, predictions] if self.with_embeddings else predictions
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> ShmClient:
+    """This process's connection to the inference process, opened on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ShmClient()
+        return _client
+
+def http_worker_main(index: int, sockets: list, app: str, log_level: str):
+    """HTTP worker process: serve the API on the shared listening socket with its own slot partition"""
+    os.environ["SHM_WORKER_INDEX"] = str(index)
+    import uvicorn
+    config = uvicorn.Config(app, log_level=log_level)
+    try:
+        uvicorn.Server(config).run(sockets=sockets)
+    except KeyboardInterrupt:
+        pass  # Shut down by the launcher
+
+def main():
+    from inference import MODEL_PATH
+    parser = argparse.ArgumentParser(description="Run the API as several HTTP workers sharing one inference process")
+    parser.add_argument("--workers", type=int, default=SHM_WORKERS, help="HTTP worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Serve the stand-in model instead of --model")
+    parser.add_argument("--slots", type=int, default=SHM_SLOTS_PER_WORKER, help="Ring slots per HTTP worker")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    model_path = Path(args.model)
+    if args.standin:
+        from standin_model import build_standin_model
+        model_path = Path(tempfile.mkdtemp(prefix="plant-savior-")) / "standin_model.keras"
+        build_standin_model().save(model_path)
+    model_path = model_path.resolve()
+    if not model_path.is_file():
+        raise SystemExit(f"Model file {model_path} not found (pass --model or --standin)")
+    if os.environ.get("MODELS_DIR") and Path(os.environ["MODELS_DIR"]).resolve() != model_path.parent:
+        print(f"Ignoring MODELS_DIR={os.environ['MODELS_DIR']}: workers serve {model_path}")
+
+    # Children inherit these: the workers' registry (MODELS_DIR / MODEL_PATH's name) must name
+    # the same file the inference process serves
+    name = f"plant-savior-{os.getpid()}"
+    os.environ.update(
+        INFERENCE_BACKEND="shm", SHM_NAME=name, SHM_WORKERS=str(args.workers),
+        SHM_SLOTS_PER_WORKER=str(args.slots), MODEL_PATH=str(model_path), MODELS_DIR=str(model_path.parent),
+    )
+
+    # Spawn, not fork: TensorFlow must be initialised inside each process
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    inference = context.Process(target=inference_main, name="inference",
+                                args=(name, args.workers, args.slots, str(model_path), ready))
+    inference.start()
+    while not ready.wait(0.5):
+        if not inference.is_alive():
+            raise SystemExit(f"Inference process exited with code {inference.exitcode}")
+
+    import uvicorn
+    sock = uvicorn.Config("api:app", host=args.host, port=args.port).bind_socket()
+    http_workers = {}
+
+    def spawn(index: int):
+        process = context.Process(target=http_worker_main, name=f"http-{index}",
+                                  args=(index, [sock], "api:app", args.log_level))
+        process.start()
+        http_workers[index] = process
+
+    for index in range(args.workers):
+        spawn(index)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} HTTP workers")
+    # docker stop / systemd send SIGTERM; shut down the same way as Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    try:
+        while inference.is_alive():
+            for index, process in list(http_workers.items()):
+                if not process.is_alive():
+                    # The replacement takes over the same slots; stale answers never match its tickets
+                    print(f"HTTP worker {index} exited with code {process.exitcode}; restarting")
+                    spawn(index)
+            time.sleep(1.0)
+        print(f"Inference process exited with code {inference.exitcode}; stopping")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # HTTP workers first, so in-flight requests still get answers, then the inference process
+        for process in http_workers.values():
+            process.terminate()
+        for process in http_workers.values():
+            process.join()
+        inference.terminate()
+        inference.join()
+        sock.close()
+
+if __name__ == "__main__":
+    main()
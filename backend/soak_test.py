@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from PIL import Image
+import numpy as np
+
+SAMPLE_EVERY = 1000  # Requests between memory samples
+WARMUP_FRACTION = 0.1  # Leading share of samples left out of the trend (caches and allocators filling up)
+# Growth per 100k requests above which a steady upward trend counts as a leak
+MAX_GROWTH_MB = 50.0
+MAX_OBJECT_GROWTH = 10000
+MIN_R2 = 0.5  # How straight the line must be; noise and one-off steps don't count
+
+def synthetic_leaves(count: int, size: tuple = (640, 480), seed: int = 0) -> list:
+    """Distinct leaf-like JPEGs (green blade, brown spots, noise) that pass the pre-filter"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    yy, xx = np.mgrid[:height, :width]
+    images = []
+    for _ in range(count):
+        pixels = np.empty((height, width, 3), dtype=np.float32)
+        pixels[:] = rng.uniform(150, 220, 3)
+        cy, cx = rng.uniform(0.4, 0.6) * height, rng.uniform(0.4, 0.6) * width
+        blade = ((yy - cy) / (0.42 * height)) ** 2 + ((xx - cx) / (0.45 * width)) ** 2 < 1
+        pixels[blade] = (rng.uniform(30, 80), rng.uniform(110, 170), rng.uniform(30, 70))
+        for _ in range(rng.integers(0, 15)):
+            sy, sx = rng.uniform(0.2, 0.8) * height, rng.uniform(0.2, 0.8) * width
+            pixels[(yy - sy) ** 2 + (xx - sx) ** 2 < rng.uniform(20, 400)] = (110, 80, 30)
+        pixels += rng.normal(0, 12, pixels.shape)
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+def linear_trend(requests: list, values: list) -> dict:
+    """Least-squares growth per 100k requests, R² of the fit and total change"""
+    x = np.asarray(requests, dtype=np.float64)
+    y = np.asarray(values, dtype=np.float64)
+    if len(x) < 3 or np.ptp(x) == 0:
+        return {"per_100k": None, "r2": None, "change": float(y[-1] - y[0]) if len(y) else None}
+    slope, intercept = np.polyfit(x, y, 1)
+    residual = y - (slope * x + intercept)
+    total = ((y - y.mean()) ** 2).sum()
+    return {
+        "per_100k": float(slope * 100_000),
+        "r2": float(1 - (residual ** 2).sum() / total) if total else 0.0,
+        "change": float(y[-1] - y[0]),
+    }
+
+def detect_growth(samples: list, warmup_fraction: float = WARMUP_FRACTION, max_growth_mb: float = MAX_GROWTH_MB,
+                  max_object_growth: float = MAX_OBJECT_GROWTH) -> dict:
+    """Fit a line to each memory series after warm-up and flag steady growth past the thresholds"""
+    steady = samples[int(len(samples) * warmup_fraction):]
+    requests = [sample["requests"] for sample in steady]
+    series = {
+        "rss_mb": max_growth_mb,
+        "tracemalloc_mb": max_growth_mb,
+        "gc_objects": max_object_growth,
+    }
+    trends = {}
+    for name, limit in series.items():
+        values = [sample[name] for sample in steady]
+        if any(value is None for value in values):
+            continue
+        trend = linear_trend(requests, values)
+        trend["limit_per_100k"] = limit
+        trend["growing"] = bool(trend["per_100k"] is not None and trend["per_100k"] > limit and trend["r2"] >= MIN_R2)
+        trends[name] = trend
+    for device in (steady[0]["tf"] if steady else {}):
+        values = [sample["tf"].get(device, {}).get("current", 0.0) for sample in steady]
+        trend = linear_trend(requests, values)
+        trend["limit_per_100k"] = max_growth_mb
+        trend["growing"] = bool(trend["per_100k"] is not None and trend["per_100k"] > max_growth_mb and trend["r2"] >= MIN_R2)
+        trends[f"tf_{device}_mb"] = trend
+    return {"samples_used": len(steady), "trends": trends, "leak_suspected": any(t["growing"] for t in trends.values())}
+
+async def soak(app, images: list, requests: int, concurrency: int, sample_every: int, on_sample):
+    """Send `requests` /predict uploads through the ASGI app, `concurrency` at a time"""
+    import httpx
+    statuses = Counter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://soak", timeout=120) as client:
+        async def one(index: int):
+            response = await client.post(
+                "/predict", files={"file": (f"leaf-{index}.jpg", images[index % len(images)], "image/jpeg")}
+            )
+            statuses[response.status_code] += 1
+
+        sent = 0
+        while sent < requests:
+            wave = min(concurrency, requests - sent)
+            await asyncio.gather(*(one(sent + offset) for offset in range(wave)))
+            if (sent + wave) // sample_every > sent // sample_every or sent + wave == requests:
+                on_sample(sent + wave, statuses)
+            sent += wave
+    return statuses
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive many predictions through the API in-process and watch memory")
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--model", help="Path to a .keras model (default: MODEL_PATH)")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model")
+    parser.add_argument("--images", type=int, default=256, help="Distinct synthetic images cycled through")
+    parser.add_argument("--sample-every", type=int, default=SAMPLE_EVERY)
+    parser.add_argument("--cache", action="store_true", help="Keep the exact-hash cache on (default: every request runs the model)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also trace the Python heap and report where it grew (several times slower)")
+    parser.add_argument("--max-growth-mb", type=float, default=MAX_GROWTH_MB, help="Allowed MB growth per 100k requests")
+    parser.add_argument("--max-object-growth", type=float, default=MAX_OBJECT_GROWTH,
+                        help="Allowed growth in live Python objects per 100k requests")
+    parser.add_argument("--guard-max-rss-mb", type=float, default=0, help="Report when the recycle guard would fire")
+    parser.add_argument("--guard-max-requests", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="Write samples, trends and the verdict as JSON")
+    args = parser.parse_args()
+
+    # A throwaway environment; the API module reads it at import
+    workdir = Path(tempfile.mkdtemp(prefix="plant-savior-soak-"))
+    model_path = workdir / "standin_model.keras" if args.standin else Path(args.model) if args.model else None
+    if model_path:
+        # Before anything imports inference, which reads MODEL_PATH once
+        os.environ["MODEL_PATH"] = str(model_path.resolve())
+    os.environ.update(
+        EMBEDDING_INDEX_DIR=str(workdir / "embeddings"),
+        HISTORY_DB_PATH=str(workdir / "history.db"),
+        QUEUE_DB_PATH=str(workdir / "queue" / "queue.db"),
+        SPOOL_DIR=str(workdir / "queue" / "spool"),
+        # One in-process client sends everything; don't let the per-client share shed it
+        LIMIT_CLIENT_SHARE="1.0",
+        RECYCLE_MAX_RSS_MB=str(args.guard_max_rss_mb),
+        RECYCLE_MAX_REQUESTS=str(args.guard_max_requests),
+    )
+    if not args.cache:
+        os.environ["PREDICTION_CACHE_SIZE"] = "0"
+    if args.standin:
+        from standin_model import build_standin_model
+        build_standin_model().save(model_path)
+
+    import api
+    from memory_guard import memory_sample
+    if api.registry.primary is None:
+        raise SystemExit(f"No model loaded from {api.registry.models_dir / api.registry.primary_file}")
+
+    # The guard only records when it would have recycled; a real worker would exit here
+    recycles = []
+    api.memory_guard.on_recycle = lambda: recycles.append(
+        {"requests": api.memory_guard.requests, "reason": api.memory_guard.reason}
+    )
+
+    images = synthetic_leaves(args.images)
+    samples = []
+    start = time.perf_counter()
+    baseline = {}
+
+    def on_sample(done: int, statuses: Counter):
+        if not baseline and args.tracemalloc:
+            # Trace from the first sample on, so import-time and warm-up allocations aren't counted
+            tracemalloc.start(10)
+            baseline["snapshot"] = tracemalloc.take_snapshot()
+        elapsed = time.perf_counter() - start
+        sample = {"requests": done, "seconds": elapsed, **memory_sample(), "statuses": dict(statuses)}
+        samples.append(sample)
+        heap = f"{sample['tracemalloc_mb']:9.1f}" if sample["tracemalloc_mb"] is not None else f"{'-':>9}"
+        print(f"{done:>9} {elapsed:>8.0f}s {done / elapsed:>8.1f}/s {sample['rss_mb']:>9.1f} {heap} "
+              f"{sample['gc_objects']:>10} {dict(statuses)}")
+
+    print(f"Soaking {api.registry.primary.name} with {args.requests} requests, {args.concurrency} at a time")
+    print(f"{'requests':>9} {'elapsed':>9} {'rate':>10} {'RSS MB':>9} {'heap MB':>9} {'objects':>10} statuses")
+
+    async def run():
+        async with api.lifespan(api.app):
+            return await soak(api.app, images, args.requests, args.concurrency, args.sample_every, on_sample)
+
+    statuses = asyncio.run(run())
+    verdict = detect_growth(samples, WARMUP_FRACTION, args.max_growth_mb, args.max_object_growth)
+
+    top_growth = []
+    if baseline:
+        for stat in tracemalloc.take_snapshot().compare_to(baseline["snapshot"], "lineno")[:10]:
+            frame = stat.traceback[0]
+            top_growth.append({"location": f"{frame.filename}:{frame.lineno}", "size_diff_kb": stat.size_diff / 1024,
+                               "count_diff": stat.count_diff})
+        tracemalloc.stop()
+
+    print(f"\nTrends after the first {WARMUP_FRACTION:.0%} of samples (growth per 100k requests):")
+    for name, trend in verdict["trends"].items():
+        per_100k = f"{trend['per_100k']:+.1f}" if trend["per_100k"] is not None else "-"
+        r2 = f"{trend['r2']:.2f}" if trend["r2"] is not None else "-"
+        print(f"  {name:<22} {per_100k:>12} (R² {r2}, limit {trend['limit_per_100k']:g})"
+              f"{'  <- GROWING' if trend['growing'] else ''}")
+    if top_growth:
+        print("\nLargest Python heap growth since the first sample:")
+        for entry in top_growth[:5]:
+            print(f"  {entry['size_diff_kb']:+10.1f} KB {entry['count_diff']:+8} objects  {entry['location']}")
+    for event in recycles:
+        print(f"\nRecycle guard would have recycled the worker at request {event['requests']}: {event['reason']}")
+    print(f"\n{'LEAK SUSPECTED' if verdict['leak_suspected'] else 'No steady memory growth detected'} "
+          f"({sum(statuses.values())} requests, statuses {dict(statuses)})")
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            "model": api.registry.primary.name,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "statuses": dict(statuses),
+            "samples": samples,
+            **verdict,
+            "top_heap_growth": top_growth,
+            "recycles": recycles,
+        }, indent=2))
+        print(f"Saved {args.json}")
+    if verdict["leak_suspected"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+from pathlib import Path
+import tensorflow as tf
+
+from inference import CLASS_NAMES, INPUT_SIZE
+
+def build_standin_model(num_classes: int = len(CLASS_NAMES), seed: int = 0) -> tf.keras.Model:
+    """Build an untrained CNN with the same input/output contract as the real model"""
+    tf.keras.utils.set_random_seed(seed)
+
+    inputs = tf.keras.Input(shape=(INPUT_SIZE, INPUT_SIZE, 3), name="image")
+    x = tf.keras.layers.Conv2D(8, 3, strides=2, padding="same", activation="relu", name="conv1")(inputs)
+    x = tf.keras.layers.Conv2D(16, 3, strides=2, padding="same", activation="relu", name="conv2")(x)
+    x = tf.keras.layers.Conv2D(32, 3, strides=2, padding="same", activation="relu", name="conv3")(x)
+    x = tf.keras.layers.GlobalAveragePooling2D(name="pool")(x)
+    x = tf.keras.layers.Dense(32, activation="relu", name="embedding")(x)
+    outputs = tf.keras.layers.Dense(num_classes, name="logits")(x)
+    return tf.keras.Model(inputs, outputs, name="standin_plant_model")
+
+def load_model(path=None, standin: bool = False) -> tf.keras.Model:
+    """Load a Keras model from `path`, or build the stand-in model"""
+    if standin:
+        return build_standin_model()
+    return tf.keras.models.load_model(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Save the stand-in model as a .keras file")
+    parser.add_argument("--output", type=Path, default=Path(__file__).parent / "models" / "standin_model.keras")
+    args = parser.parse_args()
+
+    build_standin_model().save(args.output)
+    print(f"Stand-in model saved to {args.output}")
@@ -167,6 +167,50 @@ with tab2:
                         
                 except Exception as e:
                     st.error(f"❌ Request failed: {e}")
+    
+    # Batch job with streamed results
+    st.subheader("Batch Job (streamed results)")
+    batch_files = st.file_uploader(
+        "Upload several plant images",
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True,
+        key="api_batch"
+    )
+    batch_mode = st.radio("Mode", ["predict", "tiled"], horizontal=True, key="api_batch_mode")
+    
+    if batch_files and st.button("Submit Batch Job"):
+        try:
+            files = [("files", (f.name, f.getvalue(), f.type)) for f in batch_files]
+            response = requests.post(f"{api_url}/jobs", params={"mode": batch_mode}, files=files)
+            response.raise_for_status()
+            job = response.json()
+            st.info(f"Job `{job['job_id']}` submitted with {job['total']} images")
+            
+            # Render each result as soon as its batch completes
+            progress = st.progress(0.0)
+            rows = []
+            table = st.empty()
+            events = requests.get(f"{api_url}{job['events_url']}", params={"format": "ndjson"}, stream=True)
+            for line in events.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["event"] == "result":
+                    rows.append({
+                        "File": event.get("filename"),
+                        "Prediction": event.get("predicted_class", event.get("error")),
+                        "Confidence": f"{event.get('confidence', 0)*100:.1f}%",
+                        "Severity": event.get("severity", ""),
+                    })
+                    table.dataframe(rows, use_container_width=True)
+                    progress.progress(len(rows) / job["total"])
+                elif event["event"] == "done":
+                    st.success(
+                        f"✅ Done in {event['duration_ms']:.0f} ms "
+                        f"(first result after {event['time_to_first_result_ms']:.0f} ms)"
+                    )
+        except Exception as e:
+            st.error(f"❌ Batch job failed: {e}")
 
 # Instructions
 st.sidebar.markdown("""
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The backend modules use flat imports (run from backend/, e.g. uvicorn api:app)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,54 @@
+import numpy as np
+
+from embeddings import VectorIndex
+
+def unit(i, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i % dim] = 1.0
+    vector[(i + 1) % dim] = 0.1 * i
+    return vector
+
+def test_reaching_max_size_keeps_the_newest_half(tmp_path):
+    index = VectorIndex(tmp_path / "index", max_size=10)
+    for i in range(12):
+        index.add(unit(i), {"i": i})
+
+    # The 11th add compacted 10 rows down to the newest 5, then rows 10 and 11 were appended
+    assert [meta["i"] for meta in index.meta] == [5, 6, 7, 8, 9, 10, 11]
+    similarity, meta = index.search(unit(7))[0]
+    assert meta["i"] == 7 and similarity > 0.999
+
+    reopened = VectorIndex(tmp_path / "index", max_size=10)
+    assert [meta["i"] for meta in reopened.meta] == [5, 6, 7, 8, 9, 10, 11]
+    assert reopened.search(unit(9))[0][1]["i"] == 9
+
+def test_retired_index_is_deleted_and_ignores_writes(tmp_path):
+    index = VectorIndex(tmp_path / "index")
+    index.add(unit(0), {"i": 0})
+    index.retire()
+
+    assert not (tmp_path / "index").exists()
+    index.add(unit(1), {"i": 1})
+    assert index.search(unit(1)) == [] and not (tmp_path / "index").exists()
+
+def test_index_pruned_by_another_process_stops_writing(tmp_path):
+    index = VectorIndex(tmp_path / "index")
+    index.add(unit(0), {"i": 0})
+    VectorIndex(tmp_path / "index").retire()
+
+    index.add(unit(1), {"i": 1})
+    assert index.retired and not (tmp_path / "index").exists()
+
+def test_processes_sharing_a_directory_never_overwrite_each_other(tmp_path):
+    # Two instances stand in for two worker processes (each holds its own flock handle)
+    first = VectorIndex(tmp_path / "index", max_size=8)
+    second = VectorIndex(tmp_path / "index", max_size=8)
+    for i in range(14):
+        (first if i % 3 else second).add(unit(i), {"i": i})
+
+    # Adding 8 and 12 compacted the index; each instance catches up on the other's rows when it searches
+    for index in (first, second, VectorIndex(tmp_path / "index", max_size=8)):
+        for i in range(8, 14):
+            similarity, meta = index.search(unit(i))[0]
+            assert meta["i"] == i and similarity > 0.999
+        assert [meta["i"] for meta in index.meta] == list(range(8, 14))
@@ -0,0 +1,100 @@
+from PIL import Image
+
+from evaluate import TensorCache
+
+def write_dataset(root, values, corrupt=()):
+    """Solid-gray PNGs named 0.png, 1.png, ... in one class folder; `corrupt` ones get garbage bytes"""
+    class_dir = root / "healthy_plant"
+    class_dir.mkdir(parents=True, exist_ok=True)
+    for i, value in enumerate(values):
+        path = class_dir / f"{i}.png"
+        if i in corrupt:
+            path.write_bytes(b"not an image")
+        else:
+            Image.new("RGB", (32, 32), (value, value, value)).save(path)
+    return root
+
+def row_means(cache):
+    tensors = cache.tensors()
+    return {entry["path"]: float(tensors[entry["row"]].mean()) for entry in cache.entries}
+
+def test_corrupt_image_in_the_middle_keeps_rows_aligned(tmp_path):
+    data = write_dataset(tmp_path / "data", [40, 80, 0, 120, 160], corrupt={2})
+    cache = TensorCache(tmp_path / "cache")
+    counts = cache.update(data, workers=2)
+
+    assert counts["preprocessed"] == 4 and counts["failed"] == 1
+    assert row_means(cache) == {
+        "healthy_plant/0.png": 40.0,
+        "healthy_plant/1.png": 80.0,
+        "healthy_plant/3.png": 120.0,
+        "healthy_plant/4.png": 160.0,
+    }
+    assert sorted(entry["row"] for entry in cache.entries) == [0, 1, 2, 3]
+    assert cache.tensor_path.stat().st_size == 4 * cache.tensors()[0].size
+
+def test_incremental_update_with_a_failure_after_kept_rows(tmp_path):
+    data = write_dataset(tmp_path / "data", [40, 80])
+    cache = TensorCache(tmp_path / "cache")
+    cache.update(data, workers=2)
+
+    (data / "healthy_plant" / "2.png").write_bytes(b"not an image")
+    Image.new("RGB", (32, 32), (200, 200, 200)).save(data / "healthy_plant" / "3.png")
+    cache = TensorCache(tmp_path / "cache")
+    counts = cache.update(data, workers=2)
+
+    assert counts["unchanged"] == 2 and counts["preprocessed"] == 1 and counts["failed"] == 1
+    assert row_means(cache)["healthy_plant/3.png"] == 200.0
+    assert len(cache.tensors()) == 3
+
+def test_dataset_where_every_image_fails(tmp_path):
+    data = write_dataset(tmp_path / "data", [0, 0], corrupt={0, 1})
+    cache = TensorCache(tmp_path / "cache")
+    counts = cache.update(data)
+
+    assert counts["failed"] == 2
+    assert cache.entries == []
+    assert cache.tensors().shape[0] == 0
+    assert list(cache.iter_batches()) == []
+
+def test_empty_dataset(tmp_path):
+    (tmp_path / "data" / "healthy_plant").mkdir(parents=True)
+    cache = TensorCache(tmp_path / "cache")
+    cache.update(tmp_path / "data")
+    assert cache.entries == []
+    assert cache.tensors().shape[0] == 0
+
+def batched_pairs(cache):
+    """(label, mean pixel) for every row as iter_batches yields them"""
+    return [
+        (int(label), float(pixels.mean()))
+        for batch, labels in cache.iter_batches(batch_size=1)
+        for pixels, label in zip(batch, labels)
+    ]
+
+def test_rename_keeps_pixels_and_labels_aligned(tmp_path):
+    data = write_dataset(tmp_path / "data", [40, 80])
+    TensorCache(tmp_path / "cache").update(data, workers=2)
+
+    # 0.png sorts first before the rename and last after it
+    (data / "healthy_plant" / "0.png").rename(data / "healthy_plant" / "z.png")
+    cache = TensorCache(tmp_path / "cache")
+    counts = cache.update(data, workers=2)
+
+    assert counts["rehashed"] == 1 and counts["removed"] == 0 and not counts.get("preprocessed")
+    assert row_means(cache) == {"healthy_plant/1.png": 80.0, "healthy_plant/z.png": 40.0}
+    assert [entry["row"] for entry in cache.entries] == [0, 1]
+    assert [mean for _, mean in batched_pairs(cache)] == [80.0, 40.0]
+
+def test_move_between_classes_relabels_the_same_pixels(tmp_path):
+    data = write_dataset(tmp_path / "data", [40, 80, 120])
+    TensorCache(tmp_path / "cache").update(data, workers=2)
+
+    # leaf_spot_disease sorts before powdery_mildew but after healthy_plant
+    (data / "powdery_mildew").mkdir()
+    (data / "healthy_plant" / "0.png").rename(data / "powdery_mildew" / "0.png")
+    cache = TensorCache(tmp_path / "cache")
+    counts = cache.update(data, workers=2)
+
+    assert counts["rehashed"] == 1 and counts["removed"] == 0
+    assert batched_pairs(cache) == [(0, 80.0), (0, 120.0), (2, 40.0)]
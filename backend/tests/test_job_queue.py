@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from job_queue import JobQueue
+
+def make_queue(tmp_path):
+    return JobQueue(tmp_path / "queue.db", tmp_path / "spool")
+
+def test_stopping_a_worker_requeues_without_using_an_attempt(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("predict", [("leaf.jpg", b"jpeg")], max_attempts=1)
+    assert queue.claim("worker-1")["attempts"] == 1
+
+    assert queue.requeue_worker("worker-1") == 1
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["attempts"] == 0 and job["worker"] is None
+
+    # The single allowed attempt is still available
+    assert queue.claim("worker-2")["attempts"] == 1
+    queue.complete(job_id)
+    assert queue.get(job_id)["status"] == "done"
+
+def test_enqueue_from_many_threads(tmp_path):
+    queue = make_queue(tmp_path)
+    with ThreadPoolExecutor(8) as pool:
+        job_ids = list(pool.map(lambda i: queue.enqueue("predict", [(f"{i}.jpg", b"x" * i)]), range(40)))
+
+    assert len(set(job_ids)) == 40
+    assert queue.stats() == {"queued": 40}
+    assert [len(queue.spooled_items(job_id)) for job_id in job_ids] == [1] * 40
+    queue.close()
+
+def test_failed_attempts_are_retried_until_max_attempts(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("predict", [("leaf.jpg", b"jpeg")], max_attempts=2)
+
+    queue.claim("worker-1")
+    queue.add_results(job_id, [(0, {"probabilities": [1.0, 0.0, 0.0]})])
+    queue.fail(job_id, "Out of memory")
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["attempts"] == 1 and job["error"] == "Out of memory"
+
+    # A new attempt starts from scratch
+    assert queue.claim("worker-2")["completed"] == 0
+    queue.fail(job_id, "Out of memory again")
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["attempts"] == 2 and job["finished_at"] is not None
+    assert not (tmp_path / "spool" / job_id).exists()
+    assert queue.claim("worker-3") is None
+
+def test_expired_lease_is_reported_and_retried(tmp_path):
+    queue = make_queue(tmp_path)
+    slow = queue.enqueue("tiled", [("big.jpg", b"jpeg")], timeout=0.01)
+    fast = queue.enqueue("predict", [("leaf.jpg", b"jpeg")], timeout=300)
+    queue.claim("worker-1")
+    queue.claim("worker-2")
+    time.sleep(0.05)
+
+    assert queue.expired() == [{"id": slow, "worker": "worker-1"}]
+    queue.fail(slow, "Timed out")
+    assert queue.get(slow)["status"] == "queued"
+    assert queue.get(fast)["status"] == "running"
+
+def test_dead_worker_releases_only_its_own_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.enqueue("predict", [("a.jpg", b"a")], priority=1)
+    second = queue.enqueue("predict", [("b.jpg", b"b")])
+    assert queue.claim("worker-1")["id"] == first
+    assert queue.claim("worker-2")["id"] == second
+
+    queue.release_worker("worker-1", "Worker exited with code -9")
+    assert queue.get(first)["status"] == "queued" and queue.get(first)["attempts"] == 1
+    assert queue.get(second)["status"] == "running"
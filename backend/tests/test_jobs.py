@@ -0,0 +1,36 @@
+import asyncio
+import threading
+import time
+
+from jobs import SHUTDOWN_ERROR, JobManager, stream_events
+
+def test_shutdown_ends_the_streams_of_running_and_queued_jobs():
+    manager = JobManager(workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def process_batch(chunk):
+        started.set()
+        release.wait(5)
+        return [{"value": item} for item in chunk]
+
+    running = manager.submit("predict", [1, 2, 3], process_batch, batch_size=1)
+    queued = manager.submit("predict", [4], process_batch, batch_size=1)
+    assert started.wait(5)
+
+    stopper = threading.Thread(target=manager.shutdown)
+    stopper.start()
+    while not manager._stopping.is_set():
+        time.sleep(0.01)
+    release.set()
+    stopper.join(5)
+    assert not stopper.is_alive()
+
+    # The running job keeps the batch it was working on; the queued one never started
+    assert running.status == "failed" and running.error == SHUTDOWN_ERROR and len(running.results) == 1
+    assert queued.status == "failed" and queued.error == SHUTDOWN_ERROR and queued.results == []
+
+    async def collect(job):
+        return [line async for line in stream_events(job, "ndjson")]
+
+    assert asyncio.run(asyncio.wait_for(collect(running), 5))[-1].startswith('{"event": "done"')
+    assert len(asyncio.run(asyncio.wait_for(collect(queued), 5))) == 1
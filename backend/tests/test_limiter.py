@@ -0,0 +1,33 @@
+from limiter import AdaptiveLimiter
+
+def test_client_over_its_share_gets_429_while_others_still_get_in():
+    limiter = AdaptiveLimiter(initial=8, client_share=0.5)
+    assert [limiter.try_acquire("10.0.0.1") for _ in range(5)] == [0, 0, 0, 0, 429]
+    assert [limiter.try_acquire("10.0.0.2") for _ in range(4)] == [0, 0, 0, 0]
+    # The limit itself is reached now, so everybody is shed
+    assert limiter.try_acquire("10.0.0.3") == 503
+
+    limiter.release("10.0.0.1", 0.05)
+    assert limiter.try_acquire("10.0.0.1") == 0
+    assert limiter.stats()["shed_429"] == 1 and limiter.stats()["shed_503"] == 1
+
+def test_per_client_cap_is_off_by_default():
+    limiter = AdaptiveLimiter(initial=8)
+    assert [limiter.try_acquire("router") for _ in range(9)] == [0] * 8 + [503]
+
+def test_small_limit_still_admits_one_request_per_client():
+    limiter = AdaptiveLimiter(initial=1, client_share=0.5)
+    assert limiter.try_acquire("10.0.0.1") == 0
+    assert limiter.try_acquire("10.0.0.2") == 503
+
+def test_baseline_follows_latency_down_and_back_up():
+    limiter = AdaptiveLimiter(initial=8)
+    for latency in [0.5] * 10 + [0.1] * 10:
+        limiter.try_acquire("a")
+        limiter.release("a", latency)
+    assert limiter.baseline == 0.1
+
+    for _ in range(300):
+        limiter.try_acquire("a")
+        limiter.release("a", 0.2)
+    assert limiter.baseline == 0.2
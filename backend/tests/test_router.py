@@ -0,0 +1,73 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import httpx
+
+from router import HashRing, Router
+
+NODES = [f"http://127.0.0.1:{8601 + i}" for i in range(4)]
+KEYS = [f"image-{i}" for i in range(2000)]
+
+def test_removing_a_node_only_moves_its_own_keys():
+    before = HashRing(NODES)
+    after = HashRing(NODES[:2] + NODES[3:])
+    removed = NODES[2]
+
+    for key in KEYS:
+        if before.owner(key) != removed:
+            assert after.owner(key) == before.owner(key)
+        else:
+            # Its keys go to the next node clockwise, as the router's failover order says
+            assert after.owner(key) == list(before.walk(key))[1]
+
+def test_keys_spread_evenly_over_nodes():
+    ring = HashRing(NODES)
+    shares = [sum(ring.owner(key) == node for key in KEYS) / len(KEYS) for node in NODES]
+    assert all(0.15 < share < 0.35 for share in shares)
+
+def test_walk_visits_every_node_once():
+    ring = HashRing(NODES)
+    assert sorted(ring.walk("image-1")) == sorted(NODES)
+    assert list(HashRing([]).walk("image-1")) == []
+
+def test_unhealthy_owner_is_tried_last():
+    router = Router(NODES, strategy="hash")
+    order = list(router.ring.walk("image-7"))
+    router.set_health(order[0], False)
+    assert router.candidates("image-7") == order[1:] + order[:1]
+
+def test_queued_job_status_goes_to_the_node_that_accepted_it():
+    seen = []
+    jobs = {}
+
+    def node(request: httpx.Request) -> httpx.Response:
+        # Each node only knows the jobs it created
+        origin = f"{request.url.scheme}://{request.url.host}:{request.url.port}"
+        seen.append((request.method, request.url.path, origin))
+        if request.method == "POST":
+            job_id = f"job-{len(jobs)}"
+            jobs[job_id] = origin
+            return httpx.Response(202, json={"job_id": job_id, "status": "queued"})
+        job_id = request.url.path.rsplit("/", 1)[-1]
+        if jobs.get(job_id) != origin:
+            return httpx.Response(404, json={"detail": "Job not found"})
+        return httpx.Response(200, json={"job_id": job_id, "status": "running"})
+
+    router = Router(NODES, strategy="round-robin")
+    router.client = httpx.AsyncClient(transport=httpx.MockTransport(node))
+    app = FastAPI()
+
+    @app.api_route("/{path:path}", methods=["GET", "POST"])
+    async def proxy(request: Request, path: str):
+        return await router.handle(request)
+
+    with TestClient(app) as client:
+        accepted = client.post("/queue/jobs", files={"files": ("leaf.jpg", b"jpeg", "image/jpeg")})
+        job_id = accepted.json()["job_id"]
+        seen.clear()
+        for _ in range(len(NODES)):
+            response = client.get(f"/queue/jobs/{job_id}")
+            assert response.status_code == 200
+            assert response.headers["x-routed-to"] == accepted.headers["x-routed-to"]
+
+    # Pinned: no request went to a node without the job
+    assert {origin for _, _, origin in seen} == {accepted.headers["x-routed-to"]}
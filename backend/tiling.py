@@ -0,0 +1,101 @@
+from PIL import Image
+import numpy as np
+
+from inference import CLASS_NAMES, INPUT_SIZE
+
+TILE_OVERLAP = 0.25
+TILE_BATCH_SIZE = 64  # Bounds the float32 working set to batch * 224 * 224 * 3 * 4 bytes
+
+# A tile counts as diseased when its top class is a disease above this confidence
+DISEASED_TILE_CONFIDENCE = 0.6
+# Fraction of diseased tiles needed before the whole image is diagnosed with that disease
+DISEASED_AREA_THRESHOLD = 0.05
+
+def tile_positions(length: int, tile: int, stride: int) -> list:
+    """Tile offsets along one axis; the last tile is aligned to the edge"""
+    positions = list(range(0, length - tile + 1, stride))
+    if positions[-1] != length - tile:
+        positions.append(length - tile)
+    return positions
+
+def tile_views(array: np.ndarray, tile: int = INPUT_SIZE, overlap: float = TILE_OVERLAP) -> tuple:
+    """Return (ys, xs, windows) where windows[y, x] is a zero-copy view of the tile at (y, x)"""
+    stride = max(1, int(round(tile * (1 - overlap))))
+    height, width = array.shape[:2]
+    windows = np.lib.stride_tricks.sliding_window_view(array, (tile, tile, 3))[:, :, 0]
+    return tile_positions(height, tile, stride), tile_positions(width, tile, stride), windows
+
+def load_tiling_array(img: Image.Image, tile: int = INPUT_SIZE) -> np.ndarray:
+    """Decode an image as uint8 RGB, upscaling only if it is smaller than one tile"""
+    img = img.convert("RGB")
+    if img.width < tile or img.height < tile:
+        scale = tile / min(img.width, img.height)
+        img = img.resize((max(tile, round(img.width * scale)), max(tile, round(img.height * scale))))
+    return np.asarray(img)
+
+def iter_tile_batches(array: np.ndarray, tile: int = INPUT_SIZE, overlap: float = TILE_OVERLAP,
+                      batch_size: int = TILE_BATCH_SIZE):
+    """Yield (grid_indices, float32 batch) chunks; only one chunk is ever materialized"""
+    ys, xs, windows = tile_views(array, tile, overlap)
+    positions = [(row, col, y, x) for row, y in enumerate(ys) for col, x in enumerate(xs)]
+    buffer = np.empty((min(batch_size, len(positions)), tile, tile, 3), dtype=np.float32)
+
+    for start in range(0, len(positions), batch_size):
+        chunk = positions[start:start + batch_size]
+        batch = buffer[:len(chunk)]
+        for i, (_, _, y, x) in enumerate(chunk):
+            batch[i] = windows[y, x]
+        batch /= 255.0
+        yield [(row, col) for row, col, _, _ in chunk], batch
+
+def aggregate_tiles(heatmap: np.ndarray) -> tuple:
+    """Turn a (rows, cols, classes) heatmap into one probability vector plus summary stats"""
+    tiles = heatmap.reshape(-1, heatmap.shape[-1])
+    top = np.argmax(tiles, axis=1)
+    confidence = tiles[np.arange(len(tiles)), top]
+
+    healthy = CLASS_NAMES.index("Healthy Plant") if "Healthy Plant" in CLASS_NAMES else -1
+    diseased = (top != healthy) & (confidence > DISEASED_TILE_CONFIDENCE)
+    diseased_fraction = float(diseased.mean())
+
+    # Small lesions would vanish in a plain average, so diagnose from the diseased tiles
+    if diseased_fraction >= DISEASED_AREA_THRESHOLD:
+        probabilities = tiles[diseased].mean(axis=0)
+    else:
+        probabilities = tiles.mean(axis=0)
+
+    summary = {
+        "diseased_fraction": diseased_fraction,
+        "tile_counts": {
+            CLASS_NAMES[i] if i < len(CLASS_NAMES) else "Unknown": int(count)
+            for i, count in zip(*np.unique(top, return_counts=True))
+        },
+    }
+    return probabilities, summary
+
+def predict_tiled(predict_fn, img: Image.Image, overlap: float = TILE_OVERLAP,
+                  batch_size: int = TILE_BATCH_SIZE) -> tuple:
+    """Run sliding-window inference and return (probabilities, tile report with heatmap)"""
+    array = load_tiling_array(img)
+    ys, xs, _ = tile_views(array, INPUT_SIZE, overlap)
+    heatmap = np.zeros((len(ys), len(xs), len(CLASS_NAMES)), dtype=np.float32)
+
+    for indices, batch in iter_tile_batches(array, INPUT_SIZE, overlap, batch_size):
+        probabilities = predict_fn(batch)
+        for (row, col), probs in zip(indices, probabilities):
+            heatmap[row, col] = probs[:len(CLASS_NAMES)]
+
+    probabilities, summary = aggregate_tiles(heatmap)
+    report = {
+        "rows": len(ys),
+        "cols": len(xs),
+        "tile_size": INPUT_SIZE,
+        "overlap": overlap,
+        "count": len(ys) * len(xs),
+        **summary,
+        "heatmap": {
+            class_name: np.round(heatmap[:, :, i], 4).tolist()
+            for i, class_name in enumerate(CLASS_NAMES)
+        },
+    }
+    return probabilities, report
@@ -0,0 +1,104 @@
+import argparse
+import time
+from PIL import Image
+import numpy as np
+
+from inference import INPUT_SIZE, MODEL_PATH, predict_probabilities
+
+# Crops are taken from a slightly larger resize so they zoom in ~1.14x
+TTA_BASE_SIZE = 256
+MAX_AUGMENTATIONS = 9
+
+def augment(img: Image.Image, count: int) -> np.ndarray:
+    """Build `count` deterministic flip/crop/scale views of an image as one uint8 batch"""
+    count = max(1, min(count, MAX_AUGMENTATIONS))
+    img = img.convert("RGB")
+
+    # View 0 is exactly what preprocess_image feeds the model
+    full = np.asarray(img.resize((INPUT_SIZE, INPUT_SIZE)))
+    views = [full, full[:, ::-1], full[::-1]]
+
+    if count > len(views):
+        base = np.asarray(img.resize((TTA_BASE_SIZE, TTA_BASE_SIZE)))
+        edge = TTA_BASE_SIZE - INPUT_SIZE
+        mid = edge // 2
+        center = base[mid:mid + INPUT_SIZE, mid:mid + INPUT_SIZE]
+        views += [
+            center,
+            base[:INPUT_SIZE, :INPUT_SIZE],
+            base[:INPUT_SIZE, edge:],
+            base[edge:, :INPUT_SIZE],
+            base[edge:, edge:],
+            center[:, ::-1],
+        ]
+
+    batch = np.empty((count, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+    for i in range(count):
+        batch[i] = views[i]
+    return batch
+
+def aggregate(probabilities: np.ndarray) -> tuple:
+    """Average per-view probabilities and report how much the views agree"""
+    mean = probabilities.mean(axis=0)
+    top = int(np.argmax(mean))
+    details = {
+        "augmentations": int(len(probabilities)),
+        "agreement": float(np.mean(np.argmax(probabilities, axis=1) == top)),
+        "confidence_std": float(probabilities[:, top].std()),
+    }
+    return mean, details
+
+def predict_tta(predict_fn, img: Image.Image, count: int) -> tuple:
+    """Run all augmentations of an image as one batched forward pass"""
+    start = time.perf_counter()
+    batch = augment(img, count).astype(np.float32) / 255.0
+    probabilities = predict_fn(batch)
+    mean, details = aggregate(probabilities)
+    details["inference_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return mean, details
+
+def _median_ms(fn, repeats: int) -> float:
+    """Median wall time of `fn` in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def benchmark(predict_fn, img: Image.Image, counts=(1, 2, 4, 8), repeats: int = 10) -> list:
+    """Compare batched TTA latency against a single batch-1 forward pass"""
+    single = augment(img, 1).astype(np.float32) / 255.0
+    predict_fn(single)  # Warm-up
+    single_ms = _median_ms(lambda: predict_fn(single), repeats)
+
+    report = []
+    for count in counts:
+        batch = augment(img, count).astype(np.float32) / 255.0
+        predict_fn(batch)
+        batched_ms = _median_ms(lambda: predict_fn(batch), repeats)
+        sequential_ms = _median_ms(lambda: [predict_fn(batch[i:i + 1]) for i in range(len(batch))], repeats)
+        report.append({
+            "augmentations": len(batch),
+            "batched_ms": round(batched_ms, 2),
+            "sequential_ms": round(sequential_ms, 2),
+            "cost_vs_single": round(batched_ms / single_ms, 2),
+        })
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark test-time augmentation latency")
+    parser.add_argument("image", help="Image to augment")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model instead of --model")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    from standin_model import load_model
+    model = load_model(args.model, standin=args.standin)
+    img = Image.open(args.image)
+
+    print(f"{'augmentations':>13} {'batched ms':>11} {'sequential ms':>14} {'x batch-1':>10}")
+    for row in benchmark(lambda batch: predict_probabilities(model, batch), img, args.counts, args.repeats):
+        print(f"{row['augmentations']:>13} {row['batched_ms']:>11.2f} {row['sequential_ms']:>14.2f} {row['cost_vs_single']:>10.2f}")
@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+UPLOAD_FORMATS = ("full", "pre-resized", "tensor")
+
+class UploadMetrics:
+    """Bytes received and preprocessing time per upload format, to measure what compact uploads save"""
+
+    def __init__(self):
+        # Only touched on the event loop, so no lock is needed
+        self._totals = defaultdict(lambda: {"requests": 0, "bytes": 0, "bytes_saved": 0,
+                                            "preprocessed": 0, "preprocess_ms": 0.0})
+
+    def mean_preprocess_ms(self, upload_format: str) -> float:
+        """Average decode + resize time for a format, or None before its first miss"""
+        totals = self._totals.get(upload_format)
+        if not totals or not totals["preprocessed"]:
+            return None
+        return totals["preprocess_ms"] / totals["preprocessed"]
+
+    def observe(self, upload_format: str, upload_bytes: int, original_bytes: int = None,
+                preprocess_ms: float = None) -> dict:
+        """Record one upload and return what it saved compared with a full-size image"""
+        totals = self._totals[upload_format]
+        totals["requests"] += 1
+        totals["bytes"] += upload_bytes
+        saved = {}
+        if original_bytes:
+            saved["bytes"] = max(original_bytes - upload_bytes, 0)
+            totals["bytes_saved"] += saved["bytes"]
+        if preprocess_ms is not None:
+            totals["preprocessed"] += 1
+            totals["preprocess_ms"] += preprocess_ms
+            full_ms = self.mean_preprocess_ms("full")
+            if upload_format != "full" and full_ms is not None:
+                saved["preprocess_ms"] = max(full_ms - preprocess_ms, 0.0)
+        return saved
+
+    def stats(self) -> dict:
+        """Per-format request count, mean upload size, bytes saved and mean preprocessing time"""
+        stats = {}
+        full_ms = self.mean_preprocess_ms("full")
+        for upload_format in UPLOAD_FORMATS:
+            totals = self._totals.get(upload_format)
+            if not totals:
+                continue
+            mean_ms = self.mean_preprocess_ms(upload_format)
+            stats[upload_format] = {
+                "requests": totals["requests"],
+                "mean_upload_bytes": totals["bytes"] / totals["requests"],
+                "bytes_saved": totals["bytes_saved"],
+                "mean_preprocess_ms": mean_ms,
+                "preprocess_ms_saved_per_request": (
+                    full_ms - mean_ms if upload_format != "full" and None not in (full_ms, mean_ms) else None
+                ),
+            }
+        return stats
@@ -0,0 +1,138 @@
+from collections import Counter
+from pathlib import Path
+from PIL import Image, ImageSequence
+import numpy as np
+
+from inference import CLASS_NAMES, preprocess_image, top_prediction
+
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v", ".mpg", ".mpeg"}
+FRAME_INTERVAL = 1.0  # Seconds between sampled frames
+SEQUENCE_FPS = 1.0  # Frame rate assumed for folders of timelapse stills
+# Mean absolute difference (0-1) of 32x32 grayscale thumbnails below which a frame counts as redundant
+DIFF_THRESHOLD = 0.02
+DIFF_SIZE = (32, 32)
+BATCH_SIZE = 32
+
+def is_video(path) -> bool:
+    """Whether a path is a video file (decoded with OpenCV) rather than an image or folder"""
+    return Path(path).suffix.lower() in VIDEO_EXTENSIONS
+
+def sample_slot(seconds: float, interval: float) -> int:
+    """Index of the `interval`-wide window a timestamp falls in (tolerating float drift)"""
+    return int((seconds + 1e-6) // interval)
+
+def iter_video_frames(path, interval: float = FRAME_INTERVAL):
+    """Yield (seconds, frame index, RGB image) every `interval` seconds of a video file"""
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("Reading video files requires OpenCV: pip install opencv-python-headless")
+
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    try:
+        index, next_slot = 0, 0
+        # grab() advances without converting the frame; only sampled frames are retrieved
+        while capture.grab():
+            seconds = index / fps
+            slot = sample_slot(seconds, interval)
+            if slot >= next_slot:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield seconds, index, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                next_slot = slot + 1
+            index += 1
+    finally:
+        capture.release()
+
+def iter_animated_frames(path, interval: float = FRAME_INTERVAL):
+    """Yield (seconds, frame index, RGB image) every `interval` seconds of a GIF / animated WebP / TIFF"""
+    with Image.open(path) as img:
+        seconds, next_slot = 0.0, 0
+        for index, frame in enumerate(ImageSequence.Iterator(img)):
+            slot = sample_slot(seconds, interval)
+            if slot >= next_slot:
+                yield seconds, index, frame.convert("RGB")
+                next_slot = slot + 1
+            seconds += frame.info.get("duration", 100) / 1000
+
+def iter_sequence_frames(paths: list, interval: float = FRAME_INTERVAL, fps: float = SEQUENCE_FPS):
+    """Yield (seconds, frame index, RGB image) from an ordered list of timelapse stills"""
+    step = max(1, round(interval * fps))
+    for index in range(0, len(paths), step):
+        with Image.open(paths[index]) as img:
+            yield index / fps, index, img.convert("RGB")
+
+def iter_frames(path, interval: float = FRAME_INTERVAL, fps: float = SEQUENCE_FPS):
+    """Sample frames from a video file, an animated image, or a folder of timelapse stills"""
+    path = Path(path)
+    if path.is_dir():
+        from bulk_predict import iter_image_paths
+        return iter_sequence_frames(list(iter_image_paths([path])), interval, fps)
+    if is_video(path):
+        return iter_video_frames(path, interval)
+    return iter_animated_frames(path, interval)
+
+def diff_thumbnail(img: Image.Image) -> np.ndarray:
+    """Tiny grayscale copy used for the perceptual diff"""
+    return np.asarray(img.convert("L").resize(DIFF_SIZE, Image.BILINEAR), dtype=np.float32) / 255.0
+
+def iter_timeline(predict_fn, frames, diff_threshold: float = DIFF_THRESHOLD, batch_size: int = BATCH_SIZE,
+                  stats: dict = None):
+    """Classify sampled frames in batches, skipping near-identical ones, and yield one entry per analyzed frame"""
+    stats = stats if stats is not None else {}
+    stats.update(sampled=0, analyzed=0, skipped=0)
+    pending = []
+    last = None
+
+    def flush():
+        batch = np.concatenate([processed for _, _, processed in pending])
+        for (seconds, index, _), probabilities in zip(pending, predict_fn(batch)):
+            predicted_class, confidence, severity = top_prediction(probabilities)
+            yield {
+                "timestamp": round(seconds, 3),
+                "frame": index,
+                "predicted_class": predicted_class,
+                "confidence": confidence,
+                "severity": severity,
+                "all_predictions": {name: float(probabilities[i]) for i, name in enumerate(CLASS_NAMES)},
+            }
+        pending.clear()
+
+    for seconds, index, img in frames:
+        stats["sampled"] += 1
+        thumbnail = diff_thumbnail(img)
+        if last is not None and np.abs(thumbnail - last).mean() < diff_threshold:
+            # Nothing visibly changed since the last analyzed frame
+            stats["skipped"] += 1
+            continue
+        last = thumbnail
+        stats["analyzed"] += 1
+        pending.append((seconds, index, preprocess_image(img)))
+        if len(pending) == batch_size:
+            yield from flush()
+
+    if pending:
+        yield from flush()
+
+def summarize_timeline(timeline: list) -> dict:
+    """Collapse a timeline into runs of the same diagnosis plus overall class shares"""
+    segments = []
+    for entry in timeline:
+        if segments and segments[-1]["predicted_class"] == entry["predicted_class"]:
+            segments[-1]["end"] = entry["timestamp"]
+            segments[-1]["frames"] += 1
+        else:
+            segments.append({"predicted_class": entry["predicted_class"], "start": entry["timestamp"],
+                             "end": entry["timestamp"], "frames": 1})
+    counts = Counter(entry["predicted_class"] for entry in timeline)
+    return {
+        "segments": segments,
+        "class_share": {name: counts[name] / len(timeline) for name in CLASS_NAMES} if timeline else {},
+        "mean_probabilities": (
+            np.mean([[entry["all_predictions"][name] for name in CLASS_NAMES] for entry in timeline], axis=0).tolist()
+            if timeline else None
+        ),
+    }
@@ -0,0 +1,148 @@
+from pathlib import Path
+import argparse
+import multiprocessing
+import os
+import signal
+import time
+
+from job_queue import QUEUE_DB_PATH, SPOOL_DIR, JobQueue
+
+QUEUE_WORKERS = int(os.environ.get("QUEUE_WORKERS", 2))
+QUEUE_BATCH_SIZE = int(os.environ.get("QUEUE_BATCH_SIZE", 16))
+QUEUE_POLL_INTERVAL = 0.5  # Seconds an idle worker waits before polling again
+WATCHDOG_INTERVAL = 1.0
+
+def process_job(queue: JobQueue, job: dict, model, model_name: str):
+    """Run one claimed job, storing results batch by batch"""
+    # Heavy imports stay out of the supervisor process
+    from PIL import Image
+    import numpy as np
+    from inference import preprocess_image, predict_probabilities
+    from tiling import TILE_OVERLAP, predict_tiled
+    from tta import predict_tta
+
+    params = job["params"]
+    predict_fn = lambda batch: predict_probabilities(model, batch)
+    items = queue.spooled_items(job["id"])
+    batch_size = QUEUE_BATCH_SIZE if job["kind"] == "predict" else 1
+
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        results, batch, positions = [], [], []
+        for index, filename, path in chunk:
+            try:
+                img = Image.open(path)
+                if job["kind"] == "predict":
+                    batch.append(preprocess_image(img))
+                    positions.append((index, filename))
+                elif job["kind"] == "tiled":
+                    probabilities, tiles = predict_tiled(predict_fn, img, params.get("overlap", TILE_OVERLAP))
+                    results.append((index, {"filename": filename, "probabilities": probabilities.tolist(), "tiles": tiles}))
+                else:
+                    probabilities, details = predict_tta(predict_fn, img, params.get("tta", 4))
+                    results.append((index, {"filename": filename, "probabilities": probabilities.tolist(), "tta": details}))
+            except OSError as e:
+                # A bad image fails its item, not the whole job
+                results.append((index, {"filename": filename, "error": f"Could not read image: {e}"}))
+
+        if batch:
+            probabilities = predict_fn(np.concatenate(batch))
+            for (index, filename), probs in zip(positions, probabilities):
+                results.append((index, {"filename": filename, "probabilities": probs.tolist()}))
+
+        queue.add_results(job["id"], [
+            (index, {"model": model_name, **result}) for index, result in results
+        ])
+
+def worker_main(db_path: str, spool_dir: str, model_path: str, standin: bool):
+    """Worker process: load the model once, then claim and run jobs until terminated"""
+    from standin_model import load_model
+
+    name = f"worker-{os.getpid()}"
+    model = load_model(model_path, standin=standin)
+    model_name = "standin" if standin else Path(model_path).name
+    queue = JobQueue(db_path, spool_dir)
+    print(f"{name} ready ({model_name})")
+
+    while True:
+        job = queue.claim(name)
+        if job is None:
+            time.sleep(QUEUE_POLL_INTERVAL)
+            continue
+
+        print(f"{name} running job {job['id']} (attempt {job['attempts']}/{job['max_attempts']})")
+        try:
+            process_job(queue, job, model, model_name)
+            queue.complete(job["id"])
+        except Exception as e:
+            print(f"{name} job {job['id']} failed: {e}")
+            queue.fail(job["id"], str(e))
+
+class WorkerPool:
+    """Supervises worker processes: restarts dead ones and kills workers that overrun a job's timeout"""
+
+    def __init__(self, workers: int = QUEUE_WORKERS, db_path=QUEUE_DB_PATH, spool_dir=SPOOL_DIR,
+                 model_path=None, standin: bool = False):
+        # Spawn, not fork: TensorFlow must be initialised inside each worker
+        self._context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.args = (str(db_path), str(spool_dir), str(model_path) if model_path else None, standin)
+        self.queue = JobQueue(db_path, spool_dir)
+        self._processes = {}  # worker name -> Process
+
+    def _spawn(self):
+        process = self._context.Process(target=worker_main, args=self.args, daemon=True)
+        process.start()
+        self._processes[f"worker-{process.pid}"] = process
+
+    def _check(self):
+        """Fail jobs of dead or overrunning workers (they are retried) and replace those workers"""
+        for job in self.queue.expired():
+            process = self._processes.get(job["worker"])
+            if process is not None and process.is_alive():
+                print(f"Job {job['id']} timed out on {job['worker']}; restarting worker")
+                process.terminate()
+                process.join()
+            self.queue.fail(job["id"], "Timed out")
+
+        for name, process in list(self._processes.items()):
+            if not process.is_alive():
+                del self._processes[name]
+                self.queue.release_worker(name, f"Worker exited with code {process.exitcode}")
+
+        while len(self._processes) < self.workers:
+            self._spawn()
+
+    def run(self):
+        """Supervise until interrupted"""
+        print(f"Starting {self.workers} workers on {self.queue.db_path}")
+        # docker stop / systemd send SIGTERM; shut down the same way as Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            while True:
+                self._check()
+                time.sleep(WATCHDOG_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop all workers; jobs they held go back to the queue"""
+        for name, process in self._processes.items():
+            process.terminate()
+            process.join()
+            self.queue.requeue_worker(name)
+        self._processes.clear()
+        self.queue.close()
+
+if __name__ == "__main__":
+    from inference import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Run worker processes for the durable job queue")
+    parser.add_argument("--workers", type=int, default=QUEUE_WORKERS)
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model instead of --model")
+    args = parser.parse_args()
+
+    WorkerPool(args.workers, model_path=args.model, standin=args.standin).run()
@@ -0,0 +1,166 @@
+import argparse
+import os
+import threading
+import time
+from PIL import Image
+import numpy as np
+import tensorflow as tf
+
+from inference import INPUT_SIZE, MODEL_PATH, preprocess_image, softmax
+
+# Opt-in: serve through XLA-compiled forward passes instead of op-by-op Keras execution
+XLA_JIT = os.environ.get("XLA_JIT", "0") == "1"
+# Batch sizes compiled at startup; other sizes are padded up to the next bucket
+XLA_BATCH_BUCKETS = tuple(sorted({int(size) for size in os.environ.get("XLA_BATCH_BUCKETS", "1,2,4,8,16,32").split(",")}))
+PARITY_ATOL = 1e-4
+
+def bucket_for(rows: int, buckets: tuple) -> int:
+    """Smallest bucket that holds `rows` (the largest bucket if none does)"""
+    for size in buckets:
+        if rows <= size:
+            return size
+    return buckets[-1]
+
+class CompiledModel:
+    """XLA-compiled forward pass specialized to fixed batch buckets; a drop-in for model.predict"""
+
+    def __init__(self, model: tf.keras.Model, buckets: tuple = XLA_BATCH_BUCKETS):
+        self.keras_model = model
+        self.buckets = tuple(sorted(buckets))
+        forward = tf.function(lambda x: model(x, training=False), jit_compile=True)
+        self._functions = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rows = 0
+        self.padded_rows = 0
+
+        start = time.perf_counter()
+        for size in self.buckets:
+            spec = tf.TensorSpec((size, INPUT_SIZE, INPUT_SIZE, 3), tf.float32)
+            function = forward.get_concrete_function(spec)
+            # Tracing doesn't compile; XLA builds the executable on the first call, so make it now
+            function(tf.zeros(spec.shape))
+            self._functions[size] = function
+        self.compile_ms = (time.perf_counter() - start) * 1000
+
+    def predict(self, batch: np.ndarray, verbose: int = 0):
+        """Run a batch through the compiled buckets, zero-padding each chunk up to its bucket"""
+        batch = np.asarray(batch, dtype=np.float32)
+        largest = self.buckets[-1]
+        parts = []
+        padded = 0
+        for start in range(0, len(batch), largest):
+            chunk = batch[start:start + largest]
+            rows = len(chunk)
+            size = bucket_for(rows, self.buckets)
+            if size > rows:
+                chunk = np.concatenate([chunk, np.zeros((size - rows, *chunk.shape[1:]), dtype=np.float32)])
+                padded += size - rows
+            outputs = self._functions[size](tf.constant(chunk))
+            parts.append(tf.nest.map_structure(lambda output: output.numpy()[:rows], outputs))
+
+        with self._lock:
+            self.calls += 1
+            self.rows += len(batch)
+            self.padded_rows += padded
+        return tf.nest.map_structure(lambda *outputs: np.concatenate(outputs), *parts)
+
+    def stats(self) -> dict:
+        """Compiled buckets, startup compile time and rows wasted on padding"""
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "compile_ms": self.compile_ms,
+                "calls": self.calls,
+                "rows": self.rows,
+                "padded_rows": self.padded_rows,
+                "padding_rate": self.padded_rows / (self.rows + self.padded_rows) if self.rows else 0.0,
+            }
+
+def median_ms(fn, repeats: int) -> float:
+    """Median wall time of `fn` in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def parity(model: tf.keras.Model, compiled: CompiledModel, batch: np.ndarray) -> dict:
+    """How closely the compiled path's probabilities match model.predict on the same batch"""
+    reference = softmax(model.predict(batch, verbose=0))
+    candidate = softmax(compiled.predict(batch))
+    return {
+        "images": len(batch),
+        "max_abs_diff": float(np.abs(reference - candidate).max()),
+        "top1_agreement": float(np.mean(np.argmax(reference, axis=-1) == np.argmax(candidate, axis=-1))),
+    }
+
+def benchmark(model: tf.keras.Model, compiled: CompiledModel, batch_sizes, repeats: int = 20, seed: int = 0) -> list:
+    """Latency and throughput of the same forward pass as a plain graph vs the XLA buckets at each batch size"""
+    rng = np.random.default_rng(seed)
+    # Same tf.function as the buckets minus jit_compile, so the speedup is XLA's alone rather than
+    # model.predict's per-call Keras overhead (shown separately for reference)
+    graph = tf.function(lambda x: model(x, training=False), jit_compile=False)
+    report = []
+    for size in batch_sizes:
+        batch = rng.random((size, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+        run_graph = lambda: tf.nest.map_structure(lambda output: output.numpy(), graph(tf.constant(batch)))
+        run_graph()  # Trace and warm up
+        graph_ms = median_ms(run_graph, repeats)
+        model.predict(batch, verbose=0)
+        predict_ms = median_ms(lambda: model.predict(batch, verbose=0), repeats)
+        compiled.predict(batch)
+        xla_ms = median_ms(lambda: compiled.predict(batch), repeats)
+        report.append({
+            "batch_size": size,
+            "bucket": bucket_for(size, compiled.buckets),
+            "predict_ms": round(predict_ms, 2),
+            "graph_ms": round(graph_ms, 2),
+            "xla_ms": round(xla_ms, 2),
+            "graph_images_per_second": round(1000 * size / graph_ms, 1),
+            "xla_images_per_second": round(1000 * size / xla_ms, 1),
+            "speedup": round(graph_ms / xla_ms, 2),
+        })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark XLA-compiled inference against the same graph without XLA and check parity"
+    )
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to a .keras model")
+    parser.add_argument("--standin", action="store_true", help="Use the stand-in model instead of --model")
+    parser.add_argument("--buckets", type=int, nargs="+", default=list(XLA_BATCH_BUCKETS))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 3, 8, 32])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--images", nargs="*", default=[],
+                        help="Images and/or folders for the parity check (default: random inputs)")
+    args = parser.parse_args()
+
+    from standin_model import load_model
+    model = load_model(args.model, standin=args.standin)
+    compiled = CompiledModel(model, args.buckets)
+    print(f"Compiled {len(compiled.buckets)} buckets {list(compiled.buckets)} in {compiled.compile_ms / 1000:.1f}s")
+
+    print(f"\n{'batch':>5} {'bucket':>6} {'predict ms':>11} {'graph ms':>9} {'XLA ms':>8} {'graph img/s':>12} "
+          f"{'XLA img/s':>10} {'XLA speedup':>12}")
+    for row in benchmark(model, compiled, args.batch_sizes, args.repeats):
+        print(f"{row['batch_size']:>5} {row['bucket']:>6} {row['predict_ms']:>11.2f} {row['graph_ms']:>9.2f} "
+              f"{row['xla_ms']:>8.2f} {row['graph_images_per_second']:>12.1f} {row['xla_images_per_second']:>10.1f} "
+              f"{row['speedup']:>11.2f}x")
+
+    if args.images:
+        from bulk_predict import iter_image_paths
+        batch = np.concatenate([preprocess_image(Image.open(path)) for path in iter_image_paths(args.images)])
+        batch = batch.astype(np.float32)
+    else:
+        batch = np.random.default_rng(1).random((max(args.batch_sizes), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    result = parity(model, compiled, batch)
+    ok = result["max_abs_diff"] <= PARITY_ATOL and result["top1_agreement"] == 1.0
+    print(f"\nParity on {result['images']} images: max |diff| {result['max_abs_diff']:.2e}, "
+          f"top-1 agreement {result['top1_agreement']:.1%} -> {'OK' if ok else 'MISMATCH'}")
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,85 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
 import numpy as np
-import tensorflow as tf
 from pathlib import Path
+from collections import OrderedDict
+import csv
+import os
+import queue
+import argparse
+import multiprocessing
+import sys
 import threading
+import time
+
+# Class names, preprocessing, severity and test-time augmentation are shared with the backend
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from inference import CLASS_NAMES, preprocess_image, softmax, top_prediction
+from tta import TTA_BASE_SIZE, augment
+
+# Measured from process start so TF import/model load show up in the timings
+PROCESS_START = time.perf_counter()
+
+# Folder scan settings
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+THUMBNAIL_SIZE = (40, 40)
+THUMBNAIL_CACHE_SIZE = 256  # Must stay larger than the number of visible rows
+SCAN_BATCH_SIZE = 32
+ALL_CLASSES = "All classes"
+TTA_OPTIONS = {"Off": 0, "2x": 2, "4x": 4, "8x": 8}
+
+# Image sizes
+DISPLAY_SIZE = (300, 300)
+MODEL_INPUT_SIZE = (224, 224)
+
+def open_reduced(path, size):
+    """Decode an image as RGB at the smallest scale that still covers `size`"""
+    with Image.open(path) as img:
+        # JPEG can be decoded directly at 1/2, 1/4 or 1/8 scale; other formats ignore this
+        img.draft("RGB", size)
+        return img.convert("RGB")
+
+def load_image_reduced(path, display_size=DISPLAY_SIZE, input_size=MODEL_INPUT_SIZE):
+    """Decode an image once and return (display thumbnail, model input image)"""
+    img = open_reduced(path, (max(display_size[0], input_size[0]), max(display_size[1], input_size[1])))
+    model_input = img.resize(input_size)
+    img.thumbnail(display_size, Image.Resampling.LANCZOS)
+    return img, model_input
+
+def _peak_rss_child(path, reduced, conn):
+    """Load one image the old or new way and report the peak RSS increase (in child process)"""
+    import resource
+    
+    def peak_rss_bytes():
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+    
+    baseline = peak_rss_bytes()
+    if reduced:
+        display, model_input = load_image_reduced(path)
+    else:
+        # Previous behaviour: full-resolution copy plus a full decode for the thumbnail
+        img = Image.open(path)
+        full = img.copy()
+        img.thumbnail(DISPLAY_SIZE, Image.Resampling.LANCZOS)
+    conn.send(peak_rss_bytes() - baseline)
+
+def measure_peak_rss(path):
+    """Compare peak RSS of full-resolution vs reduced image loading, each in a fresh process"""
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for label, reduced in (("full-resolution", False), ("reduced (draft)", True)):
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_peak_rss_child, args=(path, reduced, child_conn))
+        process.start()
+        results[label] = parent_conn.recv()
+        process.join()
+    
+    with Image.open(path) as img:
+        print(f"{path}: {img.width}x{img.height} {img.format}")
+    for label, increase in results.items():
+        print(f"  {label:>16}: peak RSS +{increase / 1024 / 1024:.1f} MB")
+    return results
 
 class PlantSaviorGUI:
     def __init__(self, root):
@@ -13,30 +89,74 @@ class PlantSaviorGUI:
         self.root.geometry("1000x700")
         self.root.configure(bg='#f0f9ff')
         
-        # Model and class names
         self.model = None
-        self.class_names = ["Healthy Plant", "Leaf Spot Disease", "Powdery Mildew"]
-        self.current_image = None
-        
-        # Load model on startup
-        self.load_model()
+        self.current_image = None  # 224x224 model input, never the full-resolution photo
+        self.model_status = "⏳ Loading model..."
+        self.time_to_first_window = None
+        self.time_to_ready = None
         
-        # Create GUI
+        # Create GUI first so the window appears immediately
         self.create_widgets()
+        self.root.bind("<Map>", self._on_first_map, add="+")
         
-    def load_model(self):
+        # Import TensorFlow, load and warm up the model in the background
+        thread = threading.Thread(target=self._load_model_async)
+        thread.daemon = True
+        thread.start()
+        
+    def load_model(self, progress=None):
         """Load the Keras model"""
+        progress = progress or (lambda message: None)
+        
         model_path = Path("backend/models/best_plant_model_final.keras")
         if not model_path.exists():
             model_path = Path("best_plant_model_final.keras")
         
         try:
-            self.model = tf.keras.models.load_model(model_path)
+            # A broken TensorFlow install is reported in the status label like any other load error
+            progress("⏳ Importing TensorFlow...")
+            import tensorflow as tf
+            
+            progress(f"⏳ Loading model from {model_path}...")
+            model = tf.keras.models.load_model(model_path)
+            
+            # Warm up so the first analysis doesn't pay for graph tracing
+            progress("⏳ Warming up model...")
+            model.predict(np.zeros((1, 224, 224, 3), dtype=np.float32), verbose=0)
+            
+            self.model = model
             self.model_status = "✅ Model loaded successfully!"
         except Exception as e:
             self.model_status = f"❌ Error loading model: {e}"
             self.model = None
     
+    def _load_model_async(self):
+        """Load the model (in thread) and report progress in the status label"""
+        self.load_model(progress=lambda message: self.root.after(0, self._set_status, message))
+        self.time_to_ready = time.perf_counter() - PROCESS_START
+        
+        status = self.model_status
+        if self.model:
+            status += f" (ready in {self.time_to_ready:.1f}s)"
+        print(f"Time to ready: {self.time_to_ready:.2f}s")
+        self.root.after(0, self._on_model_ready, status)
+    
+    def _set_status(self, message, color='#b45309'):
+        """Update the model status label (main thread)"""
+        self.status_label.config(text=message, fg=color)
+    
+    def _on_model_ready(self, status):
+        """Enable analysis once the model is loaded (main thread)"""
+        self._set_status(status, '#059669' if self.model else '#dc2626')
+        if self.model and self.current_image:
+            self.analyze_btn.config(state=tk.NORMAL)
+    
+    def _on_first_map(self, event):
+        """Record how long it took for the window to appear"""
+        if event.widget is self.root and self.time_to_first_window is None:
+            self.time_to_first_window = time.perf_counter() - PROCESS_START
+            print(f"Time to first window: {self.time_to_first_window:.2f}s")
+    
     def create_widgets(self):
         """Create all GUI widgets"""
         # Title
@@ -62,14 +182,14 @@ class PlantSaviorGUI:
         subtitle_label.pack()
         
         # Model status
-        status_label = tk.Label(
+        self.status_label = tk.Label(
             title_frame, 
             text=self.model_status, 
             font=("Helvetica", 10),
             bg='#f0f9ff',
-            fg='#059669' if self.model else '#dc2626'
+            fg='#b45309'
         )
-        status_label.pack(pady=5)
+        self.status_label.pack(pady=5)
         
         # Main content frame
         main_frame = tk.Frame(self.root, bg='#f0f9ff')
@@ -100,7 +220,20 @@ class PlantSaviorGUI:
             pady=10,
             cursor='hand2'
         )
-        upload_btn.pack(pady=20)
+        upload_btn.pack(pady=(20, 5))
+        
+        # Folder scan button
+        scan_btn = tk.Button(
+            left_frame,
+            text="📂 Scan Folder",
+            font=("Helvetica", 11),
+            bg='#e0f2f1',
+            fg='#0f766e',
+            activebackground='#ccfbf1',
+            command=self.scan_folder,
+            cursor='hand2'
+        )
+        scan_btn.pack(pady=(0, 10))
         
         # Image display
         self.image_frame = tk.Frame(left_frame, bg='#f8fafc', relief='sunken', bd=2)
@@ -229,13 +362,8 @@ class PlantSaviorGUI:
         
         if file_path:
             try:
-                # Load and display image
-                img = Image.open(file_path)
-                self.current_image = img.copy()
-                
-                # Resize for display (maintain aspect ratio)
-                display_size = (300, 300)
-                img.thumbnail(display_size, Image.Resampling.LANCZOS)
+                # Decode once at reduced size; only the small images are kept
+                img, self.current_image = load_image_reduced(file_path)
                 
                 # Convert to PhotoImage
                 photo = ImageTk.PhotoImage(img)
@@ -254,16 +382,15 @@ class PlantSaviorGUI:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load image: {e}")
     
-    def preprocess_image(self, img):
-        """Preprocess image for model prediction"""
-        # Convert to RGB and resize
-        img = img.convert("RGB").resize((224, 224))
-        
-        # Convert to array and normalize
-        img_array = np.array(img) / 255.0
+    def scan_folder(self):
+        """Open a results grid for every image in a folder"""
+        if not self.model:
+            messagebox.showerror("Error", self.model_status)
+            return
         
-        # Add batch dimension
-        return np.expand_dims(img_array, 0)
+        folder = filedialog.askdirectory(title="Select Folder of Plant Images")
+        if folder:
+            FolderScanWindow(self, folder)
     
     def analyze_image(self):
         """Analyze the uploaded image"""
@@ -283,24 +410,12 @@ class PlantSaviorGUI:
         """Run the actual analysis (in thread)"""
         try:
             # Preprocess image
-            processed_img = self.preprocess_image(self.current_image)
+            processed_img = preprocess_image(self.current_image)
             
             # Make prediction
             predictions = self.model.predict(processed_img, verbose=0)
-            probabilities = tf.nn.softmax(predictions[0]).numpy()
-            
-            # Get results
-            predicted_index = int(np.argmax(probabilities))
-            confidence = float(probabilities[predicted_index])
-            predicted_class = self.class_names[predicted_index] if predicted_index < len(self.class_names) else "Unknown"
-            
-            # Determine severity
-            severity = "Low"
-            if predicted_class != "Healthy Plant":
-                if confidence > 0.8:
-                    severity = "High"
-                elif confidence > 0.6:
-                    severity = "Medium"
+            probabilities = softmax(predictions[0])
+            predicted_class, confidence, severity = top_prediction(probabilities)
             
             # Update GUI in main thread
             self.root.after(0, self._update_results, predicted_class, confidence, severity, probabilities)
@@ -318,12 +433,12 @@ class PlantSaviorGUI:
 
 🏥 Detected Condition: {predicted_class}
 📊 Confidence Level: {confidence*100:.1f}%
-⚠️ Severity: {severity}
+⚠️ Severity: {severity.capitalize()}
 
 📈 DETAILED ANALYSIS:
 """
         
-        for i, (class_name, prob) in enumerate(zip(self.class_names, probabilities)):
+        for i, (class_name, prob) in enumerate(zip(CLASS_NAMES, probabilities)):
             percentage = prob * 100
             bar = "█" * int(percentage / 5) + "░" * (20 - int(percentage / 5))
             prediction_text += f"\n{class_name}:\n{bar} {percentage:.1f}%\n"
@@ -446,8 +561,388 @@ class PlantSaviorGUI:
             "Research specific care requirements for your plant species"
         ])
 
+def list_images(folder):
+    """List every image file in a folder, sorted by name"""
+    with os.scandir(folder) as entries:
+        paths = [
+            entry.path for entry in entries
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+        ]
+    return sorted(paths, key=lambda path: os.path.basename(path).lower())
+
+class ThumbnailCache:
+    """Bounded LRU cache of row thumbnails generated lazily off the UI thread"""
+    
+    def __init__(self, capacity=THUMBNAIL_CACHE_SIZE, size=THUMBNAIL_SIZE):
+        self.capacity = capacity
+        self.size = size
+        self._photos = OrderedDict()  # path -> PhotoImage, main thread only
+        self._wanted = set()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._requests = queue.LifoQueue()  # Most recently requested rows first
+        self._ready = queue.Queue()
+        self._closed = False
+        
+        worker = threading.Thread(target=self._worker)
+        worker.daemon = True
+        worker.start()
+    
+    def get(self, path):
+        """Return a cached thumbnail, or None and schedule it for generation"""
+        photo = self._photos.get(path)
+        if photo is not None:
+            self._photos.move_to_end(path)
+            return photo
+        
+        with self._lock:
+            if path not in self._pending:
+                self._pending.add(path)
+                self._requests.put(path)
+        return None
+    
+    def set_visible(self, paths):
+        """Only generate thumbnails for rows that are still on screen"""
+        with self._lock:
+            self._wanted = set(paths)
+    
+    def poll(self):
+        """Turn finished thumbnails into PhotoImages (main thread), return their paths"""
+        updated = []
+        while True:
+            try:
+                path, img = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if img is not None:
+                self._photos[path] = ImageTk.PhotoImage(img)
+                self._photos.move_to_end(path)
+                updated.append(path)
+        
+        while len(self._photos) > self.capacity:
+            self._photos.popitem(last=False)
+        return updated
+    
+    def close(self):
+        """Stop the background worker"""
+        self._closed = True
+        self._requests.put(None)
+    
+    def _worker(self):
+        """Generate thumbnails (in thread)"""
+        while not self._closed:
+            path = self._requests.get()
+            if path is None:
+                break
+            
+            with self._lock:
+                self._pending.discard(path)
+                if path not in self._wanted:
+                    continue  # Scrolled away before we got to it
+            
+            try:
+                thumb = open_reduced(path, self.size)
+                thumb.thumbnail(self.size, Image.Resampling.LANCZOS)
+            except Exception:
+                thumb = None
+            self._ready.put((path, thumb))
+
+class FolderScanWindow:
+    """Virtualized results grid for classifying a whole folder of images"""
+    
+    def __init__(self, app, folder):
+        self.app = app
+        self.folder = folder
+        self.paths = list_images(folder)
+        self.results = {}  # path index -> (predicted_class, confidence, severity, probabilities)
+        self.filtered = list(range(len(self.paths)))
+        self.offset = 0
+        self.visible_rows = 15
+        self.row_height = THUMBNAIL_SIZE[1] + 6
+        
+        self.thumbnails = ThumbnailCache()
+        self._results_queue = queue.Queue()
+        self._stop = threading.Event()
+        self._scan_id = 0
+        
+        self.window = tk.Toplevel(app.root)
+        self.window.title(f"📂 Folder Scan - {folder}")
+        self.window.geometry("900x650")
+        self.window.configure(bg='#f0f9ff')
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        
+        self.create_widgets()
+        self.start_scan()
+        self._poll()
+    
+    def create_widgets(self):
+        """Create toolbar, results grid and scrollbar"""
+        toolbar = tk.Frame(self.window, bg='#f0f9ff')
+        toolbar.pack(fill=tk.X, padx=10, pady=10)
+        
+        tk.Label(toolbar, text="Filter:", font=("Helvetica", 11), bg='#f0f9ff').pack(side=tk.LEFT)
+        
+        self.filter_var = tk.StringVar(value=ALL_CLASSES)
+        filter_box = ttk.Combobox(
+            toolbar,
+            textvariable=self.filter_var,
+            values=[ALL_CLASSES] + CLASS_NAMES,
+            state="readonly",
+            width=22
+        )
+        filter_box.pack(side=tk.LEFT, padx=5)
+        filter_box.bind("<<ComboboxSelected>>", lambda event: self.apply_filter())
+        
+        tk.Label(toolbar, text="TTA:", font=("Helvetica", 11), bg='#f0f9ff').pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.tta_var = tk.StringVar(value="Off")
+        tta_box = ttk.Combobox(
+            toolbar,
+            textvariable=self.tta_var,
+            values=list(TTA_OPTIONS),
+            state="readonly",
+            width=5
+        )
+        tta_box.pack(side=tk.LEFT, padx=5)
+        tta_box.bind("<<ComboboxSelected>>", lambda event: self.start_scan())
+        
+        export_btn = tk.Button(
+            toolbar,
+            text="💾 Export CSV",
+            font=("Helvetica", 11),
+            bg='#0d9488',
+            fg='white',
+            activebackground='#0f766e',
+            activeforeground='white',
+            command=self.export_csv,
+            cursor='hand2'
+        )
+        export_btn.pack(side=tk.RIGHT)
+        
+        self.progress_label = tk.Label(toolbar, text="", font=("Helvetica", 10), bg='#f0f9ff', fg='#374151')
+        self.progress_label.pack(side=tk.RIGHT, padx=10)
+        
+        # The tree only ever holds the visible rows; scrolling re-fills them
+        grid_frame = tk.Frame(self.window, bg='#f0f9ff')
+        grid_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
+        style = ttk.Style(self.window)
+        style.configure("Scan.Treeview", rowheight=self.row_height)
+        
+        self.tree = ttk.Treeview(
+            grid_frame,
+            columns=("condition", "confidence", "severity"),
+            style="Scan.Treeview",
+            selectmode="browse"
+        )
+        self.tree.heading("#0", text="Image")
+        self.tree.heading("condition", text="Condition")
+        self.tree.heading("confidence", text="Confidence")
+        self.tree.heading("severity", text="Severity")
+        self.tree.column("#0", width=360)
+        self.tree.column("condition", width=200)
+        self.tree.column("confidence", width=100, anchor=tk.E)
+        self.tree.column("severity", width=100, anchor=tk.CENTER)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.scrollbar = ttk.Scrollbar(grid_frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_to(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_to(self.offset + 3))
+    
+    def start_scan(self):
+        """(Re)start classifying the folder with the selected TTA setting"""
+        self._stop.set()
+        self._stop = threading.Event()
+        self._scan_id += 1
+        self.results.clear()
+        self.apply_filter()
+        
+        # Classify in batches off the UI thread
+        thread = threading.Thread(target=self._run_scan, args=(self._scan_id, self._stop, TTA_OPTIONS[self.tta_var.get()]))
+        thread.daemon = True
+        thread.start()
+    
+    def apply_filter(self):
+        """Rebuild the filtered row list for the selected class"""
+        selected = self.filter_var.get()
+        if selected == ALL_CLASSES:
+            self.filtered = list(range(len(self.paths)))
+        else:
+            self.filtered = [
+                index for index, result in sorted(self.results.items())
+                if result[0] == selected
+            ]
+        self.scroll_to(self.offset)
+    
+    def scroll_to(self, offset):
+        """Move the visible window and re-render"""
+        max_offset = max(0, len(self.filtered) - self.visible_rows)
+        self.offset = min(max(0, int(offset)), max_offset)
+        self.render()
+    
+    def render(self):
+        """Fill the tree with the rows currently in view"""
+        rows = self.filtered[self.offset:self.offset + self.visible_rows]
+        visible_paths = [self.paths[index] for index in rows]
+        self.thumbnails.set_visible(visible_paths)
+        
+        items = self.tree.get_children()
+        for slot, index in enumerate(rows):
+            path = self.paths[index]
+            result = self.results.get(index)
+            if result:
+                predicted_class, confidence, severity, _ = result
+                values = (predicted_class, f"{confidence*100:.1f}%", severity.capitalize())
+            else:
+                values = ("⏳ Pending", "", "")
+            
+            photo = self.thumbnails.get(path)
+            options = {"text": f" {os.path.basename(path)}", "values": values, "image": photo or ""}
+            if slot < len(items):
+                self.tree.item(items[slot], **options)
+            else:
+                self.tree.insert("", tk.END, **options)
+        
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+        
+        total = len(self.filtered)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + len(rows)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def export_csv(self):
+        """Export the classified rows in the current view to a CSV file"""
+        file_path = filedialog.asksaveasfilename(
+            parent=self.window,
+            title="Export Scan Results",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")]
+        )
+        if not file_path:
+            return
+        
+        try:
+            with open(file_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["path", "predicted_class", "confidence", "severity"] + CLASS_NAMES)
+                for index in self.filtered:
+                    result = self.results.get(index)
+                    if result is None:
+                        continue
+                    predicted_class, confidence, severity, probabilities = result
+                    writer.writerow(
+                        [self.paths[index], predicted_class, f"{confidence:.4f}", severity]
+                        + [f"{prob:.4f}" for prob in probabilities]
+                    )
+            messagebox.showinfo("Export Complete", f"Saved results to {file_path}", parent=self.window)
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Failed to export results: {e}", parent=self.window)
+    
+    def close(self):
+        """Stop background work and close the window"""
+        self._stop.set()
+        self.thumbnails.close()
+        self.window.destroy()
+    
+    def _on_scrollbar(self, action, value, unit=None):
+        """Translate scrollbar commands into row offsets"""
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self.filtered))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.offset + int(value) * step)
+    
+    def _on_mousewheel(self, event):
+        """Scroll with the mouse wheel (Windows/macOS)"""
+        self.scroll_to(self.offset - (3 if event.delta > 0 else -3))
+    
+    def _on_resize(self, event):
+        """Recompute how many rows fit in the tree"""
+        visible_rows = max(1, event.height // self.row_height - 1)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.scroll_to(self.offset)
+    
+    def _poll(self):
+        """Pick up finished thumbnails and predictions (main thread)"""
+        if not self.window.winfo_exists():
+            return
+        
+        changed = bool(self.thumbnails.poll())
+        new_results = False
+        while True:
+            try:
+                scan_id, index, result = self._results_queue.get_nowait()
+            except queue.Empty:
+                break
+            if scan_id != self._scan_id:
+                continue  # Left over from a cancelled scan
+            self.results[index] = result
+            new_results = True
+        
+        if new_results:
+            changed = True
+            if self.filter_var.get() != ALL_CLASSES:
+                self.apply_filter()
+            self.progress_label.config(text=f"Classified {len(self.results)} / {len(self.paths)}")
+        
+        if changed:
+            self.render()
+        self.window.after(100, self._poll)
+    
+    def _run_scan(self, scan_id, stop, tta):
+        """Classify every image in batches (in thread)"""
+        for start in range(0, len(self.paths), SCAN_BATCH_SIZE):
+            if stop.is_set():
+                return
+            
+            indices = []
+            batch = []
+            for index in range(start, min(start + SCAN_BATCH_SIZE, len(self.paths))):
+                try:
+                    if tta:
+                        img = open_reduced(self.paths[index], (TTA_BASE_SIZE, TTA_BASE_SIZE))
+                        batch.append(augment(img, tta).astype(np.float32) / 255.0)
+                    else:
+                        img = open_reduced(self.paths[index], MODEL_INPUT_SIZE)
+                        batch.append(preprocess_image(img))
+                    indices.append(index)
+                except Exception:
+                    self._results_queue.put((scan_id, index, ("⚠️ Unreadable", 0.0, "", [])))
+            
+            if not batch:
+                continue
+            
+            try:
+                # With TTA every image contributes all its views to the same forward pass
+                predictions = self.app.model.predict(np.concatenate(batch), verbose=0)
+                probabilities = softmax(predictions)
+                if tta:
+                    probabilities = probabilities.reshape(len(indices), tta, -1).mean(axis=1)
+            except Exception as e:
+                self.window.after(0, self.progress_label.config, {"text": f"Scan failed: {e}"})
+                return
+            
+            for index, probs in zip(indices, probabilities):
+                predicted_class, confidence, severity = top_prediction(probs)
+                self._results_queue.put((scan_id, index, (predicted_class, confidence, severity, probs.tolist())))
+
 def main():
     """Main function to run the application"""
+    parser = argparse.ArgumentParser(description="Plant Savior AI desktop app")
+    parser.add_argument("--measure-memory", metavar="IMAGE", help="Report peak RSS of loading IMAGE and exit")
+    args = parser.parse_args()
+    
+    if args.measure_memory:
+        measure_peak_rss(args.measure_memory)
+        return
+    
     root = tk.Tk()
     app = PlantSaviorGUI(root)
     
@@ -7,15 +7,66 @@ const STREAMLIT_API_URL = process.env.NODE_ENV === 'production'
   ? 'https://your-streamlit-app.streamlit.app' // Replace with your deployed Streamlit URL
   : 'http://localhost:8501'; // Local Streamlit development URL
 
+// Model input size, used if the backend's /config can't be reached
+const DEFAULT_INPUT_SIZE = 224;
+
+let inputSizePromise: Promise<number> | null = null;
+
+// Ask the backend once for the size it resizes uploads to
+const getInputSize = () => {
+  if (!inputSizePromise) {
+    inputSizePromise = fetch(`${STREAMLIT_API_URL}/config`)
+      .then((response) => (response.ok ? response.json() : null))
+      .then((config) => config?.input_size?.[0] ?? DEFAULT_INPUT_SIZE)
+      .catch(() => DEFAULT_INPUT_SIZE);
+  }
+  return inputSizePromise;
+};
+
+const canvasToBlob = (canvas: HTMLCanvasElement, type: string) =>
+  new Promise<Blob | null>((resolve) => canvas.toBlob(resolve, type, 0.9));
+
+// Resize on the device (stretching, like the server does) so only a few KB are uploaded
+const downscaleImage = async (file: File, size: number): Promise<Blob> => {
+  const bitmap = await createImageBitmap(file);
+  const canvas = document.createElement('canvas');
+  canvas.width = size;
+  canvas.height = size;
+  const context = canvas.getContext('2d');
+  if (!context) {
+    bitmap.close();
+    return file;
+  }
+  context.imageSmoothingQuality = 'high';
+  context.drawImage(bitmap, 0, 0, size, size);
+  bitmap.close();
+
+  // Browsers that can't encode WebP return PNG instead; use JPEG there
+  const webp = await canvasToBlob(canvas, 'image/webp');
+  if (webp && webp.type === 'image/webp') return webp;
+  return (await canvasToBlob(canvas, 'image/jpeg')) ?? file;
+};
+
 // AI diagnosis function that calls Streamlit backend
 const callStreamlitDiagnosis = async (file: File) => {
+  let upload: Blob = file;
+  try {
+    upload = await downscaleImage(file, await getInputSize());
+  } catch (error) {
+    // Undecodable in the browser (e.g. HEIC); let the server handle the original
+    console.warn('Client-side resize failed, uploading original:', error);
+  }
+
   const formData = new FormData();
-  formData.append('file', file);
+  const extension = upload.type === 'image/webp' ? 'webp' : 'jpg';
+  formData.append('file', upload, upload === file ? file.name : `${file.name.replace(/\.[^.]+$/, '')}.${extension}`);
 
   try {
     const response = await fetch(`${STREAMLIT_API_URL}/predict`, {
       method: 'POST',
       body: formData,
+      // Lets the server report the bandwidth saved by the resize
+      headers: { 'X-Original-Bytes': String(file.size) },
     });
 
     if (!response.ok) {